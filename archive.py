@@ -0,0 +1,357 @@
+import os
+import shutil
+import zlib
+from collections import deque
+from concurrent import futures as cf
+from zipfile import ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+# Compression methods an extension can be mapped to
+STORE = "store"
+FAST = "fast"
+MAX = "max"
+
+# (zip compression type, deflate level) for each method
+COMPRESSION_METHODS = {
+    STORE: (ZIP_STORED, None),
+    FAST: (ZIP_DEFLATED, 1),
+    MAX: (ZIP_DEFLATED, 9),
+}
+
+# Default per-extension policy for Assetto Corsa content. Media and audio banks
+# are already compressed; geometry and textures only shrink a little, so they
+# get the cheapest deflate; small text configs get the best ratio.
+DEFAULT_POLICY = {
+    ".png": STORE,
+    ".jpg": STORE,
+    ".jpeg": STORE,
+    ".ogg": STORE,
+    ".mp3": STORE,
+    ".bank": STORE,
+    ".zip": STORE,
+    ".7z": STORE,
+    ".rar": STORE,
+    ".acd": STORE,
+    ".dds": FAST,
+    ".kn5": FAST,
+    ".ai": FAST,
+    ".bin": FAST,
+    ".ini": MAX,
+    ".lut": MAX,
+    ".rto": MAX,
+    ".txt": MAX,
+    ".json": MAX,
+    ".csv": MAX,
+}
+DEFAULT_METHOD = FAST
+
+# Auto mode compresses this much of each file and stores it if the sample does
+# not shrink below AUTO_STORE_RATIO of its size
+AUTO_SAMPLE_SIZE = 64 * 1024
+AUTO_STORE_RATIO = 0.95
+
+# Fixed timestamp so identical inputs produce byte-identical archives (also
+# zipfile's default for entries opened by name, which add_file relies on)
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Parallel builder: files are split into chunks of this size, each deflated in
+# a worker process and primed with the previous 32 KiB as a dictionary
+PARALLEL_CHUNK_SIZE = 16 * 1024 * 1024
+PARALLEL_MIN_TREE_SIZE = 256 * 1024 * 1024
+INLINE_COMPRESS_SIZE = 256 * 1024
+DEFLATE_WINDOW = 32 * 1024
+
+
+def iter_directory(source_dir, include=None):
+    """Yields (path, arcname, is_dir) for a tree in a stable, sorted order.
+
+    include(arcname), if given, selects entries; excluded directories are
+    not descended into.
+    """
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in list(dirs):
+            path = os.path.join(root, name)
+            arcname = os.path.relpath(path, source_dir).replace("\\", "/")
+            if include and not include(arcname):
+                dirs.remove(name)
+                continue
+            yield path, arcname, True
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            arcname = os.path.relpath(path, source_dir).replace("\\", "/")
+            if not include or include(arcname):
+                yield path, arcname, False
+
+
+def sample_is_compressible(path):
+    """Returns False if a sample of the file barely shrinks under fast deflate."""
+    with open(path, "rb") as f:
+        sample = f.read(AUTO_SAMPLE_SIZE)
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) < len(sample) * AUTO_STORE_RATIO
+
+
+def choose_method(path, policy=None, auto=False):
+    """Returns the compression method for a file from its extension (and contents)."""
+    policy = DEFAULT_POLICY if policy is None else policy
+    method = policy.get(os.path.splitext(path)[1].lower(), DEFAULT_METHOD)
+    if auto and method != STORE and not sample_is_compressible(path):
+        method = STORE
+    return method
+
+
+def entry_info(arcname, is_dir, method=STORE):
+    """Returns a ZipInfo with the fixed timestamp and permissions used for every entry."""
+    info = ZipInfo(arcname + "/" if is_dir else arcname, date_time=FIXED_DATE_TIME)
+    info.create_system = 3  # Unix, so the attributes below are honoured
+    if is_dir:
+        info.external_attr = (0o40755 << 16) | 0x10
+        info.compress_type = ZIP_STORED
+    else:
+        info.external_attr = 0o100644 << 16
+        info.compress_type = COMPRESSION_METHODS[method][0]
+    return info
+
+
+def add_file(zip_ref, path, arcname, method):
+    """Streams one file into an open ZipFile with a deterministic header.
+
+    An entry opened by name takes the archive's compression settings and
+    the fixed 1980 timestamp; its permissions live only in the central
+    directory, so they are set once the data is written.
+    """
+    zip_ref.compression, zip_ref.compresslevel = COMPRESSION_METHODS[method]
+    size = os.path.getsize(path)
+    # Deflate can grow incompressible data slightly, so leave room for it
+    with open(path, "rb") as src, zip_ref.open(
+        arcname, "w", force_zip64=size * 1.05 > ZIP64_LIMIT
+    ) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+    template = entry_info(arcname, False, method)
+    info = zip_ref.getinfo(arcname)
+    info.create_system = template.create_system
+    info.external_attr = template.external_attr
+
+
+def write_directory_zip(fileobj, source_dir, policy=None, auto=False, include=None):
+    """Writes source_dir as a zip archive into an open binary file object.
+
+    Entries are sorted and carry fixed timestamps and permissions, so the
+    same tree always yields the same bytes. The file object does not need to
+    be seekable, so it can be a streaming upload writer. include selects
+    entries as in iter_directory.
+    """
+    with ZipFile(fileobj, "w") as zip_ref:
+        for path, arcname, is_dir in iter_directory(source_dir, include):
+            if is_dir:
+                zip_ref.writestr(entry_info(arcname, True), b"")
+            else:
+                add_file(zip_ref, path, arcname, choose_method(path, policy, auto))
+
+
+def tree_size(source_dir, include=None):
+    """Returns the total size in bytes of the files under source_dir.
+
+    include selects files as in iter_directory.
+    """
+    return sum(
+        os.path.getsize(path)
+        for path, _, is_dir in iter_directory(source_dir, include)
+        if not is_dir
+    )
+
+
+def _gf2_times(matrix, vector):
+    total = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            total ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return total
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, matrix[n]) for n in range(32)]
+
+
+def crc32_combine(crc1, crc2, len2):
+    """Returns the CRC-32 of A+B given crc32(A), crc32(B) and len(B) (zlib's algorithm)."""
+    if len2 <= 0:
+        return crc1
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+    while True:
+        even = _gf2_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+        odd = _gf2_square(even)
+        if len2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+    return crc1 ^ crc2
+
+
+def compress_chunk(path, offset, length, level, final):
+    """Deflates one slice of a file. Returns (crc32, raw length, deflate bytes).
+
+    Non-final slices end on a sync flush, so consecutive slices concatenate
+    into a single valid raw deflate stream.
+    """
+    with open(path, "rb") as f:
+        zdict = b""
+        if offset:
+            start = max(0, offset - DEFLATE_WINDOW)
+            f.seek(start)
+            zdict = f.read(offset - start)
+        data = f.read(length)
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    out = compressor.compress(data)
+    out += compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+    return zlib.crc32(data), len(data), out
+
+
+def _chunk_tasks(path, size, level, chunk_size):
+    if size == 0:
+        return [(path, 0, 0, level, True)]
+    return [
+        (path, offset, min(chunk_size, size - offset), level, offset + chunk_size >= size)
+        for offset in range(0, size, chunk_size)
+    ]
+
+
+class _RawEntryWriter:
+    """Writes pre-compressed entries into a seekable ZipFile.
+
+    zipfile has no public API for adding already-deflated data, so this writes
+    the local header itself, patches it once the CRC and sizes are known and
+    registers the entry so ZipFile.close() emits the central directory
+    (including zip64 records) as usual.
+    """
+
+    def __init__(self, zip_ref):
+        self.zip_ref = zip_ref
+        self.fp = zip_ref.fp
+
+    def begin(self, info):
+        self.zip64 = info.file_size * 1.05 + 64 >= ZIP64_LIMIT
+        info.header_offset = self.fp.tell()
+        info.CRC = 0
+        info.compress_size = 0
+        self.fp.write(info.FileHeader(self.zip64))
+        self.info = info
+        self.crc = 0
+        self.written = 0
+
+    def write(self, crc, raw_length, data):
+        self.crc = crc32_combine(self.crc, crc, raw_length)
+        self.fp.write(data)
+        self.written += len(data)
+
+    def end(self):
+        info = self.info
+        info.CRC = self.crc
+        info.compress_size = self.written
+        end = self.fp.tell()
+        self.fp.seek(info.header_offset)
+        self.fp.write(info.FileHeader(self.zip64))
+        self.fp.seek(end)
+        self.zip_ref.filelist.append(info)
+        self.zip_ref.NameToInfo[info.filename] = info
+        self.zip_ref.start_dir = end
+
+
+def write_directory_zip_parallel(
+    fileobj,
+    source_dir,
+    policy=None,
+    auto=False,
+    workers=None,
+    chunk_size=None,
+    include=None,
+):
+    """Like write_directory_zip, but deflates entries on several cores.
+
+    Large files are split into chunks that are compressed independently in a
+    process pool and stitched back together in order, so the result is a
+    standard zip that any extractor can read. fileobj must be seekable.
+    """
+    chunk_size = chunk_size or PARALLEL_CHUNK_SIZE
+    workers = workers or os.cpu_count() or 1
+    with ZipFile(fileobj, "w") as zip_ref, cf.ProcessPoolExecutor(workers) as pool:
+        raw = _RawEntryWriter(zip_ref)
+        # Entries are emitted in order; up to 2 * workers chunks are in flight
+        pending = deque()
+
+        def drain(limit):
+            while len(pending) > limit:
+                kind, payload = pending.popleft()
+                if kind == "begin":
+                    raw.begin(payload)
+                elif kind == "end":
+                    raw.end()
+                else:
+                    raw.write(*payload.result())
+
+        for path, arcname, is_dir in iter_directory(source_dir, include):
+            if is_dir:
+                drain(0)
+                zip_ref.writestr(entry_info(arcname, True), b"")
+                continue
+            method = choose_method(path, policy, auto)
+            size = os.path.getsize(path)
+            if method == STORE or size <= INLINE_COMPRESS_SIZE:
+                drain(0)
+                add_file(zip_ref, path, arcname, method)
+                continue
+
+            info = entry_info(arcname, False, method)
+            info.file_size = size
+            level = COMPRESSION_METHODS[method][1]
+            pending.append(("begin", info))
+            for task in _chunk_tasks(path, size, level, chunk_size):
+                pending.append(("chunk", pool.submit(compress_chunk, *task)))
+                drain(2 * workers)
+            pending.append(("end", None))
+        drain(0)
+
+
+def build_zip(
+    source_dir, output_path, policy=None, auto=False, workers=1, include=None
+):
+    """Builds output_path from source_dir, replacing it only once complete.
+
+    With workers > 1, trees of at least PARALLEL_MIN_TREE_SIZE bytes are
+    compressed by the parallel builder. include selects entries as in
+    iter_directory.
+    """
+    tmp_path = output_path + ".tmp"
+    try:
+        parallel = (
+            workers > 1 and tree_size(source_dir, include) >= PARALLEL_MIN_TREE_SIZE
+        )
+        with open(tmp_path, "wb") as f:
+            if parallel:
+                write_directory_zip_parallel(
+                    f, source_dir, policy, auto, workers, include=include
+                )
+            else:
+                write_directory_zip(f, source_dir, policy, auto, include)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+from colorama import Fore
+
+# Downloaded config assets and their validators, shared between runs
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ac-deploy", "assets")
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_TIMEOUT_SECONDS = 15
+
+
+def _cache_paths(cache_dir, url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{key}.body"), os.path.join(cache_dir, f"{key}.json")
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def fetch_cached(
+    url,
+    destination_path,
+    ttl=DEFAULT_TTL_SECONDS,
+    timeout=DEFAULT_TIMEOUT_SECONDS,
+    cache_dir=DEFAULT_CACHE_DIR,
+):
+    """Copies url to destination_path through a local HTTP cache.
+
+    A copy younger than ttl seconds is used without any request. Older copies
+    are revalidated with the server's own ETag and Last-Modified, so an
+    unchanged asset costs one 304; without either, it is downloaded again.
+    If the server cannot be reached, the last good copy is used. Returns
+    "fresh", "revalidated", "downloaded" or "stale"; raises if there is
+    neither a response nor a cached copy.
+    """
+    import urllib.error  # Loaded on first fetch; pulls in http and ssl
+    import urllib.request
+
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path, meta_path = _cache_paths(cache_dir, url)
+    meta = _read_meta(meta_path) if os.path.exists(body_path) else None
+
+    if meta and time.time() - meta.get("fetched_at", 0) < ttl:
+        status = "fresh"
+    else:
+        request = urllib.request.Request(url)
+        if meta and meta.get("etag"):
+            request.add_header("If-None-Match", meta["etag"])
+        if meta and meta.get("last_modified"):
+            request.add_header("If-Modified-Since", meta["last_modified"])
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                data = response.read()
+                headers = response.headers
+            _write_atomic(body_path, data)
+            meta = {
+                "url": url,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            }
+            status = "downloaded"
+        except urllib.error.HTTPError as e:
+            if not meta:
+                raise
+            if e.code == 304:
+                status = "revalidated"
+            else:
+                logging.warning(
+                    Fore.RED + f"Fetching {url} failed ({e}). Using the cached copy."
+                )
+                status = "stale"
+        except (urllib.error.URLError, OSError) as e:
+            if not meta:
+                raise
+            logging.warning(
+                Fore.RED + f"Fetching {url} failed ({e}). Using the cached copy."
+            )
+            status = "stale"
+
+        if status != "stale":
+            meta["fetched_at"] = time.time()
+            _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+    directory = os.path.dirname(destination_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    shutil.copyfile(body_path, destination_path)
+    return status
@@ -1,4 +1,4 @@
-# Define base content
+# Define base content (content_index adds official content found in the local install)
 BASE_GAME_CARS = {
     "ks_ferrari_250_gto",
     "ks_ferrari_288_gto",
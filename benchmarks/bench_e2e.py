@@ -0,0 +1,281 @@
+"""Runs the real main.py stages offline and reports per-stage time and bytes moved.
+
+Builds a synthetic content install and server pack, points main at a
+disk-backed fake GCS (fake_gcs.py) and a fake gcloud that maps the VM onto a
+local directory (fake_gcloud.py), then runs three scenarios: cold (empty
+bucket and VM), warm (nothing changed) and touched (one car changed).
+Stage times are inclusive (a stage that calls another includes it).
+Publishing overlaps the VM transfer, so stages that run at the same time
+may also count each other's bytes, and the total is less than the sum. Results
+can be saved as a baseline; later runs fail if a stage regresses past the
+tolerance. POSIX only (the fake VM runs commands with bash).
+
+Usage: python benchmarks/bench_e2e.py [--cars 4] [--tracks 1] [--scale 0.25]
+       [--sync-mode scp|delta|bucket] [--save-baseline] [--tolerance 0.25]
+"""
+
+import argparse
+import builtins
+import json
+import logging
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_gcs import FakeStorageClient  # noqa: E402
+from synthetic import make_car, make_server_pack, make_track  # noqa: E402
+
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+# main.py functions timed as stages
+STAGES = [
+    "find_non_base_content",
+    "publish_content",
+    "unzip_file",
+    "prepare_server_config",
+    "create_remote_directory",
+    "sync_to_gcp_vm",
+    "stage_bundle_in_gcs",
+    "pull_bundle_remote",
+    "upload_to_gcp_vm",
+    "stop_service_remote",
+    "replace_directories_remote",
+    "apply_delta_remote",
+    "start_service_remote",
+]
+
+# Stages faster than this are too noisy to flag as regressions
+NOISE_FLOOR_SECONDS = 0.05
+
+VM_SHIMS = {
+    "sudo": 'exec "$@"\n',
+    "chown": "exit 0\n",
+    "systemctl": 'case "$1" in is-active) echo active;; *) exit 0;; esac\n',
+    "journalctl": "echo 'no entries'\n",
+}
+
+
+def _write_script(path, body):
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\n" + body)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def build_fixture(work_dir, cars, tracks, scale):
+    """Creates the content install, server pack, fake VM and gcloud shim."""
+    content_dir = os.path.join(work_dir, "content")
+    car_names = [f"bench_car_{i:02d}" for i in range(cars)]
+    track_names = [f"bench_track_{i:02d}" for i in range(tracks)]
+    for name in car_names:
+        make_car(content_dir, name, scale=scale)
+    for name in track_names:
+        make_track(content_dir, name, scale=scale)
+    # A base-game car in the pack must not be uploaded
+    pack_path = make_server_pack(
+        os.path.join(work_dir, "pack.zip"), car_names + ["ks_ferrari_250_gto"], track_names
+    )
+
+    bin_dir = os.path.join(work_dir, "vm-bin")
+    os.makedirs(bin_dir)
+    for name, body in VM_SHIMS.items():
+        _write_script(os.path.join(bin_dir, name), body)
+    # Also on the fake VM's PATH, where bucket mode runs gcloud storage cp
+    gcloud_path = os.path.join(bin_dir, "gcloud")
+    _write_script(
+        gcloud_path,
+        f'exec "{sys.executable}" "{os.path.join(BENCH_DIR, "fake_gcloud.py")}" "$@"\n',
+    )
+    return content_dir, pack_path, bin_dir, gcloud_path
+
+
+def _transfer_bytes(log_path):
+    totals = {"scp": 0, "storage_cp": 0}
+    if os.path.exists(log_path):
+        with open(log_path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["op"] in totals:
+                    totals[entry["op"]] += entry["bytes"]
+    return totals
+
+
+def instrument(main, originals, client, log_path, stats):
+    """Replaces main's stage functions with timed wrappers that record into stats."""
+
+    def counters():
+        transfers = _transfer_bytes(log_path)
+        return client.counters["uploaded"], transfers["scp"], transfers["storage_cp"]
+
+    def wrap(name, func):
+        def timed(*args, **kwargs):
+            before = counters()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                after = counters()
+                entry = stats.setdefault(
+                    name, {"calls": 0, "seconds": 0.0, "gcs": 0, "scp": 0, "pull": 0}
+                )
+                entry["calls"] += 1
+                entry["seconds"] += elapsed
+                for key, b, a in zip(("gcs", "scp", "pull"), before, after):
+                    entry[key] += a - b
+
+        return timed
+
+    for name, func in originals.items():
+        setattr(main, name, wrap(name, func))
+
+
+def offline_download(url, destination_path):
+    """Writes a small track params file instead of fetching it from GitHub."""
+    with open(destination_path, "w") as f:
+        f.write("[BENCH]\nNAME=Bench\nLATITUDE=0\nLONGITUDE=0\nTIMEZONE=UTC\n")
+    return True
+
+
+def touch_one_car(content_dir):
+    """Rewrites one file of the first car so it needs zipping again."""
+    cars_dir = os.path.join(content_dir, "cars")
+    first = sorted(os.listdir(cars_dir))[0]
+    path = os.path.join(cars_dir, first, "data", "file_0.ini")
+    with open(path, "a") as f:
+        f.write(f"\n; touched {time.time()}\n")
+
+
+def print_report(results):
+    print(
+        f"{'scenario':<10}{'stage':<28}{'calls':>6}{'seconds':>10}"
+        f"{'GCS MB':>9}{'scp MB':>9}{'pull MB':>9}{'MB/s':>9}"
+    )
+    for scenario, data in results.items():
+        for name in STAGES:
+            entry = data["stages"].get(name)
+            if not entry:
+                continue
+            moved = (entry["gcs"] + entry["scp"] + entry["pull"]) / 1024 / 1024
+            rate = moved / entry["seconds"] if entry["seconds"] and moved else 0
+            print(
+                f"{scenario:<10}{name:<28}{entry['calls']:>6}{entry['seconds']:>10.3f}"
+                f"{entry['gcs'] / 1024 / 1024:>9.1f}{entry['scp'] / 1024 / 1024:>9.1f}"
+                f"{entry['pull'] / 1024 / 1024:>9.1f}{rate:>9.1f}"
+            )
+        print(f"{scenario:<10}{'total':<28}{'':>6}{data['seconds']:>10.3f}")
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of stages slower than the baseline by more than tolerance."""
+    regressions = []
+    for scenario, data in results.items():
+        old = baseline.get(scenario, {}).get("stages", {})
+        for name, entry in data["stages"].items():
+            before = old.get(name, {}).get("seconds")
+            if before is None or before < NOISE_FLOOR_SECONDS:
+                continue
+            if entry["seconds"] > before * (1 + tolerance):
+                regressions.append(
+                    f"{scenario}/{name}: {entry['seconds']:.3f}s vs {before:.3f}s baseline"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cars", type=int, default=4)
+    parser.add_argument("--tracks", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=0.25, help="size multiplier")
+    parser.add_argument("--sync-mode", choices=["scp", "delta", "bucket"], default="scp")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--keep", help="build everything in this directory")
+    parser.add_argument("--verbose", action="store_true", help="show main.py logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    work_dir = os.path.abspath(args.keep or tempfile.mkdtemp(prefix="ac-bench-e2e-"))
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        content_dir, pack_path, bin_dir, gcloud_path = build_fixture(
+            work_dir, args.cars, args.tracks, args.scale
+        )
+        bucket_root = os.path.join(work_dir, "bucket")
+        vm_root = os.path.join(work_dir, "vm")
+        log_path = os.path.join(work_dir, "gcloud.log")
+        os.makedirs(bucket_root)
+        os.environ.update(
+            GOOGLE_APPLICATION_CREDENTIALS=os.path.join(work_dir, "credentials.json"),
+            GCP_BUCKET_NAME="bench-bucket",
+            ASSETTO_CORSA_DIR=content_dir,
+            GCP_VM_INSTANCE_NAME="bench-vm",
+            GCP_VM_ZONE="bench-zone",
+            GCP_VM_USER="bench",
+            VM_SYNC_MODE=args.sync_mode,
+            FAKE_GCS_ROOT=bucket_root,
+            FAKE_GCLOUD_LOG=log_path,
+            FAKE_VM_BIN=bin_dir,
+        )
+        # uploads/ and the local caches are created in the working directory
+        os.chdir(work_dir)
+
+        import gcs
+        import main as tool
+
+        client = FakeStorageClient(bucket_root)
+        gcs.set_storage_client(client)
+        tool.find_gcloud_path = lambda: gcloud_path
+        tool.REMOTE_ROOT = os.path.join(vm_root, "opt", "ac")
+        tool.vm_destination_path = os.path.join(vm_root, "home", "assetto")
+        os.makedirs(tool.REMOTE_ROOT)
+        tool.download_file = offline_download
+        builtins.input = lambda prompt="": pack_path
+        originals = {name: getattr(tool, name) for name in STAGES}
+
+        results = {}
+        for scenario in ("cold", "warm", "touched"):
+            if scenario == "touched":
+                touch_one_car(content_dir)
+            stats = {}
+            instrument(tool, originals, client, log_path, stats)
+            start = time.perf_counter()
+            tool.main()
+            results[scenario] = {
+                "seconds": time.perf_counter() - start,
+                "stages": stats,
+            }
+
+        print(
+            f"{args.cars} cars, {args.tracks} tracks, scale {args.scale}, "
+            f"sync mode {args.sync_mode}"
+        )
+        print_report(results)
+
+        baseline_path = os.path.join(BASELINE_DIR, f"e2e-{args.sync_mode}.json")
+        if args.save_baseline:
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            with open(baseline_path, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            print(f"Saved baseline to {baseline_path}")
+        elif os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+            for line in regressions:
+                print(f"REGRESSION: {line}")
+            if regressions:
+                sys.exit(1)
+            print("OK: no stage regressed past the baseline")
+    finally:
+        os.chdir(BENCH_DIR)
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Guards the import time of main.py using python -X importtime.
+
+Exits non-zero if importing main takes longer than the budget, or if any
+module that should only load when a stage runs (GCP client libraries,
+dotenv, urllib.request, asyncio) is imported eagerly.
+
+Usage: python benchmarks/bench_startup.py [--budget-ms 150] [--runs 5]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported just by importing main
+LAZY_MODULES = [
+    "google.cloud.storage",
+    "google.auth",
+    "dotenv",
+    "urllib.request",
+    "asyncio",
+]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure():
+    """Imports main in a fresh interpreter; returns ({module: cumulative us}, total us)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing main failed:\n{result.stderr}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules, modules.get("main", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    totals = []
+    modules = {}
+    for _ in range(args.runs):
+        modules, total = measure()
+        totals.append(total)
+    median_ms = statistics.median(totals) / 1000
+
+    print(f"import main: median {median_ms:.1f} ms over {args.runs} runs")
+    print("Slowest imports (cumulative):")
+    for name, us in sorted(modules.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: {median_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
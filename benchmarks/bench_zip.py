@@ -0,0 +1,79 @@
+"""Compares archive wall time and size for the zip compression policies.
+
+Usage: python benchmarks/bench_zip.py [--scale 1.0] [--skins 8] [--keep DIR]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import DEFAULT_POLICY, FAST, MAX, build_zip  # noqa: E402
+from synthetic import make_car  # noqa: E402
+
+
+def _tree_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path)
+        for f in files
+    )
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="size multiplier")
+    parser.add_argument("--skins", type=int, default=8, help="skins per car")
+    parser.add_argument("--keep", help="build the synthetic tree in this directory")
+    args = parser.parse_args()
+
+    work_dir = args.keep or tempfile.mkdtemp(prefix="ac-bench-zip-")
+    try:
+        car_dir = make_car(work_dir, "bench_car", skins=args.skins, scale=args.scale)
+        raw = _tree_size(car_dir)
+        print(f"Synthetic car: {raw / 1024 / 1024:.1f} MB in {car_dir}")
+
+        all_fast = {ext: FAST for ext in DEFAULT_POLICY}
+        all_max = {ext: MAX for ext in DEFAULT_POLICY}
+        cases = [
+            ("make_archive", lambda out: shutil.make_archive(out[:-4], "zip", car_dir)),
+            ("policy", lambda out: build_zip(car_dir, out)),
+            ("policy+auto", lambda out: build_zip(car_dir, out, auto=True)),
+            ("all-fast", lambda out: build_zip(car_dir, out, policy=all_fast)),
+            ("all-max", lambda out: build_zip(car_dir, out, policy=all_max)),
+        ]
+
+        print(f"{'case':<14}{'seconds':>10}{'MB':>10}{'ratio':>8}{'MB/s':>10}")
+        for name, build in cases:
+            out = os.path.join(work_dir, f"{name}.zip")
+            start = time.perf_counter()
+            build(out)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(out)
+            print(
+                f"{name:<14}{elapsed:>10.2f}{size / 1024 / 1024:>10.1f}"
+                f"{size / raw:>8.3f}{raw / 1024 / 1024 / elapsed:>10.1f}"
+            )
+
+        first = os.path.join(work_dir, "policy.zip")
+        second = os.path.join(work_dir, "policy-again.zip")
+        build_zip(car_dir, second)
+        same = _sha256(first) == _sha256(second)
+        print(f"Deterministic output: {'yes' if same else 'NO'}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
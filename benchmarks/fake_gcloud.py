@@ -0,0 +1,96 @@
+"""Stand-in for the gcloud CLI that maps the VM onto the local machine.
+
+Handles the three commands the tool runs:
+
+    gcloud compute ssh VM --zone Z [--ssh-flag=...] --command CMD
+    gcloud compute scp --recurse [--scp-flag=...] LOCAL USER@VM:DEST --zone Z
+    gcloud storage cp gs://BUCKET/NAME DEST
+
+ssh runs CMD with bash, with FAKE_VM_BIN (sudo/systemctl/journalctl shims)
+first on PATH. storage cp reads objects from FAKE_GCS_ROOT, the directory
+behind benchmarks/fake_gcs.py. Every transfer appends a JSON line with its
+byte count to FAKE_GCLOUD_LOG. POSIX only.
+"""
+
+import json
+import os
+import shutil
+import sys
+
+
+def _tree_bytes(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, f))
+        for root, _, files in os.walk(path)
+        for f in files
+    )
+
+
+def _log(op, nbytes=0):
+    log_path = os.environ.get("FAKE_GCLOUD_LOG")
+    if log_path:
+        with open(log_path, "a") as f:
+            f.write(json.dumps({"op": op, "bytes": nbytes}) + "\n")
+
+
+def _positional(args):
+    """Drops flags (and the values of --zone/--command) from a gcloud argv."""
+    out = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in ("--zone", "--command"):
+            skip = True
+        elif not arg.startswith("--"):
+            out.append(arg)
+    return out
+
+
+def ssh(args):
+    command = args[args.index("--command") + 1]
+    _log("ssh")
+    env = dict(os.environ)
+    env["PATH"] = os.environ["FAKE_VM_BIN"] + os.pathsep + env.get("PATH", "")
+    sys.stdout.flush()
+    os.execvpe("bash", ["bash", "-c", command], env)
+
+
+def scp(args):
+    local, remote = _positional(args)
+    destination = remote.split(":", 1)[1]
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(local.rstrip("/")))
+    if os.path.isdir(local):
+        shutil.copytree(local, destination, dirs_exist_ok=True)
+    else:
+        shutil.copyfile(local, destination)
+    _log("scp", _tree_bytes(local))
+
+
+def storage_cp(args):
+    source, destination = _positional(args)
+    bucket, _, name = source[len("gs://") :].partition("/")
+    path = os.path.join(os.environ["FAKE_GCS_ROOT"], bucket, *name.split("/"))
+    if not os.path.exists(path):
+        sys.exit(f"ERROR: {source} not found")
+    shutil.copyfile(path, destination)
+    _log("storage_cp", os.path.getsize(path))
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:2] == ["compute", "ssh"]:
+        ssh(args[2:])
+    elif args[:2] == ["compute", "scp"]:
+        scp(args[2:])
+    elif args[:2] == ["storage", "cp"]:
+        storage_cp(args[2:])
+    else:
+        sys.exit(f"fake gcloud: unsupported command {args}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Disk-backed stand-in for the google-cloud-storage client used by the benchmarks.
+
+Object bytes live under <root>/<bucket>/<name> so the fake gcloud shim can
+serve ``gcloud storage cp gs://...`` from the same place; metadata is kept in
+memory. Only the calls this tool makes are implemented. Install it with
+``gcs.set_storage_client(FakeStorageClient(root))``.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import threading
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.metadata = None
+        self.content_type = None
+        self.crc32c = None
+        self._loaded = False
+
+    @property
+    def _path(self):
+        return os.path.join(self.bucket.path, *self.name.split("/"))
+
+    @property
+    def size(self):
+        return os.path.getsize(self._path) if os.path.exists(self._path) else None
+
+    @property
+    def md5_hash(self):
+        return self.bucket.client._md5.get((self.bucket.name, self.name))
+
+    @property
+    def public_url(self):
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    def _store(self, data, uploaded=True):
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with open(self._path, "wb") as f:
+            f.write(data)
+        self.bucket.client._set_meta(self.bucket.name, self.name, self.metadata)
+        self.bucket.client._md5[(self.bucket.name, self.name)] = base64.b64encode(
+            hashlib.md5(data).digest()
+        ).decode()
+        # Server-side compose moves no bytes over the network
+        self.bucket.client._count("uploaded", len(data) if uploaded else 0)
+
+    def exists(self, **kwargs):
+        self.bucket.client._count("requests")
+        return os.path.exists(self._path)
+
+    def upload_from_filename(self, filename, **kwargs):
+        with open(filename, "rb") as f:
+            self._store(f.read())
+
+    def upload_from_file(self, file_obj, size=None, **kwargs):
+        self._store(file_obj.read(size) if size is not None else file_obj.read())
+
+    def upload_from_string(self, data, **kwargs):
+        self._store(data.encode("utf-8") if isinstance(data, str) else data)
+
+    def open(self, mode="rb", **kwargs):
+        if "w" not in mode:
+            with open(self._path, "rb") as f:
+                return io.BytesIO(f.read())
+        blob = self
+
+        class _Writer(io.RawIOBase):
+            def __init__(self):
+                self.buffer = io.BytesIO()
+
+            def writable(self):
+                return True
+
+            def write(self, data):
+                return self.buffer.write(data)
+
+            def close(self):
+                if not self.closed:
+                    blob._store(self.buffer.getvalue())
+                super().close()
+
+        return io.BufferedWriter(_Writer())
+
+    def compose(self, sources, **kwargs):
+        data = b""
+        for source in sources:
+            with open(source._path, "rb") as f:
+                data += f.read()
+        self._store(data, uploaded=False)
+
+    def reload(self, **kwargs):
+        if not os.path.exists(self._path):
+            raise FileNotFoundError(self.name)
+        self.metadata = self.bucket.client._get_meta(self.bucket.name, self.name)
+        self._loaded = True
+
+    def patch(self, **kwargs):
+        self.bucket.client._set_meta(self.bucket.name, self.name, self.metadata)
+
+    def make_public(self, **kwargs):
+        self.bucket.client._count("requests")
+
+    def delete(self, **kwargs):
+        if os.path.exists(self._path):
+            os.remove(self._path)
+
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.path = os.path.join(client.root, name)
+
+    def blob(self, name, **kwargs):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name, **kwargs):
+        blob = FakeBlob(self, name)
+        if not os.path.exists(blob._path):
+            return None
+        blob.reload()
+        return blob
+
+
+class FakeStorageClient:
+    """Counts bytes uploaded and requests made so benchmarks can report them."""
+
+    def __init__(self, root):
+        self.root = root
+        self.counters = {"uploaded": 0, "requests": 0}
+        self._metadata = {}
+        self._md5 = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+            if name != "requests":
+                self.counters["requests"] += 1
+
+    def _set_meta(self, bucket_name, name, metadata):
+        with self._lock:
+            self._metadata[(bucket_name, name)] = dict(metadata or {})
+
+    def _get_meta(self, bucket_name, name):
+        with self._lock:
+            return dict(self._metadata.get((bucket_name, name), {}))
+
+    def bucket(self, name):
+        return FakeBucket(self, name)
+
+    def list_blobs(self, bucket_name, prefix="", **kwargs):
+        self._count("requests")
+        bucket = self.bucket(bucket_name)
+        names = []
+        for dirpath, _, files in os.walk(bucket.path):
+            for file_name in files:
+                rel = os.path.relpath(os.path.join(dirpath, file_name), bucket.path)
+                names.append(rel.replace(os.sep, "/"))
+        blobs = []
+        for name in sorted(names):
+            if name.startswith(prefix):
+                blob = FakeBlob(bucket, name)
+                blob.reload()
+                blobs.append(blob)
+        return iter(blobs)
@@ -0,0 +1,131 @@
+"""Generators for synthetic Assetto Corsa content used by the benchmarks."""
+
+import os
+import random
+import struct
+import zipfile
+
+MB = 1024 * 1024
+
+
+def _texture_bytes(rng, size):
+    # Block-compressed textures: mostly high-entropy blocks with some flat areas
+    out = bytearray()
+    while len(out) < size:
+        if rng.random() < 0.15:
+            out += bytes(4096)
+        else:
+            out += rng.randbytes(4096)
+    return bytes(out[:size])
+
+
+def _mesh_bytes(rng, size):
+    # kn5 geometry: float vertex streams with repeating structure
+    out = bytearray()
+    while len(out) < size:
+        x, y, z = (rng.uniform(-5, 5) for _ in range(3))
+        out += struct.pack("<8f", x, y, z, 0.0, 1.0, 0.0, round(x, 2), round(z, 2))
+    return bytes(out[:size])
+
+
+def _media_bytes(rng, size):
+    # Already-compressed media (png/jpg/ogg/bank): incompressible
+    return rng.randbytes(size)
+
+
+def _ini_text(rng, lines):
+    return "".join(
+        f"[SECTION_{i // 8}]\nKEY_{i}={rng.uniform(0, 100):.4f}\n" for i in range(lines)
+    ).encode()
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def make_car(root, name, skins=8, scale=1.0, seed=0):
+    """Creates a car folder shaped like a typical mod and returns its path."""
+    rng = random.Random(f"{seed}-{name}")
+    car_dir = os.path.join(root, "cars", name)
+    mb = int(MB * scale)
+    _write(os.path.join(car_dir, f"{name}.kn5"), _mesh_bytes(rng, 12 * mb))
+    _write(os.path.join(car_dir, f"{name}_lod_b.kn5"), _mesh_bytes(rng, 3 * mb))
+    _write(os.path.join(car_dir, "data.acd"), _media_bytes(rng, mb // 8))
+    for i in range(20):
+        _write(os.path.join(car_dir, "data", f"file_{i}.ini"), _ini_text(rng, 60))
+        _write(os.path.join(car_dir, "data", f"curve_{i}.lut"), _ini_text(rng, 30))
+    _write(os.path.join(car_dir, "sfx", f"{name}.bank"), _media_bytes(rng, 2 * mb))
+    _write(os.path.join(car_dir, "sfx", "GUIDs.txt"), _ini_text(rng, 40))
+    _write(os.path.join(car_dir, "ui", "badge.png"), _media_bytes(rng, mb // 16))
+    _write(os.path.join(car_dir, "ui", "ui_car.json"), _ini_text(rng, 20))
+    for s in range(skins):
+        skin_dir = os.path.join(car_dir, "skins", f"skin_{s:02d}")
+        _write(os.path.join(skin_dir, "livery.dds"), _texture_bytes(rng, 2 * mb))
+        _write(os.path.join(skin_dir, "preview.jpg"), _media_bytes(rng, mb // 8))
+        _write(os.path.join(skin_dir, "ui_skin.json"), _ini_text(rng, 4))
+    return car_dir
+
+
+def make_track(root, name, layouts=2, scale=1.0, seed=0):
+    """Creates a multi-layout track folder and returns its path."""
+    rng = random.Random(f"{seed}-{name}")
+    track_dir = os.path.join(root, "tracks", name)
+    mb = int(MB * scale)
+    _write(os.path.join(track_dir, f"{name}.kn5"), _mesh_bytes(rng, 40 * mb))
+    _write(os.path.join(track_dir, "texture", "atlas.dds"), _texture_bytes(rng, 8 * mb))
+    for layout in range(layouts):
+        layout_name = f"layout_{layout}"
+        _write(
+            os.path.join(track_dir, f"models_{layout_name}.ini"), _ini_text(rng, 10)
+        )
+        _write(
+            os.path.join(track_dir, layout_name, "ai", "fast_lane.ai"),
+            _mesh_bytes(rng, mb),
+        )
+        _write(
+            os.path.join(track_dir, layout_name, "data", "surfaces.ini"),
+            _ini_text(rng, 80),
+        )
+        _write(
+            os.path.join(track_dir, "ui", layout_name, "preview.png"),
+            _media_bytes(rng, mb // 4),
+        )
+    return track_dir
+
+
+def make_server_pack(path, cars, tracks, seed=0):
+    """Creates a server-pack zip (cfg/content/system) that references cars and tracks.
+
+    Like packs exported by Content Manager, content/ holds only the data the
+    server needs (data.acd, ui files, surfaces), not meshes or textures.
+    """
+    rng = random.Random(f"{seed}-pack")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as pack:
+        pack.writestr(
+            "cfg/server_cfg.ini",
+            f"[SERVER]\nNAME=bench\nCARS={';'.join(cars)}\nTRACK={tracks[0]}\n",
+        )
+        pack.writestr(
+            "cfg/entry_list.ini",
+            "".join(
+                f"[CAR_{i}]\nMODEL={car}\nSKIN=skin_{i % 4:02d}\n\n"
+                for i, car in enumerate(cars * 2)
+            ),
+        )
+        pack.writestr("cfg/cm_content/content.json", '{"cars": {}, "track": {}}')
+        for car in cars:
+            pack.writestr(f"content/cars/{car}/data.acd", _media_bytes(rng, MB // 8))
+            pack.writestr(f"content/cars/{car}/ui/ui_car.json", _ini_text(rng, 20))
+        for track in tracks:
+            for layout in ("layout_0", "layout_1"):
+                pack.writestr(
+                    f"content/tracks/{track}/{layout}/data/surfaces.ini",
+                    _ini_text(rng, 80),
+                )
+            pack.writestr(f"content/tracks/{track}/ui/ui_track.json", _ini_text(rng, 10))
+        for i in range(10):
+            pack.writestr(f"system/cfg/file_{i}.ini", _ini_text(rng, 40))
+        pack.writestr("system/data/surfaces.ini", _ini_text(rng, 200))
+    return path
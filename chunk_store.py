@@ -0,0 +1,241 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import zlib
+from zipfile import ZipFile
+
+from colorama import Fore
+
+from archive import (
+    COMPRESSION_METHODS,
+    COPY_CHUNK_SIZE,
+    add_file,
+    choose_method,
+    entry_info,
+    iter_directory,
+)
+from gcs import compose_blobs, get_storage_client
+
+# Bucket layout of the chunk store. Data objects are named after the SHA-256
+# of the file they hold plus the compression method, so a texture shared by
+# several mods (or unchanged between versions) is stored once. Segments hold
+# zip headers and small files, one run per directory, plus the central
+# directory, named after their own SHA-256. Each mod's manifest lists the
+# parts its public zip is composed of.
+CAS_PREFIX = "cas/"
+DATA_PREFIX = "cas/data/"
+SEGMENT_PREFIX = "cas/segments/"
+MANIFEST_PREFIX = "cas/manifests/"
+
+# Files smaller than this are kept inside the segments instead of getting
+# their own data object, which keeps the number of compose sources down
+INLINE_FILE_SIZE = 256 * 1024
+
+# Object metadata key holding the CRC-32 of a data object's uncompressed file
+CRC_METADATA_KEY = "ac-crc32"
+
+
+class _SegmentWriter:
+    """Write-only file object that splits a zip into segments around stored entries.
+
+    zipfile writes headers and small entries into the current in-memory
+    segment; split() ends it, and splice() ends it and puts an existing
+    object in the archive, advancing the offset by its size so later
+    headers point past it.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self._buffer = io.BytesIO()
+        self._offset = 0
+
+    def write(self, data):
+        written = self._buffer.write(data)
+        self._offset += written
+        return written
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def split(self):
+        data = self._buffer.getvalue()
+        if data:
+            self.parts.append(("segment", data))
+        self._buffer = io.BytesIO()
+
+    def splice(self, blob_name, size):
+        self.split()
+        self.parts.append(("blob", blob_name))
+        self._offset += size
+
+    def finish(self):
+        self.split()
+        return self.parts
+
+
+def compress_file(path, method, out):
+    """Writes a file's zip entry data for method into out.
+
+    Returns (crc32, sha256) of the uncompressed contents.
+    """
+    level = COMPRESSION_METHODS[method][1]
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if level else None
+    crc = 0
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+            digest.update(chunk)
+            out.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        out.write(compressor.flush())
+    return crc, digest.hexdigest()
+
+
+def data_blob_name(sha256, method):
+    return f"{DATA_PREFIX}{sha256}.{method}"
+
+
+def segment_blob_name(data):
+    return f"{SEGMENT_PREFIX}{hashlib.sha256(data).hexdigest()}"
+
+
+def build_layout(source_dir, files, data_blob, policy=None, auto=False, include=None):
+    """Lays out a mod directory as a zip made of segments and data objects.
+
+    files maps each relative path to [size, mtime_ns, sha256], as recorded by
+    fingerprint_tree. data_blob(path, sha256, method) must make sure the
+    file's data object exists and return (blob name, crc32, stored size).
+    Returns a list of ("segment", bytes) and ("blob", name) parts whose
+    concatenation is a standard zip archive. include selects entries as in
+    iter_directory.
+
+    Segments end wherever the entries' parent directory changes, and the
+    central directory gets its own segment. Local headers hold no offsets,
+    so editing a small file only renames its directory's segment and the
+    central directory; the other segments are reused.
+    """
+    writer = _SegmentWriter()
+    with ZipFile(writer, "w") as zip_ref:
+        parent = None
+        for path, arcname, is_dir in iter_directory(source_dir, include):
+            if arcname.rpartition("/")[0] != parent:
+                parent = arcname.rpartition("/")[0]
+                writer.split()
+            if is_dir:
+                zip_ref.writestr(entry_info(arcname, True), b"")
+                continue
+            method = choose_method(path, policy, auto)
+            size = os.path.getsize(path)
+            known = files.get(arcname)
+            if size < INLINE_FILE_SIZE or not known or known[0] != size:
+                add_file(zip_ref, path, arcname, method)
+                continue
+
+            name, crc, stored_size = data_blob(path, known[2], method)
+            info = entry_info(arcname, False, method)
+            info.file_size = size
+            info.CRC = crc
+            info.compress_size = stored_size
+            info.header_offset = writer.tell()
+            writer.write(info.FileHeader())
+            writer.splice(name, stored_size)
+            # Register the entry so the central directory includes it
+            zip_ref.filelist.append(info)
+            zip_ref.NameToInfo[info.filename] = info
+            zip_ref.start_dir = writer.tell()
+        writer.split()
+    return writer.finish()
+
+
+def publish_mod(
+    bucket_name,
+    blob_name,
+    source_dir,
+    files,
+    inventory,
+    metadata=None,
+    cache_control=None,
+    policy=None,
+    auto=False,
+    throttle=None,
+    include=None,
+    chunk_size=None,
+    client=None,
+):
+    """Publishes a mod directory as blob_name, composed in the bucket from stored parts.
+
+    Only data objects and segments missing from the inventory (which must
+    cover CAS_PREFIX) are uploaded, so an update costs roughly the changed
+    files. Writes the mod's manifest under MANIFEST_PREFIX. throttle, if
+    given, wraps the file object of each upload, and chunk_size sets their
+    resumable chunk size; include selects entries as in iter_directory.
+    Returns (composed blob, bytes uploaded).
+    """
+    client = client or get_storage_client()
+    throttle = throttle or (lambda fileobj: fileobj)
+    bucket = client.bucket(bucket_name)
+    uploaded = 0
+
+    def data_blob(path, sha256, method):
+        nonlocal uploaded
+        name = data_blob_name(sha256, method)
+        known = inventory.get(name)
+        if known is not None and CRC_METADATA_KEY in known.metadata:
+            return name, int(known.metadata[CRC_METADATA_KEY]), known.size
+
+        with tempfile.TemporaryFile() as tmp:
+            crc, actual_sha256 = compress_file(path, method, tmp)
+            if actual_sha256 != sha256:
+                # Never store content under another content's name
+                raise RuntimeError(f"{path} changed while it was being published.")
+            size = tmp.tell()
+            tmp.seek(0)
+            blob = bucket.blob(name, chunk_size=chunk_size)
+            blob.metadata = {CRC_METADATA_KEY: str(crc)}
+            blob.upload_from_file(throttle(tmp), size=size, checksum="crc32c")
+        inventory.record(blob)
+        uploaded += size
+        return name, crc, size
+
+    sources = []
+    parts = build_layout(source_dir, files, data_blob, policy, auto, include)
+    for kind, value in parts:
+        if kind == "blob":
+            sources.append(value)
+            continue
+        name = segment_blob_name(value)
+        if not inventory.exists(name):
+            blob = bucket.blob(name, chunk_size=chunk_size)
+            blob.upload_from_file(
+                throttle(io.BytesIO(value)),
+                size=len(value),
+                content_type="application/octet-stream",
+            )
+            inventory.record(blob)
+            uploaded += len(value)
+        sources.append(name)
+
+    blob = compose_blobs(
+        bucket_name,
+        blob_name,
+        sources,
+        metadata=metadata,
+        cache_control=cache_control,
+        client=client,
+    )
+    bucket.blob(f"{MANIFEST_PREFIX}{blob_name}.json").upload_from_string(
+        json.dumps({"object": blob_name, "metadata": metadata, "sources": sources}),
+        content_type="application/json",
+    )
+    logging.info(
+        Fore.BLUE
+        + f"Composed {blob_name} from {len(sources)} parts; uploaded {uploaded / 1024:.0f} KB."
+    )
+    return blob, uploaded
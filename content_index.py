@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import os
+import re
+
+from colorama import Fore
+
+from base_content import BASE_GAME_CARS, BASE_GAME_TRACKS
+
+# Cached index of official content, rebuilt only when the install's fingerprint changes
+DEFAULT_INDEX_PATH = os.path.join("uploads", "base_content_index.json")
+
+# Bump when the detection rules change so existing indexes are rebuilt
+INDEX_VERSION = 2
+
+# Kunos names every car and track shipped since 1.0 (base game and DLC) with this prefix
+KUNOS_PREFIX = "ks_"
+
+# Authors written into the ui files of official content
+KUNOS_AUTHORS = {"kunos simulazioni", "kunos"}
+
+# ui files are often not strict JSON (BOMs, trailing commas), so only the author is matched
+AUTHOR_FIELD = re.compile(rb'"author"\s*:\s*"([^"]*)"', re.IGNORECASE)
+
+UI_FILE_NAMES = {"cars": "ui_car.json", "tracks": "ui_track.json"}
+
+
+def install_fingerprint(content_dir):
+    """Hashes the names and directory mtimes of every car and track.
+
+    Adding, removing or updating content (Steam rewrites the folder) changes
+    the fingerprint; it costs one stat per folder, not a content scan.
+    """
+    combined = hashlib.sha256(f"v{INDEX_VERSION}\n".encode("utf-8"))
+    for kind in ("cars", "tracks"):
+        kind_dir = os.path.join(content_dir, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        with os.scandir(kind_dir) as it:
+            entries = sorted(
+                (entry.name, entry.stat().st_mtime_ns)
+                for entry in it
+                if entry.is_dir()
+            )
+        for name, mtime_ns in entries:
+            combined.update(f"{kind}/{name}\0{mtime_ns}\n".encode("utf-8"))
+    return combined.hexdigest()
+
+
+def _ui_authors(folder, kind):
+    """Yields the author of each ui file in a car or track folder."""
+    ui_dir = os.path.join(folder, "ui")
+    file_name = UI_FILE_NAMES[kind]
+    # Tracks with several layouts keep one ui file per layout subfolder
+    candidates = [os.path.join(ui_dir, file_name)]
+    if kind == "tracks" and os.path.isdir(ui_dir):
+        candidates += [
+            os.path.join(ui_dir, layout, file_name) for layout in os.listdir(ui_dir)
+        ]
+    for path in candidates:
+        try:
+            with open(path, "rb") as f:
+                match = AUTHOR_FIELD.search(f.read())
+        except OSError:
+            continue
+        if match:
+            yield match.group(1).decode("utf-8", errors="replace").strip().lower()
+
+
+def is_official(content_dir, kind, name):
+    """Decides whether an installed car or track is official Kunos content.
+
+    Names in the known base sets are always official. Otherwise the folder
+    needs the ks_ prefix and ui files naming Kunos as the only author; mods
+    reusing the prefix are caught by their own author field, or by having
+    none, so they are uploaded rather than silently skipped.
+    """
+    known = BASE_GAME_CARS if kind == "cars" else BASE_GAME_TRACKS
+    if name in known:
+        return True
+    if not name.startswith(KUNOS_PREFIX):
+        return False
+    authors = list(_ui_authors(os.path.join(content_dir, kind, name), kind))
+    return bool(authors) and all(author in KUNOS_AUTHORS for author in authors)
+
+
+def build_index(content_dir):
+    """Scans the install and returns {"cars": [...], "tracks": [...]} of official content."""
+    index = {}
+    for kind in ("cars", "tracks"):
+        kind_dir = os.path.join(content_dir, kind)
+        names = os.listdir(kind_dir) if os.path.isdir(kind_dir) else []
+        index[kind] = sorted(
+            name
+            for name in names
+            if os.path.isdir(os.path.join(kind_dir, name))
+            and is_official(content_dir, kind, name)
+        )
+    return index
+
+
+def load_base_content(content_dir, index_path=DEFAULT_INDEX_PATH):
+    """Returns (cars, tracks) frozensets of official content for the install.
+
+    The index is cached on disk with the install's fingerprint and rebuilt
+    only when that changes. The hardcoded base sets are always included, so
+    content missing from the local install is still recognized.
+    """
+    cars, tracks = set(BASE_GAME_CARS), set(BASE_GAME_TRACKS)
+    if not content_dir or not os.path.isdir(content_dir):
+        return frozenset(cars), frozenset(tracks)
+
+    fingerprint = install_fingerprint(content_dir)
+    index = None
+    try:
+        with open(index_path, "r") as f:
+            cached = json.load(f)
+        if cached.get("fingerprint") == fingerprint:
+            index = cached
+    except (OSError, ValueError):
+        pass
+
+    if index is None:
+        logging.info(Fore.BLUE + f"Indexing official content in {content_dir}...")
+        index = build_index(content_dir)
+        index["fingerprint"] = fingerprint
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, index_path)
+        logging.info(
+            Fore.BLUE
+            + f"Indexed {len(index['cars'])} official cars and {len(index['tracks'])} official tracks."
+        )
+
+    cars.update(index["cars"])
+    tracks.update(index["tracks"])
+    return frozenset(cars), frozenset(tracks)
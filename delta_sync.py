@@ -0,0 +1,151 @@
+import base64
+import io
+import json
+import os
+import tarfile
+import time
+
+from server_pack import stream_crc32
+
+# Name of the null-separated list of deleted paths carried inside a delta archive
+DELETE_LIST_NAME = ".deploy-removed"
+
+# Owner given to every entry so the server user owns extracted files by name
+REMOTE_OWNER = "ac"
+
+# Runs on the VM with python3: prints {relative path: [size, crc32]} for the
+# given folders under root. CRC-32 matches what zip central directories already
+# record, so pack entries can be compared without decompressing them. Checksums
+# are cached next to the tree by (size, mtime), so unchanged files are not
+# re-read on later deploys.
+REMOTE_MANIFEST_SCRIPT = r"""
+import json, os, sys, zlib
+root = sys.argv[1]
+cache_path = os.path.join(root, ".deploy-manifest-crc-cache.json")
+try:
+    with open(cache_path) as f:
+        cache = json.load(f)
+except Exception:
+    cache = {}
+out = {}
+for folder in sys.argv[2:]:
+    for dirpath, _, files in os.walk(os.path.join(root, folder)):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root)
+            st = os.stat(path)
+            known = cache.get(rel)
+            if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+                digest = known[2]
+            else:
+                digest = 0
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        digest = zlib.crc32(chunk, digest)
+            out[rel] = [st.st_size, st.st_mtime_ns, digest]
+with open(cache_path, "w") as f:
+    json.dump(out, f)
+json.dump({rel: [v[0], v[2]] for rel, v in out.items()}, sys.stdout)
+"""
+
+
+def remote_manifest_command(root, folders):
+    """Returns a shell command that prints the manifest of folders under root."""
+    encoded = base64.b64encode(REMOTE_MANIFEST_SCRIPT.encode("utf-8")).decode()
+    return (
+        f"echo {encoded} | base64 -d | sudo python3 - '{root}' "
+        + " ".join(f"'{folder}'" for folder in folders)
+    )
+
+
+def parse_remote_manifest(output):
+    """Parses the JSON printed by the remote manifest script."""
+    # gcloud may print banner lines before the command output
+    start = output.find("{")
+    if start < 0:
+        return {}
+    return {rel: tuple(value) for rel, value in json.loads(output[start:]).items()}
+
+
+def build_local_manifest(files):
+    """Returns {relative path: (size, crc32)} for a list of DeployFiles.
+
+    Zip entries already carry their CRC; local files are read to compute it.
+    """
+    manifest = {}
+    for deploy_file in files:
+        crc = deploy_file.crc32
+        if crc is None:
+            with deploy_file.open() as f:
+                crc = stream_crc32(f)
+        manifest[deploy_file.relpath] = (deploy_file.size, crc)
+    return manifest
+
+
+def diff_manifests(local, remote):
+    """Returns (changed, removed): paths to send and paths to delete remotely."""
+    changed = sorted(rel for rel, entry in local.items() if remote.get(rel) != entry)
+    removed = sorted(rel for rel in remote if rel not in local)
+    return changed, removed
+
+
+def _owned(info):
+    info.uid = info.gid = 0
+    info.uname = info.gname = REMOTE_OWNER
+    return info
+
+
+def write_delta_archive(files, changed, removed, output_path):
+    """Packs changed files and the delete list into a gzipped tar.
+
+    files maps relative paths to DeployFiles, so entries can be streamed from
+    the server pack without extracting them first. Parent directories are
+    added explicitly so they are created with the server user as owner.
+    Returns the archive size in bytes.
+    """
+    parents = set()
+    for rel in changed:
+        parent = os.path.dirname(rel)
+        while parent and parent not in parents:
+            parents.add(parent)
+            parent = os.path.dirname(parent)
+
+    with tarfile.open(output_path, "w:gz", compresslevel=1) as tar:
+        for rel in sorted(parents):
+            info = tarfile.TarInfo(rel)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            tar.addfile(_owned(info))
+        for rel in changed:
+            info = tarfile.TarInfo(rel)
+            info.size = files[rel].size
+            info.mode = 0o644
+            info.mtime = time.time()
+            with files[rel].open() as f:
+                tar.addfile(_owned(info), f)
+        if removed:
+            data = b"\0".join(rel.encode("utf-8") for rel in removed)
+            info = tarfile.TarInfo(DELETE_LIST_NAME)
+            info.size = len(data)
+            info.mode = 0o644
+            tar.addfile(_owned(info), io.BytesIO(data))
+    return os.path.getsize(output_path)
+
+
+def apply_delta_command(archive_path, root, folders):
+    """Returns a shell command that applies a delta archive on the VM.
+
+    The archive is deleted whatever happens, but the command exits non-zero
+    if extracting, deleting or pruning failed, so a bad delta is never
+    reported as synced. Folders missing under root are skipped.
+    """
+    folder_args = " ".join(f"'{folder}'" for folder in folders)
+    return (
+        f"( cd '{root}' && sudo tar -xzf '{archive_path}' && "
+        f"if [ -f {DELETE_LIST_NAME} ]; then "
+        f"sudo xargs -0 -r rm -f -- < {DELETE_LIST_NAME} && "
+        f"sudo rm -f {DELETE_LIST_NAME}; fi && "
+        f"for f in {folder_args}; do [ ! -d \"$f\" ] || "
+        f"sudo find \"$f\" -mindepth 1 -type d -empty -delete || exit 1; done ); "
+        f"rc=$?; rm -f '{archive_path}'; [ $rc -eq 0 ]"
+    )
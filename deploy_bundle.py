@@ -0,0 +1,70 @@
+import gzip
+import hashlib
+import os
+import tarfile
+
+from manifest import HASH_CHUNK_SIZE
+
+
+def write_bundle(files, output_path):
+    """Packs DeployFiles into a reproducible .tar.gz server bundle.
+
+    Entries (and their parent directories) are sorted and carry fixed owners
+    and timestamps, so rebuilding the same server pack yields the same bytes
+    (and the same object name). Files can come straight from the server pack
+    zip. Returns the archive's hex SHA-256.
+    """
+    parents = set()
+    for deploy_file in files:
+        parent = os.path.dirname(deploy_file.relpath)
+        while parent and parent not in parents:
+            parents.add(parent)
+            parent = os.path.dirname(parent)
+
+    with open(output_path, "wb") as raw, gzip.GzipFile(
+        filename="", mode="wb", fileobj=raw, compresslevel=1, mtime=0
+    ) as gz, tarfile.open(fileobj=gz, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        for rel in sorted(parents):
+            info = tarfile.TarInfo(rel)
+            info.type = tarfile.DIRTYPE
+            tar.addfile(_normalized(info))
+        for deploy_file in sorted(files):
+            info = tarfile.TarInfo(deploy_file.relpath)
+            info.size = deploy_file.size
+            with deploy_file.open() as f:
+                tar.addfile(_normalized(info), f)
+
+    digest = hashlib.sha256()
+    with open(output_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _normalized(info):
+    info.mtime = 0
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    info.mode = 0o755 if info.isdir() else 0o644
+    return info
+
+
+def bundle_blob_name(prefix, digest):
+    """Returns the content-addressed object name for a bundle."""
+    return f"{prefix.rstrip('/')}/bundles/{digest}.tar.gz"
+
+
+def fetch_bundle_command(gcs_uri, destination, folders):
+    """Returns a shell command that downloads a bundle on the VM and unpacks it.
+
+    The VM copies the object over Google's network with gcloud storage (or
+    gsutil on older images) and replaces the given folders in destination.
+    """
+    local_path = f"{destination}/.bundle.tar.gz"
+    stale = " ".join(f"'{destination}/{folder}'" for folder in folders)
+    return (
+        f"mkdir -p '{destination}' && rm -rf {stale} && "
+        f"(gcloud storage cp '{gcs_uri}' '{local_path}' "
+        f"|| gsutil -q cp '{gcs_uri}' '{local_path}') && "
+        f"tar -xzf '{local_path}' -C '{destination}' && rm -f '{local_path}'"
+    )
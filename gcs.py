@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from colorama import Fore
+
+# Number of pooled HTTPS connections kept open to storage.googleapis.com
+GCS_POOL_SIZE = 32
+
+# Fields requested when listing objects; keeps each listing page small
+LIST_FIELDS = "items(name,size,md5Hash,crc32c,metadata),nextPageToken"
+
+# Temporary part objects for composite uploads live under this prefix
+COMPOSITE_PARTS_PREFIX = "_composite/"
+
+# GCS accepts at most 32 source objects per compose request
+MAX_COMPOSE_SOURCES = 32
+
+BlobInfo = namedtuple("BlobInfo", ["name", "size", "md5_hash", "crc32c", "metadata"])
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_storage_client():
+    """Returns the process-wide storage client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Imported here so runs that never touch GCS skip the import cost
+            from google.cloud import storage
+            from requests.adapters import HTTPAdapter
+
+            client = storage.Client()
+            # Widen the connection pool so concurrent requests reuse connections
+            adapter = HTTPAdapter(
+                pool_connections=GCS_POOL_SIZE, pool_maxsize=GCS_POOL_SIZE
+            )
+            client._http.mount("https://", adapter)
+            _client = client
+        return _client
+
+
+def set_storage_client(client):
+    """Replaces the shared storage client (e.g. with an emulator or in-memory stand-in)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def _blob_info(blob):
+    return BlobInfo(
+        blob.name, blob.size, blob.md5_hash, blob.crc32c, blob.metadata or {}
+    )
+
+
+class BucketInventory:
+    """In-memory listing of the objects stored under a set of bucket prefixes.
+
+    Each prefix is listed once with paged ``list_blobs`` calls; existence checks
+    afterwards are answered from memory instead of one HEAD request per object.
+    """
+
+    def __init__(self, bucket_name, prefixes=("cars/", "tracks/"), client=None):
+        self.bucket_name = bucket_name
+        self.prefixes = tuple(prefixes)
+        self.client = client
+        self._blobs = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Lists every configured prefix and caches the results."""
+        client = self.client or get_storage_client()
+        blobs = {}
+        for prefix in self.prefixes:
+            iterator = client.list_blobs(
+                self.bucket_name, prefix=prefix, page_size=1000, fields=LIST_FIELDS
+            )
+            for blob in iterator:
+                blobs[blob.name] = _blob_info(blob)
+        with self._lock:
+            self._blobs = blobs
+            self._loaded = True
+        logging.info(
+            Fore.BLUE
+            + f"Listed {len(blobs)} objects under {', '.join(self.prefixes)} in {self.bucket_name}."
+        )
+        return self
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def exists(self, blob_name):
+        """Returns True if the object was present at listing time or recorded since."""
+        self._ensure_loaded()
+        with self._lock:
+            return blob_name in self._blobs
+
+    def get(self, blob_name):
+        """Returns the cached BlobInfo for an object, or None."""
+        self._ensure_loaded()
+        with self._lock:
+            return self._blobs.get(blob_name)
+
+    def names(self, prefix=""):
+        """Returns the cached object names starting with prefix."""
+        self._ensure_loaded()
+        with self._lock:
+            return [name for name in self._blobs if name.startswith(prefix)]
+
+    def record(self, blob):
+        """Adds or refreshes an object after it has been written by this run."""
+        info = _blob_info(blob)
+        with self._lock:
+            self._blobs[blob.name] = info
+
+    def forget(self, blob_name):
+        """Drops an object from the cache after it has been deleted."""
+        with self._lock:
+            self._blobs.pop(blob_name, None)
+
+
+def _load_checkpoint(checkpoint_path, expected):
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    # Only resume if the file and part layout are exactly what was recorded
+    for key, value in expected.items():
+        if checkpoint.get(key) != value:
+            return None
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint_path, checkpoint):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _compose(bucket, destination, sources, parts_prefix):
+    """Composes any number of sources into destination, 32 at a time."""
+    level = 0
+    while len(sources) > MAX_COMPOSE_SOURCES:
+        grouped = []
+        for i in range(0, len(sources), MAX_COMPOSE_SOURCES):
+            intermediate = bucket.blob(f"{parts_prefix}compose-{level}-{i:05d}")
+            intermediate.compose(sources[i : i + MAX_COMPOSE_SOURCES])
+            grouped.append(intermediate)
+        sources = grouped
+        level += 1
+    destination.compose(sources)
+
+
+def compose_blobs(
+    bucket_name,
+    destination_blob_name,
+    source_names,
+    metadata=None,
+    content_type="application/zip",
+    cache_control=None,
+    client=None,
+):
+    """Concatenates existing objects, in order, into one object server-side.
+
+    Any number of sources is accepted; intermediate objects needed beyond 32
+    sources are removed afterwards. No object data passes through this
+    machine. Returns the composed blob.
+    """
+    client = client or get_storage_client()
+    bucket = client.bucket(bucket_name)
+    compose_key = hashlib.sha256(
+        f"{bucket_name}/{destination_blob_name}".encode("utf-8")
+    ).hexdigest()[:16]
+    parts_prefix = f"{COMPOSITE_PARTS_PREFIX}{compose_key}/"
+
+    blob = bucket.blob(destination_blob_name)
+    blob.content_type = content_type
+    if cache_control:
+        blob.cache_control = cache_control
+    if metadata:
+        blob.metadata = metadata
+    _compose(bucket, blob, [bucket.blob(name) for name in source_names], parts_prefix)
+
+    if len(source_names) > MAX_COMPOSE_SOURCES:
+        for leftover in client.list_blobs(bucket_name, prefix=parts_prefix):
+            leftover.delete()
+    return blob
+
+
+def upload_file_composite(
+    file_path,
+    bucket_name,
+    destination_blob_name,
+    part_count=8,
+    checkpoint_dir="uploads",
+    metadata=None,
+    content_type="application/zip",
+    cache_control=None,
+    throttle=None,
+    chunk_size=None,
+    client=None,
+):
+    """Uploads a large file as parallel parts and composes them server-side.
+
+    Completed parts are recorded in a local checkpoint file, so running the
+    same upload again after an interruption only sends the missing parts.
+    Part objects and the checkpoint are removed once the final object exists.
+    throttle, if given, wraps each part's file object (e.g. to rate limit it)
+    and chunk_size sets each part's resumable chunk size.
+    Returns the composed blob.
+    """
+    client = client or get_storage_client()
+    bucket = client.bucket(bucket_name)
+    stat = os.stat(file_path)
+    size = stat.st_size
+    part_count = max(1, min(part_count, size // (5 * 1024 * 1024) or 1))
+    part_size = -(-size // part_count)
+
+    upload_key = hashlib.sha256(
+        f"{bucket_name}/{destination_blob_name}".encode("utf-8")
+    ).hexdigest()[:16]
+    parts_prefix = f"{COMPOSITE_PARTS_PREFIX}{upload_key}/"
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    checkpoint_path = os.path.join(checkpoint_dir, f"{upload_key}.upload.json")
+
+    expected = {
+        "file": os.path.abspath(file_path),
+        "size": size,
+        "mtime_ns": stat.st_mtime_ns,
+        "destination": destination_blob_name,
+        "part_size": part_size,
+    }
+    checkpoint = _load_checkpoint(checkpoint_path, expected)
+    if checkpoint is None:
+        checkpoint = dict(expected, parts={})
+    else:
+        # Trust only parts that are still in the bucket (one listing call)
+        present = {
+            blob.name: blob.size
+            for blob in client.list_blobs(bucket_name, prefix=parts_prefix)
+        }
+        checkpoint["parts"] = {
+            index: length
+            for index, length in checkpoint["parts"].items()
+            if present.get(f"{parts_prefix}{int(index):05d}") == length
+        }
+        if checkpoint["parts"]:
+            logging.info(
+                Fore.BLUE
+                + f"Resuming {destination_blob_name}: {len(checkpoint['parts'])}"
+                + f"/{part_count} parts already uploaded."
+            )
+    _save_checkpoint(checkpoint_path, checkpoint)
+    checkpoint_lock = threading.Lock()
+
+    def upload_part(index):
+        offset = index * part_size
+        length = min(part_size, size - offset)
+        part = bucket.blob(f"{parts_prefix}{index:05d}", chunk_size=chunk_size)
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            part.upload_from_file(
+                throttle(f) if throttle else f, size=length, checksum="crc32c"
+            )
+        with checkpoint_lock:
+            checkpoint["parts"][str(index)] = length
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+    missing = [i for i in range(part_count) if str(i) not in checkpoint["parts"]]
+    with ThreadPoolExecutor(max_workers=max(1, len(missing))) as pool:
+        for future in [pool.submit(upload_part, i) for i in missing]:
+            future.result()
+
+    blob = bucket.blob(destination_blob_name)
+    blob.content_type = content_type
+    if cache_control:
+        blob.cache_control = cache_control
+    if metadata:
+        blob.metadata = metadata
+    sources = [bucket.blob(f"{parts_prefix}{i:05d}") for i in range(part_count)]
+    _compose(bucket, blob, sources, parts_prefix)
+
+    for leftover in client.list_blobs(bucket_name, prefix=parts_prefix):
+        leftover.delete()
+    os.remove(checkpoint_path)
+    return blob
@@ -1,62 +1,349 @@
 import os
 import shutil
-from zipfile import ZipFile
-from google.cloud import storage
-from dotenv import load_dotenv
 from base_content import BASE_GAME_CARS, BASE_GAME_TRACKS  # Import base content
+from content_index import load_base_content
+from asset_cache import fetch_cached
+from watcher import ChangeDebouncer, snapshot_mods, snapshot_zips
+from transfer import (
+    TokenBucket,
+    TransferScheduler,
+    get_scheduler,
+    largest_first,
+    parse_rate_windows,
+    rate_for,
+    set_scheduler,
+)
+import tracing
+from tracing import current_span, traced
+from gcs import (  # Shared GCS client, listing and large-file uploads
+    BucketInventory,
+    get_storage_client,
+    upload_file_composite,
+)
+from pipeline import (
+    PipelineJob,
+    get_worker_counts,
+    log_results,
+    run_pipeline,
+    run_streaming,
+)
+from archive import build_zip, tree_size, write_directory_zip
+from manifest import (
+    FINGERPRINT_METADATA_KEY,
+    ManifestStore,
+    fingerprint_mod,
+    fingerprint_tree,
+    plan_mod,
+)
+from planner import (
+    ModPlan,
+    estimate_chunk_store_upload,
+    estimate_seconds,
+    estimate_zip_size,
+    learn_ratios,
+    load_throughput,
+    read_zip_sizes,
+)
+from remote import (
+    RemoteSession,
+    gcloud_scp_command,
+    gcloud_ssh_command,
+    join_commands,
+)
+from server_pack import ServerPack
+from skins import ENTRY_LIST_PATH, parse_entry_list, skin_filter, variant_name
+from chunk_store import CAS_PREFIX, publish_mod
+from orchestrator import Stage, run_stages
+from deploy_bundle import bundle_blob_name, fetch_bundle_command, write_bundle
+from releases import (
+    activate_release_command,
+    clone_release_command,
+    new_release_id,
+    prepare_release_command,
+    prune_releases_command,
+    remove_release_command,
+    rollback_release_command,
+)
+from delta_sync import (
+    apply_delta_command,
+    build_local_manifest,
+    diff_manifests,
+    parse_remote_manifest,
+    remote_manifest_command,
+    write_delta_archive,
+)
+import argparse
+import functools
 import subprocess
+import textwrap
+import threading
+import time
 import json  # Import for reading and writing JSON files
+import mimetypes
 import urllib.parse  # Import for URL encoding
 import logging  # Import for logging
-import urllib.request  # Import for downloading data_track_params.ini
 import colorama
 from colorama import Fore, Style
 
-# Initialize colorama
-colorama.init(autoreset=True)
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+# Environment variables each stage needs; validated only when the stage runs
+GCS_SETTINGS = [
+    "GOOGLE_APPLICATION_CREDENTIALS",
+    "GCP_BUCKET_NAME",
+    "ASSETTO_CORSA_DIR",
+]
+VM_SETTINGS = ["GCP_VM_INSTANCE_NAME", "GCP_VM_ZONE", "GCP_VM_USER"]
+
+# Environment-specific variables, filled in by load_settings()
+gcp_credentials_path = None
+bucket_name = None
+assetto_corsa_dir = None
+vm_instance_name = None  # VM instance name
+vm_zone = None  # VM zone
+vm_destination_path = "/home/nic/assetto"  # Hardcoded for now
+vm_user = None  # VM user
+
+# "staged" zips to uploads/ before uploading; "stream" zips straight into GCS;
+# "cas" uploads only missing file blobs and composes each zip in the bucket
+upload_mode = "staged"
+
+# Name mod archives after their content fingerprint (cars/<name>.<version>.zip)
+# so they never change once written and clients and CDNs can cache them forever.
+# Off by default: turning it on uploads every mod once more under its versioned
+# name, and superseded versions are never deleted, since other servers'
+# content.json may still point at them.
+versioned_objects = False
+VERSION_LENGTH = 16
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unversioned names are overwritten in place, so clients must revalidate them
+MUTABLE_CACHE_CONTROL = "no-cache"
+
+# Resumable upload chunk size for streaming mode (must be a multiple of 256 KiB)
+STREAM_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Sample each file and store it uncompressed if deflate would not help
+zip_auto_compression = False
+
+# Worker processes used to compress a single large mod (see archive.py)
+archive_workers = os.cpu_count() or 1
+
+# Archives at least this large are uploaded as parallel composite parts
+COMPOSITE_UPLOAD_THRESHOLD = 256 * 1024 * 1024
+COMPOSITE_UPLOAD_PARTS = 8
+
+# "scp" copies cfg/content/system in full; "delta" sends only changed files;
+# "bucket" stages a bundle in GCS and has the VM download it
+vm_sync_mode = "scp"
+
+# Bucket prefix for server bundles pulled by the VM (kept private)
+GCS_STAGING_PREFIX = "staging/"
+
+# Deploy into /opt/ac/releases/<id> and switch with a symlink swap
+vm_releases = False
+vm_releases_keep = 3
+
+# External config assets are reused for this long before being revalidated
+ASSET_CACHE_TTL = 24 * 60 * 60
+ASSET_FETCH_TIMEOUT = 15
+
+# Watch mode: drop folder for server-pack zips, poll interval, and how long a
+# changed mod or zip must stay unchanged before it is published
+watch_drop_dir = "incoming"
+WATCH_INTERVAL_SECONDS = 10
+WATCH_DEBOUNCE_SECONDS = 30
+
+# Build per-server car archives holding only the skins named in the pack's
+# cfg/entry_list.ini (plus the shared car data) instead of every skin
+skin_pruning = False
+
+# Upload rate limit shared by every transfer from this machine (0 = unlimited),
+# optional time-of-day windows overriding it, concurrent transfers allowed per
+# destination, and how often transfer progress is logged
+upload_rate_limit = 0
+upload_rate_windows = []
+transfer_caps = {"gcs": 4, "vm": 1}
+PROGRESS_INTERVAL_SECONDS = 5
+
+# Where each run's JSON trace goes, and an optional Prometheus textfile
+# (e.g. for node_exporter's textfile collector) updated after every run
+trace_dir = tracing.DEFAULT_TRACE_DIR
+prometheus_textfile = None
+
+# Server install on the VM and the folders a deploy replaces
+REMOTE_ROOT = "/opt/ac"
+DEPLOY_FOLDERS = ["cfg", "content", "system"]
+
+# Last lines of the service journal, shown when the service fails to start
+SERVICE_LOG_COMMAND = "sudo journalctl -u assetto.service -n 20 --no-pager"
+
+# One long-lived remote shell per VM, shared by every remote step; a command
+# still running after this many seconds is treated as a hung session
+REMOTE_COMMAND_TIMEOUT = 15 * 60
+_remote_sessions = {}
+_remote_sessions_lock = threading.Lock()
+
+# On-disk cache of the resolved gcloud executable
+GCLOUD_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "ac-deploy", "gcloud_path.json"
 )
 
-# Load environment variables from .env file
-load_dotenv()
+_settings_loaded = False
 
-# Print environment variables for debugging
-logging.info(Fore.BLUE + f"GCP_BUCKET_NAME: {os.getenv('GCP_BUCKET_NAME')}")
-logging.info(Fore.BLUE + f"ASSETTO_CORSA_DIR: {os.getenv('ASSETTO_CORSA_DIR')}")
 
-# Load environment-specific variables
-gcp_credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-bucket_name = os.getenv("GCP_BUCKET_NAME")
-assetto_corsa_dir = os.getenv("ASSETTO_CORSA_DIR")
-vm_instance_name = os.getenv("GCP_VM_INSTANCE_NAME")  # VM instance name
-vm_zone = os.getenv("GCP_VM_ZONE")  # VM zone
-vm_destination_path = "/home/nic/assetto"  # Hardcoded for now
-vm_user = os.getenv("GCP_VM_USER")  # VM user
-
-# Verify that all required environment variables are set
-if (
-    not gcp_credentials_path
-    or not bucket_name
-    or not assetto_corsa_dir
-    or not vm_instance_name
-    or not vm_zone
-    or not vm_destination_path
-    or not vm_user  # Check for VM user
-):
-    logging.error(
-        Fore.RED
-        + "Error: Missing required environment variables. Please check your .env file."
+def setup_logging():
+    """Initializes colored console logging."""
+    # Initialize colorama
+    colorama.init(autoreset=True)
+
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
     )
-    exit(1)
 
-# Set the environment variable for Google Cloud authentication
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = gcp_credentials_path
+
+def load_settings():
+    """Loads the .env file and reads the settings into module globals (once)."""
+    global _settings_loaded, gcp_credentials_path, bucket_name, assetto_corsa_dir
+    global vm_instance_name, vm_zone, vm_user, upload_mode, STREAM_CHUNK_SIZE
+    global zip_auto_compression, archive_workers, COMPOSITE_UPLOAD_THRESHOLD
+    global COMPOSITE_UPLOAD_PARTS, vm_sync_mode, GCS_STAGING_PREFIX
+    global vm_releases, vm_releases_keep, ASSET_CACHE_TTL, ASSET_FETCH_TIMEOUT
+    global watch_drop_dir, WATCH_INTERVAL_SECONDS, WATCH_DEBOUNCE_SECONDS
+    global trace_dir, prometheus_textfile, versioned_objects
+    global upload_rate_limit, upload_rate_windows, transfer_caps
+    global PROGRESS_INTERVAL_SECONDS, skin_pruning, REMOTE_COMMAND_TIMEOUT
+    if _settings_loaded:
+        return
+    from dotenv import load_dotenv
+
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Print environment variables for debugging
+    logging.info(Fore.BLUE + f"GCP_BUCKET_NAME: {os.getenv('GCP_BUCKET_NAME')}")
+    logging.info(Fore.BLUE + f"ASSETTO_CORSA_DIR: {os.getenv('ASSETTO_CORSA_DIR')}")
+
+    gcp_credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    bucket_name = os.getenv("GCP_BUCKET_NAME")
+    assetto_corsa_dir = os.getenv("ASSETTO_CORSA_DIR")
+    vm_instance_name = os.getenv("GCP_VM_INSTANCE_NAME")
+    vm_zone = os.getenv("GCP_VM_ZONE")
+    vm_user = os.getenv("GCP_VM_USER")
+
+    upload_mode = os.getenv("UPLOAD_MODE", "staged").strip().lower()
+    versioned_objects = os.getenv("VERSIONED_OBJECTS", "").strip().lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    skin_pruning = os.getenv("SKIN_PRUNING", "").strip().lower() in ("1", "true", "yes")
+    STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE_MB") or 16) * 1024 * 1024
+    zip_auto_compression = os.getenv("ZIP_AUTO_COMPRESSION", "").strip().lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    archive_workers = int(os.getenv("ARCHIVE_WORKERS") or os.cpu_count() or 1)
+    COMPOSITE_UPLOAD_THRESHOLD = (
+        int(os.getenv("COMPOSITE_UPLOAD_THRESHOLD_MB") or 256) * 1024 * 1024
+    )
+    COMPOSITE_UPLOAD_PARTS = int(os.getenv("COMPOSITE_UPLOAD_PARTS") or 8)
+    vm_sync_mode = os.getenv("VM_SYNC_MODE", "scp").strip().lower()
+    GCS_STAGING_PREFIX = os.getenv("GCS_STAGING_PREFIX") or "staging/"
+    vm_releases = os.getenv("VM_RELEASES", "").strip().lower() in ("1", "true", "yes")
+    vm_releases_keep = max(1, int(os.getenv("VM_RELEASES_KEEP") or 3))
+    REMOTE_COMMAND_TIMEOUT = float(
+        os.getenv("REMOTE_COMMAND_TIMEOUT_SECONDS") or 15 * 60
+    )
+    ASSET_CACHE_TTL = int(float(os.getenv("ASSET_CACHE_TTL_HOURS") or 24) * 3600)
+    ASSET_FETCH_TIMEOUT = float(os.getenv("ASSET_FETCH_TIMEOUT") or 15)
+    watch_drop_dir = os.getenv("WATCH_DROP_DIR") or "incoming"
+    WATCH_INTERVAL_SECONDS = float(os.getenv("WATCH_INTERVAL_SECONDS") or 10)
+    WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS") or 30)
+    trace_dir = os.getenv("TRACE_DIR") or tracing.DEFAULT_TRACE_DIR
+    prometheus_textfile = os.getenv("PROMETHEUS_TEXTFILE") or None
+    upload_rate_limit = float(os.getenv("UPLOAD_RATE_LIMIT_MBPS") or 0) * 1024 * 1024
+    upload_rate_windows = parse_rate_windows(os.getenv("UPLOAD_RATE_WINDOWS"))
+    for item in (os.getenv("TRANSFER_CAPS") or "").split(","):
+        destination, _, cap = item.partition("=")
+        if cap.strip():
+            transfer_caps[destination.strip()] = int(cap)
+    PROGRESS_INTERVAL_SECONDS = float(os.getenv("PROGRESS_INTERVAL_SECONDS") or 5)
+    set_scheduler(
+        TransferScheduler(
+            TokenBucket(lambda: rate_for(upload_rate_windows, upload_rate_limit)),
+            caps=transfer_caps,
+            progress_interval=PROGRESS_INTERVAL_SECONDS,
+        )
+    )
+
+    # Set the environment variable for Google Cloud authentication
+    if gcp_credentials_path:
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = gcp_credentials_path
+    _settings_loaded = True
 
 
+def require_settings(stage, names):
+    """Raises RuntimeError if any environment variable a stage needs is missing."""
+    load_settings()
+    missing = [name for name in names if not os.getenv(name)]
+    if missing:
+        logging.error(
+            Fore.RED
+            + f"Error: Missing required environment variables for {stage}: "
+            + f"{', '.join(missing)}. Please check your .env file."
+        )
+        raise RuntimeError(f"Missing settings for {stage}.")
+
+
+def _gcloud_cache_key():
+    # A changed PATH may point at a different installation
+    return os.environ.get("PATH", "")
+
+
+def _read_gcloud_cache():
+    try:
+        with open(GCLOUD_CACHE_PATH, "r") as f:
+            cached = json.load(f)
+        path = cached["path"]
+        if (
+            cached.get("key") == _gcloud_cache_key()
+            and os.path.isfile(path)
+            and os.stat(path).st_mtime_ns == cached.get("mtime_ns")
+        ):
+            return path
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_gcloud_cache(path):
+    try:
+        os.makedirs(os.path.dirname(GCLOUD_CACHE_PATH), exist_ok=True)
+        with open(GCLOUD_CACHE_PATH, "w") as f:
+            json.dump(
+                {
+                    "path": path,
+                    "mtime_ns": os.stat(path).st_mtime_ns,
+                    "key": _gcloud_cache_key(),
+                },
+                f,
+            )
+    except OSError as e:
+        logging.warning(Fore.BLUE + f"Could not cache the gcloud path: {e}")
+
+
+@functools.lru_cache(maxsize=None)
 def find_gcloud_path():
+    """Find the path to the gcloud executable, using the on-disk cache when it is still valid."""
+    cached = _read_gcloud_cache()
+    if cached:
+        return cached
+    path = _locate_gcloud()
+    _write_gcloud_cache(path)
+    return path
+
+
+def _locate_gcloud():
     """Find the path to the gcloud executable using the 'where' command."""
     try:
         # Use subprocess to execute the 'where' command
@@ -91,24 +378,27 @@ def find_gcloud_path():
         exit(1)
 
 
-def find_non_base_content(zip_file_path):
-    """Identify non-base game content in the zip file."""
-    car_files_to_upload = set()
-    track_files_to_upload = set()
-
+@functools.lru_cache(maxsize=None)
+def get_base_content():
+    """Returns (cars, tracks) sets of official content, indexed from the local install."""
     try:
-        with ZipFile(zip_file_path, "r") as zip_ref:
-            # Iterate over each file in the zip archive
-            for file in zip_ref.namelist():
-                if file.startswith("content/cars/"):
-                    car_name = file.split("/")[2]
-                    if car_name not in BASE_GAME_CARS:
-                        car_files_to_upload.add(car_name)
-                elif file.startswith("content/tracks/"):
-                    track_name = file.split("/")[2]
-                    if track_name not in BASE_GAME_TRACKS:
-                        track_files_to_upload.add(track_name)
+        return load_base_content(assetto_corsa_dir)
+    except Exception as e:
+        logging.error(
+            Fore.RED + f"Error indexing base content: {e}. Using the built-in list."
+        )
+        return frozenset(BASE_GAME_CARS), frozenset(BASE_GAME_TRACKS)
 
+
+@traced("find_non_base_content")
+def find_non_base_content(zip_file_path, pack=None):
+    """Identify non-base game content in the zip file."""
+    try:
+        # The pack's entry list is classified once when it is opened
+        pack = pack or ServerPack(zip_file_path)
+        base_cars, base_tracks = get_base_content()
+        car_files_to_upload = pack.cars - base_cars
+        track_files_to_upload = pack.tracks - base_tracks
         return list(car_files_to_upload), list(track_files_to_upload)
 
     except Exception as e:
@@ -116,10 +406,58 @@ def find_non_base_content(zip_file_path):
         return [], []
 
 
-def zip_directory(source_dir, output_filename):
-    """Zip the specified directory."""
+def pack_car_skins(pack):
+    """Returns {car: skins} from the pack's entry list, or {} when skin pruning is off.
+
+    Cars the entry list does not mention are left out, so they keep every skin.
+    """
+    if not skin_pruning:
+        return {}
+    text = pack.read_text(ENTRY_LIST_PATH)
+    if text is None:
+        logging.warning(
+            Fore.BLUE + f"{ENTRY_LIST_PATH} not found in {pack.path}. Keeping all skins."
+        )
+        return {}
+    by_model = {model.lower(): skins for model, skins in parse_entry_list(text).items()}
+    return {car: by_model[car.lower()] for car in pack.cars if car.lower() in by_model}
+
+
+def merge_car_skins(car_skins, cars, pack_skins):
+    """Adds a pack's skin selection (from pack_car_skins) for cars to car_skins.
+
+    A car shared by several packs gets the union of their skins; None (every
+    skin) wins over any set.
+    """
+    for car in cars:
+        skins = pack_skins.get(car)
+        previous = car_skins.get(car, frozenset())
+        car_skins[car] = None if previous is None or skins is None else previous | skins
+
+
+def mod_variant(kind, name, car_skins=None):
+    """Returns (archive name, include filter) of a mod.
+
+    Cars listed in car_skins get an archive pruned to those skins, named after
+    the skin set so each set is built and uploaded once.
+    """
+    skins = (car_skins or {}).get(name) if kind == "cars" else None
+    return variant_name(name, skins), skin_filter(skins)
+
+
+def zip_directory(source_dir, output_filename, auto=None, workers=None, skins=None):
+    """Zip the specified directory using the per-extension compression policy.
+
+    With skins, a car folder is zipped with only those skins.
+    """
     try:
-        shutil.make_archive(output_filename, "zip", source_dir)
+        build_zip(
+            source_dir,
+            f"{output_filename}.zip",
+            auto=zip_auto_compression if auto is None else auto,
+            workers=archive_workers if workers is None else workers,
+            include=skin_filter(skins),
+        )
         logging.info(Fore.BLUE + f"Zipped {source_dir} to {output_filename}.zip")
         return f"{output_filename}.zip"
     except Exception as e:
@@ -127,32 +465,93 @@ def zip_directory(source_dir, output_filename):
         return None
 
 
-def unzip_file(zip_file_path, extract_to):
-    """Unzip the file to the specified directory."""
+@traced("unzip_file")
+def unzip_file(zip_file_path, extract_to, pack=None, folders=None):
+    """Unzip the deploy folders (or only the given ones) to the specified directory."""
     try:
-        with ZipFile(zip_file_path, "r") as zip_ref:
-            zip_ref.extractall(extract_to)
-        logging.info(Fore.BLUE + f"Unzipped {zip_file_path} to {extract_to}.")
+        pack = pack or ServerPack(zip_file_path)
+        folders = folders or DEPLOY_FOLDERS
+        count = pack.extract(extract_to, folders, workers=archive_workers)
+        current_span().add(
+            bytes=sum(info.file_size for info in pack.entries(folders)), files=count
+        )
+        logging.info(
+            Fore.BLUE + f"Unzipped {count} files from {zip_file_path} to {extract_to}."
+        )
     except Exception as e:
         logging.error(Fore.RED + f"Error unzipping file {zip_file_path}: {e}")
 
 
+@traced("download_file")
 def download_file(url, destination_path):
-    """Downloads a file from the specified URL to the given destination path."""
+    """Copies the file at url to destination_path through the local asset cache."""
     try:
-        logging.info(
-            Fore.BLUE + f"Downloading file from {url} to {destination_path}..."
-        )
-        urllib.request.urlretrieve(url, destination_path)
-        logging.info(
-            Fore.GREEN + f"File downloaded successfully to {destination_path}."
+        status = fetch_cached(
+            url, destination_path, ttl=ASSET_CACHE_TTL, timeout=ASSET_FETCH_TIMEOUT
         )
+        if status == "downloaded":
+            logging.info(
+                Fore.GREEN + f"File downloaded successfully to {destination_path}."
+            )
+        else:
+            logging.info(Fore.BLUE + f"Using the cached copy of {url} ({status}).")
+        return True
     except Exception as e:
         logging.error(Fore.RED + f"Error downloading file from {url}: {e}")
+        return False
+
 
+def mod_object_name(kind, name, version=None):
+    """Returns the bucket object name of a mod archive, versioned if a version is given."""
+    if version:
+        return f"{kind}/{name}.{version[:VERSION_LENGTH]}.zip"
+    return f"{kind}/{name}.zip"
 
-def update_json_file(json_path, car_files, track_files):
-    """Update the content.json file with missing URLs, including URL encoding."""
+
+def mod_cache_control(version=None):
+    return IMMUTABLE_CACHE_CONTROL if version else MUTABLE_CACHE_CONTROL
+
+
+def mod_url(kind, name, version=None):
+    """Returns the public download URL of a mod archive, including URL encoding."""
+    return f"https://storage.googleapis.com/{bucket_name}/" + urllib.parse.quote(
+        mod_object_name(kind, name, version)
+    )
+
+
+@traced("mod_versions")
+def mod_versions(car_files, track_files, car_skins=None):
+    """Returns {(kind, archive name): fingerprint} for the mods installed locally.
+
+    Empty when versioned object names are off. Reuses the file hashes in the
+    local manifest, so unchanged mods are only stat'ed. Cars pruned by
+    car_skins are fingerprinted over the files their archive holds.
+    """
+    if not versioned_objects:
+        return {}
+    manifest = ManifestStore()
+    versions = {}
+    for kind, names in (("cars", car_files), ("tracks", track_files)):
+        for name in names:
+            source_dir = os.path.join(assetto_corsa_dir, kind, name)
+            if os.path.exists(source_dir):
+                variant, include = mod_variant(kind, name, car_skins)
+                versions[(kind, variant)] = fingerprint_mod(
+                    f"{kind}/{variant}.zip", source_dir, manifest, include
+                )
+    manifest.save()
+    return versions
+
+
+def update_json_file(
+    json_path, car_files, track_files, versions=None, car_skins=None
+):
+    """Update the content.json file with missing URLs, including URL encoding.
+
+    With versions (from mod_versions) or pruned car archives (car_skins),
+    URLs that point into the bucket are moved to the current object; other
+    URLs are kept.
+    """
     try:
         # Check if the JSON file exists and has content
         if os.path.exists(json_path) and os.path.getsize(json_path) > 0:
@@ -178,21 +577,21 @@ def update_json_file(json_path, car_files, track_files):
         if "track" not in content:
             content["track"] = {}
 
-        # Update cars
-        for car in car_files:
-            encoded_car_name = urllib.parse.quote(car)  # URL-encode the car name
-            if car not in content["cars"] or not content["cars"][car].get("url"):
-                content["cars"][car] = {
-                    "url": f"https://storage.googleapis.com/{bucket_name}/cars/{encoded_car_name}.zip"
-                }
-
-        # Update tracks
-        for track in track_files:
-            encoded_track_name = urllib.parse.quote(track)  # URL-encode the track name
-            if track not in content["track"] or not content["track"].get("url"):
-                content["track"][track] = {
-                    "url": f"https://storage.googleapis.com/{bucket_name}/tracks/{encoded_track_name}.zip"
-                }
+        versions = versions or {}
+        bucket_url = f"https://storage.googleapis.com/{bucket_name}/"
+
+        # Update cars and tracks
+        for kind, key, names in (
+            ("cars", "cars", car_files),
+            ("tracks", "track", track_files),
+        ):
+            for name in names:
+                variant, _ = mod_variant(kind, name, car_skins)
+                version = versions.get((kind, variant))
+                moved = version or variant != name
+                url = (content[key].get(name) or {}).get("url")
+                if not url or (moved and url.startswith(bucket_url)):
+                    content[key][name] = {"url": mod_url(kind, variant, version)}
 
         # Save the updated content back to the JSON file
         with open(json_path, "w") as json_file:
@@ -220,6 +619,40 @@ def print_json_content(file_path):
         logging.error(Fore.RED + f"Error reading JSON file {file_path}: {e}")
 
 
+def append_ini_sections(file_path, text):
+    """Appends the INI sections in text that file_path does not already have."""
+    try:
+        existing = ""
+        if os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+                existing = file.read()
+        present = {
+            line.strip().lower()
+            for line in existing.splitlines()
+            if line.strip().startswith("[")
+        }
+
+        # Split text into sections, each starting at its [header] line
+        sections = []
+        for line in textwrap.dedent(text).strip().splitlines():
+            if line.startswith("[") or not sections:
+                sections.append([])
+            sections[-1].append(line)
+        missing = [
+            section for section in sections if section[0].strip().lower() not in present
+        ]
+        if not missing:
+            logging.info(Fore.BLUE + f"Custom sections already in {file_path}.")
+            return
+        separator = "" if not existing or existing.endswith("\n") else "\n"
+        append_to_file(
+            file_path,
+            separator + "\n" + "\n\n".join("\n".join(s) for s in missing) + "\n",
+        )
+    except Exception as e:
+        logging.error(Fore.RED + f"Error updating INI file {file_path}: {e}")
+
+
 def append_to_file(file_path, text):
     """Appends the specified text to the end of the given file."""
     try:
@@ -230,10 +663,14 @@ def append_to_file(file_path, text):
         logging.error(Fore.RED + f"Error appending to file {file_path}: {e}")
 
 
-def file_exists_in_gcs(bucket_name, destination_blob_name):
+def file_exists_in_gcs(bucket_name, destination_blob_name, inventory=None):
     """Checks if a file already exists in the specified GCS bucket."""
     try:
-        client = storage.Client()
+        # Answer from the bucket listing when one is available
+        if inventory is not None:
+            return inventory.exists(destination_blob_name)
+
+        client = get_storage_client()
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(destination_blob_name)
         return blob.exists()
@@ -242,42 +679,232 @@ def file_exists_in_gcs(bucket_name, destination_blob_name):
         return False
 
 
-def upload_file_to_gcs(file_path, bucket_name, destination_path):
-    """Uploads a single file to the specified Google Cloud Storage bucket."""
+@traced("upload_file_to_gcs")
+def upload_file_to_gcs(
+    file_path,
+    bucket_name,
+    destination_path,
+    inventory=None,
+    metadata=None,
+    overwrite=False,
+    blob_name=None,
+    cache_control=None,
+    progress=None,
+):
+    """Uploads a single file to the specified Google Cloud Storage bucket.
+
+    The object is named after the file under destination_path unless
+    blob_name is given. The upload is rate limited by the transfer scheduler
+    and counted towards progress, if given.
+    """
     try:
-        client = storage.Client()
+        client = get_storage_client()
+        scheduler = get_scheduler()
         bucket = client.bucket(bucket_name)
 
         # Use forward slashes for GCS paths
         destination_blob_name = (
-            f"{destination_path}/{os.path.basename(file_path)}".replace("\\", "/")
-        )
+            blob_name or f"{destination_path}/{os.path.basename(file_path)}"
+        ).replace("\\", "/")
 
-        # Check if file already exists in GCS
+        # Check if file already exists in GCS, unless it is being replaced
         logging.info(
             Fore.BLUE + f"Checking if {destination_blob_name} exists in GCS..."
         )
-        if file_exists_in_gcs(bucket_name, destination_blob_name):
+        if not overwrite and file_exists_in_gcs(
+            bucket_name, destination_blob_name, inventory
+        ):
             logging.info(
                 Fore.BLUE
                 + f"File {destination_blob_name} already exists in GCS. Skipping upload."
             )
-            return
-
-        blob = bucket.blob(destination_blob_name)
-        blob.upload_from_filename(file_path)
+            return True
+
+        size = os.path.getsize(file_path)
+        with scheduler.slot("gcs"):
+            if size >= COMPOSITE_UPLOAD_THRESHOLD:
+                # Large archives go up as parallel, resumable parts
+                blob = upload_file_composite(
+                    file_path,
+                    bucket_name,
+                    destination_blob_name,
+                    part_count=COMPOSITE_UPLOAD_PARTS,
+                    checkpoint_dir=os.path.join("uploads", "checkpoints"),
+                    metadata=metadata,
+                    cache_control=cache_control,
+                    throttle=lambda f: scheduler.throttle(f, progress),
+                    chunk_size=scheduler.chunk_size(),
+                )
+            else:
+                blob = bucket.blob(
+                    destination_blob_name, chunk_size=scheduler.chunk_size()
+                )
+                if cache_control:
+                    blob.cache_control = cache_control
+                if metadata:
+                    blob.metadata = metadata
+                with open(file_path, "rb") as f:
+                    blob.upload_from_file(
+                        scheduler.throttle(f, progress),
+                        size=size,
+                        content_type=mimetypes.guess_type(file_path)[0],
+                    )
+        current_span().add(bytes=os.path.getsize(file_path), files=1)
         blob.make_public()
+        if inventory is not None:
+            inventory.record(blob)
         logging.info(Fore.GREEN + f"File {file_path} uploaded to {blob.public_url}")
+        return True
     except Exception as e:
         logging.error(Fore.RED + f"Error uploading file {file_path} to GCS: {e}")
+        return False
 
 
-def create_remote_directory(vm_instance_name, vm_zone, remote_path):
-    """Creates a directory on the remote VM using gcloud compute ssh."""
+@traced("publish_to_chunk_store")
+def publish_to_chunk_store(
+    source_dir,
+    bucket_name,
+    destination_blob_name,
+    files,
+    inventory,
+    metadata=None,
+    cache_control=None,
+    progress=None,
+    include=None,
+):
+    """Publishes a directory as a zip composed in GCS from content-addressed parts.
+
+    include selects the files published (see archive.iter_directory).
+    """
     try:
-        # Dynamically find the gcloud path
-        gcloud_path = find_gcloud_path()
+        logging.info(
+            Fore.BLUE
+            + f"Publishing {source_dir} to gs://{bucket_name}/{destination_blob_name} from the chunk store..."
+        )
+        scheduler = get_scheduler()
+        with scheduler.slot("gcs"):
+            blob, uploaded = publish_mod(
+                bucket_name,
+                destination_blob_name,
+                source_dir,
+                files,
+                inventory,
+                metadata=metadata,
+                cache_control=cache_control,
+                auto=zip_auto_compression,
+                throttle=lambda f: scheduler.throttle(f, progress),
+                include=include,
+                chunk_size=scheduler.chunk_size(),
+            )
+        current_span().add(bytes=uploaded, files=1)
+        blob.make_public()
+        blob.reload()
+        inventory.record(blob)
+        logging.info(Fore.GREEN + f"Directory {source_dir} published to {blob.public_url}")
+        return True
+    except Exception as e:
+        logging.error(Fore.RED + f"Error publishing {source_dir} to the chunk store: {e}")
+        return False
+
+
+@traced("tag_gcs_object")
+def tag_gcs_object(bucket_name, blob_name, metadata, inventory=None):
+    """Merges metadata into an existing GCS object without re-uploading it."""
+    try:
+        blob = get_storage_client().bucket(bucket_name).blob(blob_name)
+        blob.metadata = metadata
+        blob.patch()
+        if inventory is not None:
+            inventory.record(blob)
+        logging.info(Fore.BLUE + f"Tagged {blob_name} with {metadata}.")
+        return True
+    except Exception as e:
+        logging.error(Fore.RED + f"Error updating metadata of {blob_name}: {e}")
+        return False
+
+
+@traced("stream_zip_to_gcs")
+def stream_zip_to_gcs(
+    source_dir,
+    bucket_name,
+    destination_blob_name,
+    inventory=None,
+    chunk_size=None,
+    metadata=None,
+    cache_control=None,
+    progress=None,
+    include=None,
+):
+    """Zips a directory straight into a resumable GCS upload, without a local archive.
+
+    include selects the files zipped (see archive.iter_directory).
+    """
+    try:
+        client = get_storage_client()
+        bucket = client.bucket(bucket_name)
+        blob = bucket.blob(destination_blob_name)
+        blob.content_type = "application/zip"
+        if cache_control:
+            blob.cache_control = cache_control
+        if metadata:
+            blob.metadata = metadata
+
+        # Memory use is bounded by the resumable upload chunk size, which is
+        # smaller still under a rate limit
+        scheduler = get_scheduler()
+        chunk_size = min(
+            chunk_size or STREAM_CHUNK_SIZE, scheduler.chunk_size() or STREAM_CHUNK_SIZE
+        )
+        logging.info(
+            Fore.BLUE + f"Streaming {source_dir} to gs://{bucket_name}/{destination_blob_name}..."
+        )
+        with scheduler.slot("gcs"), blob.open(
+            "wb", chunk_size=chunk_size, ignore_flush=True
+        ) as writer:
+            write_directory_zip(
+                scheduler.throttle(writer, progress),
+                source_dir,
+                auto=zip_auto_compression,
+                include=include,
+            )
+            current_span().add(bytes=writer.tell(), files=1)
+
+        blob.make_public()
+        if inventory is not None:
+            blob.reload()
+            inventory.record(blob)
+        logging.info(Fore.GREEN + f"Directory {source_dir} streamed to {blob.public_url}")
+        return True
+    except Exception as e:
+        logging.error(Fore.RED + f"Error streaming {source_dir} to GCS: {e}")
+        return False
 
+
+def get_remote_session(vm_instance_name, vm_zone):
+    """Returns the shared remote shell session for a VM, opening it on first use."""
+    key = (vm_instance_name, vm_zone)
+    with _remote_sessions_lock:
+        if key not in _remote_sessions:
+            gcloud_path = find_gcloud_path()
+            _remote_sessions[key] = RemoteSession(
+                gcloud_ssh_command(gcloud_path, vm_instance_name, vm_zone, "bash -s"),
+                timeout=REMOTE_COMMAND_TIMEOUT,
+            )
+        return _remote_sessions[key]
+
+
+def close_remote_sessions():
+    """Closes every open remote shell session."""
+    with _remote_sessions_lock:
+        for session in _remote_sessions.values():
+            session.close()
+        _remote_sessions.clear()
+
+
+@traced("create_remote_directory")
+def create_remote_directory(vm_instance_name, vm_zone, remote_path):
+    """Creates a directory on the remote VM over the shared remote session."""
+    try:
         # Ensure the remote path is correctly formatted for Unix
         corrected_remote_path = remote_path.replace("\\", "/")
 
@@ -285,38 +912,31 @@ def create_remote_directory(vm_instance_name, vm_zone, remote_path):
         if not corrected_remote_path.startswith("/"):
             corrected_remote_path = "/" + corrected_remote_path
 
-        # Construct the SSH command to create the directory
-        ssh_command = [
-            gcloud_path,
-            "compute",
-            "ssh",
-            vm_instance_name,
-            "--zone",
-            vm_zone,
-            "--command",
-            f"mkdir -p '{corrected_remote_path}'",  # Use single quotes to ensure Unix-style path
-        ]
-
         # Execute the command
         logging.info(
             Fore.BLUE
             + f"Creating remote directory {corrected_remote_path} on VM instance..."
         )
 
-        subprocess.run(
-            ssh_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        # Use single quotes to ensure Unix-style path
+        result = get_remote_session(vm_instance_name, vm_zone).run(
+            f"mkdir -p '{corrected_remote_path}'"
         )
+        if result.returncode != 0:
+            logging.error(
+                Fore.RED + f"Error creating remote directory on GCP VM: {result.output}"
+            )
+            return
 
         logging.info(
             Fore.GREEN
             + f"Successfully created remote directory {corrected_remote_path} on VM instance."
         )
-    except subprocess.CalledProcessError as e:
-        logging.error(
-            Fore.RED + f"Error creating remote directory on GCP VM: {e.stderr.decode()}"
-        )
+    except Exception as e:
+        logging.error(Fore.RED + f"Error creating remote directory on GCP VM: {e}")
 
 
+@traced("upload_to_gcp_vm")
 def upload_to_gcp_vm(local_file_path, destination_path):
     """Uploads the given file or directory to a specified GCP VM instance using gcloud compute scp."""
     try:
@@ -333,29 +953,36 @@ def upload_to_gcp_vm(local_file_path, destination_path):
         if not corrected_destination_path.startswith("/"):
             corrected_destination_path = "/" + corrected_destination_path
 
-        # Construct the command to upload the file/directory to the VM instance
-        scp_command = [
-            gcloud_path,
-            "compute",
-            "scp",
-            "--recurse",  # Add --recurse to copy directories
-            corrected_local_file_path,
-            f"{vm_user}@{vm_instance_name}:{corrected_destination_path}",  # Use user from env
-            "--zone",
-            vm_zone,
-        ]
+        # scp enforces its share of the rate limit itself (in Kbit/s); GCS
+        # uploads running meanwhile are throttled to the rest
+        scheduler = get_scheduler()
+        with scheduler.slot("vm"), scheduler.external() as scp_rate:
+            # Construct the command to upload the file/directory to the VM instance
+            scp_command = gcloud_scp_command(
+                gcloud_path,
+                corrected_local_file_path,
+                f"{vm_user}@{vm_instance_name}:{corrected_destination_path}",  # Use user from env
+                vm_zone,
+                limit_kbps=scp_rate * 8 / 1000,
+            )
 
-        # Log the command for debugging purposes
-        logging.info(Fore.BLUE + f"Running command: {' '.join(scp_command)}")
+            # Log the command for debugging purposes
+            logging.info(Fore.BLUE + f"Running command: {' '.join(scp_command)}")
 
-        # Execute the command
-        result = subprocess.run(
-            scp_command,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+            # Execute the command
+            result = subprocess.run(
+                scp_command,
+                check=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
 
+        size = (
+            tree_size(local_file_path)
+            if os.path.isdir(local_file_path)
+            else os.path.getsize(local_file_path)
+        )
+        current_span().add(bytes=size)
         logging.info(
             Fore.GREEN
             + f"Successfully uploaded {local_file_path} to GCP VM instance at {destination_path}."
@@ -380,42 +1007,203 @@ def upload_to_gcp_vm(local_file_path, destination_path):
         raise
 
 
+@traced("execute_remote_command")
 def execute_remote_command(vm_instance_name, vm_zone, remote_command):
-    """Executes a command on the remote VM using gcloud compute ssh."""
+    """Executes a command on the remote VM over the shared remote session."""
     try:
-        # Dynamically find the gcloud path
-        gcloud_path = find_gcloud_path()
-
-        # Construct the SSH command
-        ssh_command = [
-            gcloud_path,
-            "compute",
-            "ssh",
-            vm_instance_name,
-            "--zone",
-            vm_zone,
-            "--command",
-            remote_command,
-        ]
-
-        # Execute the command
-        logging.info(Fore.BLUE + f"Executing remote command: {' '.join(ssh_command)}")
-        result = subprocess.run(
-            ssh_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
+        logging.info(Fore.BLUE + f"Executing remote command: {remote_command}")
+        result = get_remote_session(vm_instance_name, vm_zone).run(remote_command)
+        if result.returncode != 0:
+            logging.error(Fore.RED + f"Error executing remote command: {result.output}")
+            return False
         logging.info(Fore.GREEN + "Remote command executed successfully.")
-        logging.info(
-            Fore.BLUE + result.stdout.decode()
-        )  # Print the output for debugging
-    except subprocess.CalledProcessError as e:
-        logging.error(Fore.RED + f"Error executing remote command: {e.stderr.decode()}")
-        return False
+        logging.info(Fore.BLUE + result.output)  # Print the output for debugging
     except Exception as e:
         logging.error(Fore.RED + f"Unexpected error executing remote command: {e}")
         return False
     return True
 
 
+@traced("capture_remote_command")
+def capture_remote_command(vm_instance_name, vm_zone, remote_command):
+    """Executes a command on the remote VM and returns its output, or None on failure."""
+    try:
+        result = get_remote_session(vm_instance_name, vm_zone).run(remote_command)
+        if result.returncode != 0:
+            logging.error(Fore.RED + f"Error executing remote command: {result.output}")
+            return None
+        return result.output
+    except Exception as e:
+        logging.error(Fore.RED + f"Unexpected error executing remote command: {e}")
+        return None
+
+
+@traced("sync_to_gcp_vm")
+def sync_to_gcp_vm(files):
+    """Uploads only new or changed deploy files to the VM as a delta archive.
+
+    Compares a (size, crc32) manifest of the deploy files with one computed
+    on the VM for /opt/ac. Returns the remote path of the uploaded archive,
+    or None if the server is already up to date.
+    """
+    output = capture_remote_command(
+        vm_instance_name, vm_zone, remote_manifest_command(REMOTE_ROOT, DEPLOY_FOLDERS)
+    )
+    if output is None:
+        raise RuntimeError("Fetching the remote manifest failed.")
+    remote = parse_remote_manifest(output)
+    local = build_local_manifest(files)
+    changed, removed = diff_manifests(local, remote)
+
+    logging.info(
+        Fore.BLUE
+        + f"Delta sync: {len(changed)} of {len(local)} files changed, {len(removed)} removed."
+    )
+    if not changed and not removed:
+        return None
+
+    archive_path = os.path.join("uploads", "deploy-delta.tar.gz")
+    by_path = {deploy_file.relpath: deploy_file for deploy_file in files}
+    size = write_delta_archive(by_path, changed, removed, archive_path)
+    current_span().add(files=len(changed))
+    logging.info(Fore.BLUE + f"Delta archive is {size / 1024 / 1024:.1f} MB.")
+    upload_to_gcp_vm(archive_path, vm_destination_path)
+    return f"{vm_destination_path}/{os.path.basename(archive_path)}"
+
+
+@traced("stage_bundle_in_gcs")
+def stage_bundle_in_gcs(files):
+    """Uploads the server bundle to the bucket's staging prefix, once per content.
+
+    The object is named after the bundle's SHA-256, so retries and other
+    servers deploying the same pack reuse it. Returns its gs:// URI.
+    """
+    os.makedirs("uploads", exist_ok=True)
+    bundle_path = os.path.join("uploads", "server-bundle.tar.gz")
+    digest = write_bundle(files, bundle_path)
+    current_span().add(bytes=os.path.getsize(bundle_path), files=len(files))
+    blob_name = bundle_blob_name(GCS_STAGING_PREFIX, digest)
+    gcs_uri = f"gs://{bucket_name}/{blob_name}"
+
+    bucket = get_storage_client().bucket(bucket_name)
+    if bucket.blob(blob_name).exists():
+        logging.info(Fore.BLUE + f"Bundle {gcs_uri} is already staged. Reusing it.")
+        return gcs_uri
+
+    # Server configs are not made public; the VM reads them with its own credentials
+    scheduler = get_scheduler()
+    size = os.path.getsize(bundle_path)
+    with scheduler.slot("gcs"):
+        if size >= COMPOSITE_UPLOAD_THRESHOLD:
+            upload_file_composite(
+                bundle_path,
+                bucket_name,
+                blob_name,
+                part_count=COMPOSITE_UPLOAD_PARTS,
+                checkpoint_dir=os.path.join("uploads", "checkpoints"),
+                content_type="application/gzip",
+                throttle=scheduler.throttle,
+                chunk_size=scheduler.chunk_size(),
+            )
+        else:
+            blob = bucket.blob(blob_name, chunk_size=scheduler.chunk_size())
+            with open(bundle_path, "rb") as f:
+                blob.upload_from_file(
+                    scheduler.throttle(f), size=size, content_type="application/gzip"
+                )
+    logging.info(Fore.GREEN + f"Staged server bundle at {gcs_uri}.")
+    return gcs_uri
+
+
+@traced("pull_bundle_remote")
+def pull_bundle_remote(gcs_uri):
+    """Has the VM download the staged bundle from GCS into the upload directory."""
+    command = fetch_bundle_command(gcs_uri, vm_destination_path, DEPLOY_FOLDERS)
+    if not execute_remote_command(vm_instance_name, vm_zone, command):
+        logging.error(Fore.RED + f"The VM could not fetch {gcs_uri}.")
+        raise RuntimeError("Fetching the server bundle failed.")
+
+
+@traced("apply_delta_remote")
+def apply_delta_remote(remote_archive):
+    """Extracts a delta archive over /opt/ac and deletes removed files."""
+    command = apply_delta_command(remote_archive, REMOTE_ROOT, DEPLOY_FOLDERS)
+    if not execute_remote_command(vm_instance_name, vm_zone, command):
+        logging.error(Fore.RED + "Failed to apply the delta archive on the VM.")
+        raise RuntimeError("Delta sync failed.")
+
+
+def discard_release_remote(release_id):
+    """Deletes a release whose preparation failed, so it can never be activated."""
+    if not execute_remote_command(
+        vm_instance_name, vm_zone, remove_release_command(REMOTE_ROOT, release_id)
+    ):
+        logging.warning(
+            Fore.BLUE + f"Could not remove the partial release {release_id}."
+        )
+
+
+@traced("prepare_release_remote")
+def prepare_release_remote(release_id):
+    """Moves the uploaded folders into a new release directory while the server runs."""
+    command = prepare_release_command(
+        REMOTE_ROOT, release_id, vm_destination_path, DEPLOY_FOLDERS
+    )
+    if not execute_remote_command(vm_instance_name, vm_zone, command):
+        logging.error(Fore.RED + f"Failed to prepare release {release_id}.")
+        discard_release_remote(release_id)
+        raise RuntimeError("Preparing the release failed.")
+
+
+@traced("prepare_delta_release_remote")
+def prepare_delta_release_remote(release_id, remote_archive):
+    """Builds a new release from hard links to the live one plus a delta archive."""
+    release_root = f"{REMOTE_ROOT}/releases/{release_id}"
+    command = join_commands(
+        [
+            clone_release_command(REMOTE_ROOT, release_id, DEPLOY_FOLDERS),
+            apply_delta_command(remote_archive, release_root, DEPLOY_FOLDERS),
+        ]
+    )
+    if not execute_remote_command(vm_instance_name, vm_zone, command):
+        logging.error(Fore.RED + f"Failed to prepare release {release_id}.")
+        discard_release_remote(release_id)
+        raise RuntimeError("Preparing the release failed.")
+
+
+@traced("activate_release_remote")
+def activate_release_remote(release_id):
+    """Atomically switches /opt/ac/current to the given release."""
+    command = activate_release_command(REMOTE_ROOT, release_id, DEPLOY_FOLDERS)
+    if not execute_remote_command(vm_instance_name, vm_zone, command):
+        logging.error(Fore.RED + f"Failed to activate release {release_id}.")
+        raise RuntimeError("Activating the release failed.")
+    logging.info(Fore.GREEN + f"Activated release {release_id}.")
+
+
+@traced("prune_releases_remote")
+def prune_releases_remote():
+    """Removes old releases beyond the retention limit."""
+    command = prune_releases_command(REMOTE_ROOT, vm_releases_keep)
+    if not execute_remote_command(vm_instance_name, vm_zone, command):
+        logging.warning(Fore.BLUE + "Could not prune old releases.")
+
+
+def rollback_release_remote():
+    """Stops the server, switches back to the previous release and starts it again."""
+    stop_service_remote()
+    output = capture_remote_command(
+        vm_instance_name, vm_zone, rollback_release_command(REMOTE_ROOT)
+    )
+    if output is None:
+        logging.error(Fore.RED + "No previous release to roll back to.")
+        start_service_remote()
+        raise RuntimeError("Rollback failed.")
+    logging.info(Fore.GREEN + f"Rolled back to release {output.strip()}.")
+    start_service_remote()
+
+
+@traced("stop_service_remote")
 def stop_service_remote():
     """Stops the Assetto Corsa service on the remote VM."""
     if not execute_remote_command(
@@ -427,22 +1215,25 @@ def stop_service_remote():
         raise RuntimeError("Stopping the service failed.")
 
 
+@traced("replace_directories_remote")
 def replace_directories_remote():
     """Replaces the 'cfg', 'content', 'system' directories on the remote VM."""
     remote_commands = [
-        "sudo rm -rf /opt/ac/cfg /opt/ac/content /opt/ac/system",  # Remove existing directories
-        f"sudo mv {vm_destination_path}/cfg /opt/ac/",  # Move the new 'cfg' directory
-        f"sudo mv {vm_destination_path}/content /opt/ac/",  # Move the new 'content' directory
-        f"sudo mv {vm_destination_path}/system /opt/ac/",  # Move the new 'system' directory
-        "sudo chown -R ac:ac /opt/ac/",  # Change ownership
+        f"sudo rm -rf {REMOTE_ROOT}/cfg {REMOTE_ROOT}/content {REMOTE_ROOT}/system",  # Remove existing directories
+        f"sudo mv {vm_destination_path}/cfg {REMOTE_ROOT}/",  # Move the new 'cfg' directory
+        f"sudo mv {vm_destination_path}/content {REMOTE_ROOT}/",  # Move the new 'content' directory
+        f"sudo mv {vm_destination_path}/system {REMOTE_ROOT}/",  # Move the new 'system' directory
+        f"sudo chown -R ac:ac {REMOTE_ROOT}/",  # Change ownership
     ]
 
-    for command in remote_commands:
-        if not execute_remote_command(vm_instance_name, vm_zone, command):
-            logging.error(Fore.RED + f"Failed to execute command: {command}")
-            raise RuntimeError("Directory replacement failed.")
+    # Each step depends on the previous one, so run them as one chained command
+    command = join_commands(remote_commands)
+    if not execute_remote_command(vm_instance_name, vm_zone, command):
+        logging.error(Fore.RED + f"Failed to execute command: {command}")
+        raise RuntimeError("Directory replacement failed.")
 
 
+@traced("start_service_remote")
 def start_service_remote():
     """Starts the Assetto Corsa service on the remote VM and checks if it started successfully."""
     if not execute_remote_command(
@@ -466,113 +1257,288 @@ def start_service_remote():
         )
 
 
+@traced("get_full_service_status_remote")
 def get_full_service_status_remote():
     """Fetches and displays the full output of the Assetto Corsa service status on the remote VM."""
     try:
-        gcloud_path = find_gcloud_path()
         status_command = "sudo systemctl status assetto.service --no-pager"
-        ssh_command = [
-            gcloud_path,
-            "compute",
-            "ssh",
-            vm_instance_name,
-            "--zone",
-            vm_zone,
-            "--command",
-            status_command,
-        ]
-
-        logging.info(Fore.BLUE + f"Executing remote command: {' '.join(ssh_command)}")
-        result = subprocess.run(
-            ssh_command,
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        status_output = result.stdout.decode()
-        logging.info(Fore.BLUE + f"Full service status:\n{status_output}")
-
-    except FileNotFoundError as e:
-        logging.error(
-            Fore.RED
-            + f"Error: {e}. Ensure that the gcloud CLI is installed and in your PATH."
-        )
-    except subprocess.CalledProcessError as e:
-        logging.error(
-            Fore.RED + f"Error fetching full service status: {e.stderr.decode()}"
-        )
+        logging.info(Fore.BLUE + f"Executing remote command: {status_command}")
+        result = get_remote_session(vm_instance_name, vm_zone).run(status_command)
+        # systemctl status exits non-zero for stopped units but still prints them
+        logging.info(Fore.BLUE + f"Full service status:\n{result.output}")
     except Exception as e:
         logging.error(Fore.RED + f"Unexpected error fetching full service status: {e}")
 
 
+@traced("check_service_status_remote")
 def check_service_status_remote():
     """Checks if the Assetto Corsa service is running or has failed on the remote VM."""
     try:
-        active_command = "sudo systemctl is-active assetto.service"
-        if not execute_remote_command(vm_instance_name, vm_zone, active_command):
+        # One round trip: state, failure flag and, if needed, the recent logs
+        status_command = (
+            "state=$(sudo systemctl is-active assetto.service 2>/dev/null); "
+            'echo "$state"; '
+            'if [ "$state" != active ]; then '
+            "if sudo systemctl is-failed --quiet assetto.service 2>/dev/null; "
+            "then echo failed; else echo not-failed; fi; "
+            f"{SERVICE_LOG_COMMAND}; fi"
+        )
+        result = get_remote_session(vm_instance_name, vm_zone).run(status_command)
+        lines = result.output.splitlines()
+        state = lines[0].strip() if lines else ""
+        if state != "active":
             logging.info(Fore.BLUE + "Assetto Corsa service is not active.")
-            failed_command = "sudo systemctl is-failed assetto.service"
-            if execute_remote_command(vm_instance_name, vm_zone, failed_command):
+            if len(lines) > 1 and lines[1].strip() == "failed":
                 logging.error(Fore.RED + "Assetto Corsa service has failed.")
-                get_service_logs_remote()
-                return False
             else:
                 logging.error(
                     Fore.RED + "Assetto Corsa service is not active and has not failed."
                 )
-                get_service_logs_remote()
-                return False
+            analyze_service_logs("\n".join(lines[2:]))
+            return False
 
         logging.info(Fore.GREEN + "Checked service status successfully.")
         return True
-    except subprocess.CalledProcessError as e:
-        logging.error(Fore.RED + f"Error checking service status: {e.stderr.decode()}")
-        return False
     except Exception as e:
         logging.error(Fore.RED + f"Unexpected error checking service status: {e}")
         return False
 
 
+def analyze_service_logs(logs):
+    """Logs the service output and flags known configuration errors."""
+    logging.info(Fore.BLUE + f"Service logs:\n{logs}")
+
+    # Analyze the logs for known errors
+    if "No track params found" in logs:
+        logging.error(Fore.RED + "Configuration error detected: Missing track parameters.")
+    elif "Error executing critical background service" in logs:
+        logging.error(Fore.RED + "Service encountered a critical error.")
+    else:
+        logging.info(Fore.BLUE + "No specific errors detected in the service logs.")
+
+
+@traced("get_service_logs_remote")
 def get_service_logs_remote():
     """Fetches and analyzes the last few lines of the Assetto Corsa service logs on the remote VM."""
     try:
-        log_command = "sudo journalctl -u assetto.service -n 20 --no-pager"
-        log_output = subprocess.run(
-            [
-                "gcloud",
-                "compute",
-                "ssh",
-                vm_instance_name,
-                "--zone",
-                vm_zone,
-                "--command",
-                log_command,
-            ],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        result = get_remote_session(vm_instance_name, vm_zone).run(SERVICE_LOG_COMMAND)
+        if result.returncode != 0:
+            logging.error(Fore.RED + f"Error fetching service logs: {result.output}")
+            return
+        analyze_service_logs(result.output)
+    except Exception as e:
+        logging.error(Fore.RED + f"Unexpected error fetching service logs: {e}")
 
-        logs = log_output.stdout.decode()
-        logging.info(Fore.BLUE + f"Service logs:\n{logs}")
 
-        # Analyze the logs for known errors
-        if "No track params found" in logs:
-            logging.error(
-                Fore.RED + "Configuration error detected: Missing track parameters."
+@traced("publish_content")
+def publish_content(car_files, track_files, versions=None, car_skins=None):
+    """Zips and uploads the given cars and tracks that are not current in GCS.
+
+    versions is the result of mod_versions(), computed here if not given.
+    Cars in car_skins ({car: skins}) are published as archives holding only
+    those skins. Returns the pipeline's ItemResults (empty if everything was
+    up to date), named after the archives.
+    """
+    if versions is None:
+        versions = mod_versions(car_files, track_files, car_skins)
+
+    # Prepare directories for zipping and uploading
+    os.makedirs("uploads", exist_ok=True)
+
+    # List the bucket once up front instead of checking each mod separately
+    prefixes = ("cars/", "tracks/")
+    if upload_mode == "cas":
+        prefixes += (CAS_PREFIX,)
+    inventory = BucketInventory(bucket_name, prefixes=prefixes).load()
+    manifest = ManifestStore()
+
+    # Collect the car and track directories that still need publishing
+    jobs = []
+    filters = {}
+    for kind, names in (("cars", car_files), ("tracks", track_files)):
+        for name in names:
+            source_dir = os.path.join(assetto_corsa_dir, kind, name)
+            if not os.path.exists(source_dir):
+                logging.info(Fore.BLUE + f"Directory does not exist: {source_dir}")
+                continue
+
+            # Compare the mod's fingerprint with the one stored on the GCS object
+            variant, include = mod_variant(kind, name, car_skins)
+            filters[(kind, variant)] = include
+            gcs_path = mod_object_name(kind, variant, versions.get((kind, variant)))
+            output_base = os.path.join("uploads", variant)
+            action, fingerprint = plan_mod(
+                f"{kind}/{variant}.zip",
+                source_dir,
+                f"{output_base}.zip",
+                manifest,
+                inventory,
+                gcs_path,
+                fingerprint=versions.get((kind, variant)),
+                include=include,
+            )
+            if action == "skip":
+                logging.info(
+                    Fore.BLUE
+                    + f"Zip file {gcs_path} is up to date in GCS. Skipping upload."
+                )
+                continue
+            if action == "adopt":
+                tag_gcs_object(
+                    bucket_name,
+                    gcs_path,
+                    {FINGERPRINT_METADATA_KEY: fingerprint},
+                    inventory,
+                )
+                continue
+
+            logging.info(Fore.BLUE + f"{gcs_path} needs {action}.")
+            skins = (car_skins or {}).get(name) if kind == "cars" else None
+            jobs.append(
+                PipelineJob(
+                    kind,
+                    variant,
+                    source_dir,
+                    output_base,
+                    gcs_path,
+                    fingerprint,
+                    f"{output_base}.zip" if action == "upload" else None,
+                    (("skins", skins),) if skins is not None else None,
+                )
+            )
+
+    # Start the largest mods first (LPT) so a big track does not finish last
+    sizes = {
+        job: sum(
+            entry[0]
+            for entry in manifest.get(f"{job.kind}/{job.name}.zip")
+            .get("files", {})
+            .values()
+        )
+        for job in jobs
+    }
+    jobs = largest_first(jobs, sizes.get)
+
+    def job_cache_control(job):
+        return mod_cache_control(versions.get((job.kind, job.name)))
+
+    zip_workers, upload_workers, queue_size = get_worker_counts()
+    # Concurrent zips share one CPU budget: each large mod's parallel builder
+    # gets its share of ARCHIVE_WORKERS instead of a full pool per process
+    active_zips = min(zip_workers, sum(1 for job in jobs if not job.archive))
+    archive_share = max(1, archive_workers // max(1, active_zips))
+    # Progress is measured against the uncompressed size, so the ETA is an upper bound
+    with get_scheduler().progress("Publishing", sum(sizes.values())) as progress:
+        if upload_mode == "stream":
+            # Zip each mod directly into its upload; no staging file on disk
+            results = run_streaming(
+                jobs,
+                lambda job: stream_zip_to_gcs(
+                    job.source_dir,
+                    bucket_name,
+                    job.destination,
+                    inventory,
+                    metadata={FINGERPRINT_METADATA_KEY: job.fingerprint},
+                    cache_control=job_cache_control(job),
+                    progress=progress,
+                    include=filters[(job.kind, job.name)],
+                ),
+                workers=upload_workers,
+            )
+        elif upload_mode == "cas":
+            # Upload only the parts the bucket lacks; each zip is composed server-side
+            results = run_streaming(
+                jobs,
+                lambda job: publish_to_chunk_store(
+                    job.source_dir,
+                    bucket_name,
+                    job.destination,
+                    manifest.get(f"{job.kind}/{job.name}.zip").get("files", {}),
+                    inventory,
+                    metadata={FINGERPRINT_METADATA_KEY: job.fingerprint},
+                    cache_control=job_cache_control(job),
+                    progress=progress,
+                    include=filters[(job.kind, job.name)],
+                ),
+                workers=upload_workers,
             )
-        elif "Error executing critical background service" in logs:
-            logging.error(Fore.RED + "Service encountered a critical error.")
         else:
-            logging.info(Fore.BLUE + "No specific errors detected in the service logs.")
-    except subprocess.CalledProcessError as e:
-        logging.error(Fore.RED + f"Error fetching service logs: {e.stderr.decode()}")
-    except Exception as e:
-        logging.error(Fore.RED + f"Unexpected error fetching service logs: {e}")
+            # Zip and upload concurrently: compression and uploads overlap
+            results = run_pipeline(
+                jobs,
+                # Pass settings explicitly; spawned workers do not load .env
+                functools.partial(
+                    zip_directory, auto=zip_auto_compression, workers=archive_share
+                ),
+                lambda job, archive: upload_file_to_gcs(
+                    archive,
+                    bucket_name,
+                    job.kind,
+                    inventory,
+                    metadata={FINGERPRINT_METADATA_KEY: job.fingerprint},
+                    overwrite=True,
+                    blob_name=job.destination,
+                    cache_control=job_cache_control(job),
+                    progress=progress,
+                ),
+                zip_workers=zip_workers,
+                upload_workers=upload_workers,
+                queue_size=queue_size,
+            )
+    log_results(results)
+
+    # Remember which fingerprint each staged archive was built from
+    fingerprints = {(job.kind, job.name): job.fingerprint for job in jobs}
+    for result in results:
+        if result.archive:
+            manifest.update(
+                f"{result.kind}/{result.name}.zip",
+                archive_fingerprint=fingerprints[(result.kind, result.name)],
+            )
+    manifest.save()
+    return results
+
+
+@traced("prepare_server_config")
+def prepare_server_config(
+    unzip_directory, car_files, track_files, versions=None, car_skins=None
+):
+    """Adds data_track_params.ini and the mod download URLs to an extracted cfg folder."""
+    # Download the `data_track_params.ini` file after unzipping
+    cfg_dir = os.path.join(unzip_directory, "cfg")
+    os.makedirs(cfg_dir, exist_ok=True)  # Ensure the cfg directory exists
+
+    ini_file_url = "https://raw.githubusercontent.com/ac-custom-shaders-patch/acc-extension-config/master/config/data_track_params.ini"
+    ini_file_path = os.path.join(cfg_dir, "data_track_params.ini")
+
+    download_file(ini_file_url, ini_file_path)
+
+    # Add the custom sections to `data_track_params.ini` unless already present
+    additional_text = """
+    [CA-9 Saratoga]
+    NAME=CA-9 Saratoga
+    LATITUDE=37.26034168298367
+    LONGITUDE=-122.03281999062112
+    TIMEZONE=America/Los_Angeles
+    """
+    append_ini_sections(ini_file_path, additional_text)
+
+    # Update the JSON file with missing URLs
+    content_json_path = os.path.join(
+        unzip_directory, "cfg", "cm_content", "content.json"
+    )
+    update_json_file(content_json_path, car_files, track_files, versions, car_skins)
+
+    # Print the contents of content.json if it exists
+    print_json_content(content_json_path)
 
 
 def main():
+    pack = None
+    tracing.start_run("deploy")
     try:
+        load_settings()
+
         # Get user input for zip file
         zip_file_path = input("Enter the path to the zip file: ").strip()
 
@@ -582,9 +1548,13 @@ def main():
             return
 
         logging.info(Fore.BLUE + f"Processing zip file: {zip_file_path}")
+        require_settings("the GCS upload", GCS_SETTINGS)
+
+        # Scan the zip's entry list once; later stages reuse the classification
+        pack = ServerPack(zip_file_path)
 
         # Identify non-base content from the zip file
-        car_files, track_files = find_non_base_content(zip_file_path)
+        car_files, track_files = find_non_base_content(zip_file_path, pack)
 
         if not car_files and not track_files:
             logging.info(
@@ -598,113 +1568,526 @@ def main():
             + f"Found {len(car_files)} car files and {len(track_files)} track files to upload."
         )
 
-        # Prepare directories for zipping and uploading
-        os.makedirs("uploads", exist_ok=True)
+        require_settings("the VM deploy", VM_SETTINGS)
 
-        # Process car files
-        for car in car_files:
-            car_dir = os.path.join(assetto_corsa_dir, "cars", car)
-            if os.path.exists(car_dir):
-                zip_filename = os.path.join("uploads", car)
+        # Cars are archived with only the skins this server's entry list uses
+        car_skins = pack_car_skins(pack)
 
-                # Check if the zip file already exists in GCS
-                gcs_path = f"cars/{car}.zip"
-                if file_exists_in_gcs(bucket_name, gcs_path):
-                    logging.info(
-                        Fore.BLUE
-                        + f"Zip file {gcs_path} already exists in GCS. Skipping upload."
-                    )
-                    continue  # Skip zipping and uploading if file already exists
+        # Extract only what the deploy needs. Delta and bucket syncs read
+        # content/ and system/ straight from the zip, so only cfg (which is
+        # edited below) goes to disk; scp needs every deploy folder on disk.
+        unzip_directory = os.path.join("uploads", "unzipped_content")
+        streamed = vm_sync_mode in ("delta", "bucket")
 
-                # Zip and upload the car directory
-                zipped_file = zip_directory(car_dir, zip_filename)
-                if zipped_file:
-                    upload_file_to_gcs(zipped_file, bucket_name, "cars")
-            else:
-                logging.info(Fore.BLUE + f"Car directory does not exist: {car_dir}")
-
-        # Process track files
-        for track in track_files:
-            track_dir = os.path.join(assetto_corsa_dir, "tracks", track)
-            if os.path.exists(track_dir):
-                zip_filename = os.path.join("uploads", track)
-
-                # Check if the zip file already exists in GCS
-                gcs_path = f"tracks/{track}.zip"
-                if file_exists_in_gcs(bucket_name, gcs_path):
-                    logging.info(
-                        Fore.BLUE
-                        + f"Zip file {gcs_path} already exists in GCS. Skipping upload."
-                    )
-                    continue  # Skip zipping and uploading if file already exists
+        # With release directories, the new tree is prepared next to the live one
+        release_id = new_release_id() if vm_releases else None
+
+        def versions(results):
+            return mod_versions(car_files, track_files, car_skins)
 
-                # Zip and upload the track directory
-                zipped_file = zip_directory(track_dir, zip_filename)
-                if zipped_file:
-                    upload_file_to_gcs(zipped_file, bucket_name, "tracks")
+        def publish(results):
+            failed = [
+                f"{item.kind}/{item.name}"
+                for item in publish_content(
+                    car_files, track_files, results["versions"], car_skins
+                )
+                if item.status != "uploaded"
+            ]
+            if failed:
+                # Never restart the server with download links that do not resolve
+                raise RuntimeError(f"Publishing failed for {', '.join(failed)}.")
+
+        def unzip(results):
+            shutil.rmtree(unzip_directory, ignore_errors=True)
+            os.makedirs(unzip_directory, exist_ok=True)
+            unzip_file(
+                zip_file_path,
+                unzip_directory,
+                pack=pack,
+                folders=["cfg"] if streamed else DEPLOY_FOLDERS,
+            )
+
+        def config(results):
+            # content.json only needs the object names, not finished uploads
+            prepare_server_config(
+                unzip_directory,
+                car_files,
+                track_files,
+                results["versions"],
+                car_skins,
+            )
+
+        def remote_directory(results):
+            # Create the remote directory on the VM if it doesn't exist
+            create_remote_directory(vm_instance_name, vm_zone, vm_destination_path)
+
+        def transfer(results):
+            """Sends the new tree to the VM; returns (release_id, remote_archive)."""
+            if streamed:
+                deploy_files = pack.deploy_files(
+                    DEPLOY_FOLDERS, overlay_dir=unzip_directory, overlay_folders=["cfg"]
+                )
+
+            if vm_sync_mode == "delta":
+                # Send only the files that differ from what is already in /opt/ac
+                remote_archive = sync_to_gcp_vm(deploy_files)
+                if not remote_archive:
+                    return None, None
+                if release_id:
+                    prepare_delta_release_remote(release_id, remote_archive)
+                return release_id, remote_archive
+
+            if vm_sync_mode == "bucket":
+                # Stage the bundle in GCS once; the VM pulls it over Google's network
+                pull_bundle_remote(stage_bundle_in_gcs(deploy_files))
+            else:
+                # Upload folders to GCP VM
+                for folder in DEPLOY_FOLDERS:
+                    folder_path = os.path.join(unzip_directory, folder)
+                    if os.path.exists(folder_path):
+                        upload_to_gcp_vm(folder_path, vm_destination_path)
+                    else:
+                        logging.warning(
+                            Fore.BLUE
+                            + f"Folder {folder} does not exist. Skipping upload."
+                        )
+
+            if release_id:
+                prepare_release_remote(release_id)
+            return release_id, None
+
+        def stop(results):
+            # Stop the Assetto Corsa service on the remote server
+            stop_service_remote()
+
+        def swap(results):
+            prepared_release, remote_archive = results["transfer"]
+            if prepared_release:
+                # Swap the current symlink to the prepared release
+                activate_release_remote(prepared_release)
+            elif vm_sync_mode == "delta":
+                if remote_archive:
+                    # Apply the changed and removed files in place
+                    apply_delta_remote(remote_archive)
             else:
-                logging.info(Fore.BLUE + f"Track directory does not exist: {track_dir}")
+                # Replace directories on the remote server
+                replace_directories_remote()
+
+        def start(results):
+            # Start the Assetto Corsa service on the remote server
+            start_service_remote()
+            if vm_releases:
+                prune_releases_remote()
+
+        # Publishing to GCS overlaps the whole VM transfer; the server is only
+        # stopped once both have succeeded
+        run_stages(
+            [
+                Stage("versions", versions, []),
+                Stage("publish", publish, ["versions"]),
+                Stage("unzip", unzip, []),
+                Stage("config", config, ["unzip", "versions"]),
+                Stage("remote_directory", remote_directory, []),
+                Stage("transfer", transfer, ["config", "remote_directory"]),
+                Stage("stop", stop, ["publish", "transfer"]),
+                Stage("swap", swap, ["stop"]),
+                Stage("start", start, ["swap"]),
+            ]
+        )
+
+    except RuntimeError as e:
+        logging.error(Fore.RED + f"A runtime error occurred: {e}")
+    except Exception as e:
+        logging.error(Fore.RED + f"An unexpected error occurred: {e}")
+    finally:
+        if pack:
+            pack.close()
+        close_remote_sessions()
+        tracing.finish_run(trace_dir, prometheus_textfile)
+
+
+def batch(zip_paths):
+    """Publishes the mods of several server packs once, then prepares each pack's cfg.
+
+    Mods shared by several packs are planned, zipped and uploaded a single
+    time; with skin pruning, a shared car's archive holds the skins of every
+    pack that uses it. Each pack's cfg, with its own content.json, is written
+    to uploads/packs/<pack name>/cfg for deploying to its server.
+    """
+    packs = {}
+    tracing.start_run("batch")
+    try:
+        load_settings()
+        require_settings("the GCS upload", GCS_SETTINGS)
+
+        # Union the non-base content (and the skins used) of every pack
+        all_cars, all_tracks = set(), set()
+        car_skins = {}
+        for zip_file_path in zip_paths:
+            if not os.path.exists(zip_file_path):
+                logging.error(
+                    Fore.RED + f"Error: The file {zip_file_path} does not exist."
+                )
+                continue
+            name = os.path.splitext(os.path.basename(zip_file_path))[0]
+            while name in packs:
+                name += "_"
+            pack = ServerPack(zip_file_path)
+            car_files, track_files = find_non_base_content(zip_file_path, pack)
+            packs[name] = (pack, car_files, track_files)
+            all_cars.update(car_files)
+            all_tracks.update(track_files)
+            if skin_pruning:
+                merge_car_skins(car_skins, car_files, pack_car_skins(pack))
+
+        logging.info(
+            Fore.BLUE
+            + f"{len(packs)} packs reference {len(all_cars)} unique cars and {len(all_tracks)} unique tracks."
+        )
+        versions = mod_versions(all_cars, all_tracks, car_skins)
+        failed = {
+            (item.kind, item.name)
+            for item in publish_content(
+                sorted(all_cars), sorted(all_tracks), versions, car_skins
+            )
+            if item.status != "uploaded"
+        }
+
+        for name, (pack, car_files, track_files) in packs.items():
+            output_dir = os.path.join("uploads", "packs", name)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            pack_failed = []
+            for kind, mods in (("cars", car_files), ("tracks", track_files)):
+                for mod in mods:
+                    variant, _ = mod_variant(kind, mod, car_skins)
+                    if (kind, variant) in failed:
+                        pack_failed.append(f"{kind}/{variant}")
+            if pack_failed:
+                # Never hand out a content.json with download links that do not resolve
+                logging.error(
+                    Fore.RED
+                    + f"Skipping the cfg for {name}: publishing failed for {', '.join(pack_failed)}."
+                )
+                continue
+            os.makedirs(output_dir, exist_ok=True)
+            unzip_file(pack.path, output_dir, pack=pack, folders=["cfg"])
+            prepare_server_config(
+                output_dir, car_files, track_files, versions, car_skins
+            )
+            logging.info(Fore.GREEN + f"Prepared cfg for {name} in {output_dir}.")
+
+    except RuntimeError as e:
+        logging.error(Fore.RED + f"A runtime error occurred: {e}")
+    except Exception as e:
+        logging.error(Fore.RED + f"An unexpected error occurred: {e}")
+    finally:
+        for pack, _, _ in packs.values():
+            pack.close()
+        tracing.finish_run(trace_dir, prometheus_textfile)
 
-        # Unzip the original zip file locally after processing
-        unzip_directory = os.path.join("uploads", "unzipped_content")
-        os.makedirs(unzip_directory, exist_ok=True)
-        unzip_file(zip_file_path, unzip_directory)
 
-        # Download the `data_track_params.ini` file after unzipping
-        cfg_dir = os.path.join(unzip_directory, "cfg")
-        os.makedirs(cfg_dir, exist_ok=True)  # Ensure the cfg directory exists
+def watched_pack_content(zip_file_path, car_skins):
+    """Returns (cars, tracks) of a dropped pack's non-base content.
 
-        ini_file_url = "https://raw.githubusercontent.com/ac-custom-shaders-patch/acc-extension-config/master/config/data_track_params.ini"
-        ini_file_path = os.path.join(cfg_dir, "data_track_params.ini")
+    With skin pruning, the pack's skin selection is merged into car_skins as
+    batch() does, so the watcher publishes the archives a deploy of the pack
+    reads. An unreadable pack has no content.
+    """
+    pack = None
+    try:
+        pack = ServerPack(zip_file_path)
+        car_files, track_files = find_non_base_content(zip_file_path, pack)
+        if skin_pruning:
+            merge_car_skins(car_skins, car_files, pack_car_skins(pack))
+        return car_files, track_files
+    except Exception as e:
+        logging.error(Fore.RED + f"Error reading zip file: {e}")
+        return [], []
+    finally:
+        if pack:
+            pack.close()
 
-        download_file(ini_file_url, ini_file_path)
 
-        # Append the specified text to the `data_track_params.ini` file
-        additional_text = """
-        [CA-9 Saratoga]
-        NAME=CA-9 Saratoga
-        LATITUDE=37.26034168298367
-        LONGITUDE=-122.03281999062112
-        TIMEZONE=America/Los_Angeles
-        """
-        append_to_file(ini_file_path, additional_text)
+def watch():
+    """Publishes new or changed mods, and the mods of dropped server packs, as they settle.
 
-        # Update the JSON file with missing URLs
-        content_json_path = os.path.join(
-            unzip_directory, "cfg", "cm_content", "content.json"
+    Polls ASSETTO_CORSA_DIR/cars, ASSETTO_CORSA_DIR/tracks and the drop folder.
+    Mods already installed at startup are the baseline; zips already in the
+    drop folder are processed once. Deploys then only need the config push.
+    """
+    try:
+        load_settings()
+        require_settings("watch mode", GCS_SETTINGS)
+        base_cars, base_tracks = get_base_content()
+        exclude = {"cars": base_cars, "tracks": base_tracks}
+        debouncer = ChangeDebouncer(WATCH_DEBOUNCE_SECONDS)
+        processed = snapshot_mods(assetto_corsa_dir, exclude)
+        os.makedirs(watch_drop_dir, exist_ok=True)
+        logging.info(
+            Fore.BLUE
+            + f"Watching {assetto_corsa_dir} and {watch_drop_dir} for new content. Press Ctrl+C to stop."
         )
-        update_json_file(content_json_path, car_files, track_files)
 
-        # Print the contents of content.json if it exists
-        print_json_content(content_json_path)
+        while True:
+            current = snapshot_mods(assetto_corsa_dir, exclude)
+            current.update(snapshot_zips(watch_drop_dir))
+            for key in debouncer.pending() - set(current):
+                debouncer.discard(key)
+            for key, signature in current.items():
+                if processed.get(key) != signature:
+                    debouncer.observe(key, signature)
+
+            settled = debouncer.ready()
+            if settled:
+                car_files, track_files = set(), set()
+                # Packs' skin selections, so the archives deploys read are published
+                car_skins = {}
+                # The mods each settled item stands for
+                mods = {}
+                for kind, name in settled:
+                    if kind == "pack":
+                        logging.info(Fore.BLUE + f"New server pack: {name}")
+                        pack_cars, pack_tracks = watched_pack_content(name, car_skins)
+                        car_files.update(pack_cars)
+                        track_files.update(pack_tracks)
+                        mods[(kind, name)] = {("cars", car) for car in pack_cars} | {
+                            ("tracks", track) for track in pack_tracks
+                        }
+                    elif kind == "cars":
+                        car_files.add(name)
+                        mods[(kind, name)] = {(kind, name)}
+                    else:
+                        track_files.add(name)
+                        mods[(kind, name)] = {(kind, name)}
+                try:
+                    failed = {
+                        (item.kind, item.name)
+                        for item in publish_content(
+                            sorted(car_files), sorted(track_files), car_skins=car_skins
+                        )
+                        if item.status != "uploaded"
+                    }
+                    # Items with a failed mod are left unprocessed, so they are
+                    # retried once they settle again
+                    processed.update(
+                        (key, signature)
+                        for key, signature in settled.items()
+                        if not any(
+                            (kind, mod_variant(kind, mod, car_skins)[0]) in failed
+                            for kind, mod in mods[key]
+                        )
+                    )
+                except Exception as e:
+                    # Left unprocessed, so the items are retried once they settle again
+                    logging.error(Fore.RED + f"Error publishing changed content: {e}")
+
+            time.sleep(WATCH_INTERVAL_SECONDS)
+    except KeyboardInterrupt:
+        logging.info(Fore.BLUE + "Watch mode stopped.")
+    except RuntimeError as e:
+        logging.error(Fore.RED + f"A runtime error occurred: {e}")
+
 
-        # Create the remote directory on the VM if it doesn't exist
-        create_remote_directory(vm_instance_name, vm_zone, vm_destination_path)
+# Trace spans whose measured throughput predicts each transfer of a deploy
+PUBLISH_SPANS = {
+    "staged": "upload_file_to_gcs",
+    "stream": "stream_zip_to_gcs",
+    "cas": "publish_to_chunk_store",
+}
+VM_SYNC_SPANS = {
+    "scp": "upload_to_gcp_vm",
+    "delta": "upload_to_gcp_vm",
+    "bucket": "stage_bundle_in_gcs",
+}
+
+
+def plan_publish(car_files, track_files, car_skins=None):
+    """Returns (ModPlans, bytes to zip) for what publish_content would do, without writes.
+
+    Only files whose size or mtime changed since the last run are hashed.
+    Archive sizes come from the staged archives where current, and are
+    otherwise estimated with the compression ratios the staged archives show.
+    """
+    prefixes = ("cars/", "tracks/")
+    if upload_mode == "cas":
+        prefixes += (CAS_PREFIX,)
+    inventory = BucketInventory(bucket_name, prefixes=prefixes).load()
+    manifest = ManifestStore()
+
+    mods = []
+    for kind, names in (("cars", car_files), ("tracks", track_files)):
+        for name in sorted(names):
+            source_dir = os.path.join(assetto_corsa_dir, kind, name)
+            if not os.path.exists(source_dir):
+                logging.info(Fore.BLUE + f"Directory does not exist: {source_dir}")
+                continue
+            variant, include = mod_variant(kind, name, car_skins)
+            key = f"{kind}/{variant}.zip"
+            fingerprint, files = fingerprint_tree(
+                source_dir, manifest.get(key).get("files"), include
+            )
+            archive_path = os.path.join("uploads", f"{variant}.zip")
+            blob_name = mod_object_name(
+                kind, variant, fingerprint if versioned_objects else None
+            )
+            action, _ = plan_mod(
+                key,
+                source_dir,
+                archive_path,
+                manifest,
+                inventory,
+                blob_name,
+                fingerprint=fingerprint,
+            )
+            mods.append((kind, variant, action, files, archive_path))
+
+    previous = {mod[4]: read_zip_sizes(mod[4]) for mod in mods}
+    ratios = learn_ratios(previous.values())
+    plans = []
+    zip_bytes = 0
+    for kind, variant, action, files, archive_path in mods:
+        sizes = {rel: entry[0] for rel, entry in files.items()}
+        if action in ("skip", "adopt"):
+            upload_bytes = 0
+        elif upload_mode == "cas":
+            upload_bytes = estimate_chunk_store_upload(
+                files, inventory, previous[archive_path], ratios
+            )
+        elif action == "upload":
+            # Streaming rebuilds the same bytes as the current staged archive
+            upload_bytes = os.path.getsize(archive_path)
+        else:
+            upload_bytes = estimate_zip_size(sizes, previous[archive_path], ratios)
+            if upload_mode == "staged":
+                zip_bytes += upload_bytes
+        plans.append(ModPlan(kind, variant, action, sum(sizes.values()), upload_bytes))
+    return plans, zip_bytes
 
-        # Upload folders to GCP VM
-        for folder in ["cfg", "content", "system"]:
-            folder_path = os.path.join(unzip_directory, folder)
-            if os.path.exists(folder_path):
-                upload_to_gcp_vm(folder_path, vm_destination_path)
-            else:
-                logging.warning(
-                    Fore.BLUE + f"Folder {folder} does not exist. Skipping upload."
-                )
 
-        # Stop the Assetto Corsa service on the remote server
-        stop_service_remote()
+def _format_seconds(seconds):
+    return "unknown" if seconds is None else f"~{seconds:.0f}s"
 
-        # Replace directories on the remote server
-        replace_directories_remote()
 
-        # Start the Assetto Corsa service on the remote server
-        start_service_remote()
+def plan(zip_file_path):
+    """Reports what deploying a server pack would transfer and how long it would take.
+
+    Runs the content detection, bucket listing and local scan of a deploy,
+    but uploads, zips and writes nothing and runs nothing on the VM.
+    Durations use the throughput measured in previous runs' traces.
+    """
+    pack = None
+    try:
+        load_settings()
+        require_settings("the plan", GCS_SETTINGS)
+        if not os.path.exists(zip_file_path):
+            logging.error(Fore.RED + f"Error: The file {zip_file_path} does not exist.")
+            return
+
+        pack = ServerPack(zip_file_path)
+        car_files, track_files = find_non_base_content(zip_file_path, pack)
+        plans, zip_bytes = plan_publish(car_files, track_files, pack_car_skins(pack))
+
+        mb = 1024 * 1024
+        for item in plans:
+            logging.info(
+                Fore.BLUE
+                + f"{item.action:<7}{item.kind}/{item.name}: {item.raw_bytes / mb:.1f} MB raw, "
+                f"{item.upload_bytes / mb:.1f} MB to upload"
+            )
+        upload_bytes = sum(item.upload_bytes for item in plans)
+
+        # Every mode sends cfg/content/system; delta sends at most the compressed tree
+        entries = pack.entries(DEPLOY_FOLDERS)
+        if vm_sync_mode == "scp":
+            vm_bytes = sum(info.file_size for info in entries)
+        else:
+            vm_bytes = sum(info.compress_size for info in entries)
 
+        rates = load_throughput(trace_dir)
+        limit = get_scheduler().rate()
+        zip_seconds = estimate_seconds(zip_bytes, rates.get("zip_directory"))
+        upload_seconds = estimate_seconds(
+            upload_bytes, rates.get(PUBLISH_SPANS.get(upload_mode)), limit
+        )
+        vm_seconds = estimate_seconds(
+            vm_bytes, rates.get(VM_SYNC_SPANS.get(vm_sync_mode)), limit
+        )
+        # Zipping overlaps the uploads, and publishing overlaps the VM transfer
+        parts = [zip_seconds, upload_seconds, vm_seconds]
+        total = None if None in parts else max(max(parts[:2]), vm_seconds)
+
+        logging.info(
+            Fore.GREEN
+            + f"Plan: {sum(item.upload_bytes > 0 for item in plans)} of {len(plans)} mods to upload; "
+            f"{zip_bytes / mb:.1f} MB to zip ({_format_seconds(zip_seconds)}), "
+            f"{upload_bytes / mb:.1f} MB to GCS ({_format_seconds(upload_seconds)}), "
+            f"{'up to ' if vm_sync_mode == 'delta' else ''}{vm_bytes / mb:.1f} MB to the VM "
+            f"by {vm_sync_mode} ({_format_seconds(vm_seconds)}); "
+            f"estimated total {_format_seconds(total)}."
+        )
+        if total is None:
+            logging.info(
+                Fore.BLUE
+                + f"No throughput has been measured for some steps yet; run traces in {trace_dir} provide it."
+            )
+        return plans
+    except RuntimeError as e:
+        logging.error(Fore.RED + f"A runtime error occurred: {e}")
+    except Exception as e:
+        logging.error(Fore.RED + f"An unexpected error occurred: {e}")
+    finally:
+        if pack:
+            pack.close()
+
+
+def rollback():
+    """Switches the server back to its previous release."""
+    try:
+        require_settings("the rollback", VM_SETTINGS)
+        rollback_release_remote()
     except RuntimeError as e:
         logging.error(Fore.RED + f"A runtime error occurred: {e}")
     except Exception as e:
         logging.error(Fore.RED + f"An unexpected error occurred: {e}")
+    finally:
+        close_remote_sessions()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Upload Assetto Corsa mods to GCS and deploy a server pack."
+    )
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help="switch the server back to its previous release and exit",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and pre-publish new or changed mods and dropped server packs",
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="ZIP",
+        help="publish the mods of several server packs at once and prepare each pack's cfg",
+    )
+    parser.add_argument(
+        "--plan",
+        metavar="ZIP",
+        help="show what deploying a server pack would upload and how long it would take, without doing it",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.rollback:
+        rollback()
+    elif args.plan:
+        plan(args.plan)
+    elif args.batch:
+        batch(args.batch)
+    elif args.watch:
+        watch()
+    else:
+        main()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from colorama import Fore
+
+# Object metadata key holding the fingerprint of the content an archive was built from
+FINGERPRINT_METADATA_KEY = "ac-fingerprint"
+
+# Local store of per-mod fingerprints, kept next to the staged archives
+DEFAULT_MANIFEST_PATH = os.path.join("uploads", "fingerprints.json")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def scan_tree(source_dir, include=None):
+    """Returns {relative path: (size, mtime_ns)} for every file under source_dir.
+
+    include(relative path), if given, selects files and directories.
+    """
+    entries = {}
+    stack = [(source_dir, "")]
+    while stack:
+        path, prefix = stack.pop()
+        with os.scandir(path) as it:
+            for entry in it:
+                rel = prefix + entry.name
+                if include and not include(rel):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, rel + "/"))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    entries[rel] = (stat.st_size, stat.st_mtime_ns)
+    return entries
+
+
+def hash_file(path):
+    """Returns the hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint_tree(source_dir, previous_files=None, include=None):
+    """Fingerprints a mod directory.
+
+    Files whose (size, mtime) match previous_files reuse the recorded hash; only
+    new or touched files are read. Returns (fingerprint, files) where files maps
+    each relative path to [size, mtime_ns, sha256] and the fingerprint is a hash
+    over the sorted (path, sha256) pairs, so it only changes with content.
+    include selects files as in scan_tree.
+    """
+    previous_files = previous_files or {}
+    files = {}
+    hashed = 0
+    for rel, (size, mtime_ns) in scan_tree(source_dir, include).items():
+        known = previous_files.get(rel)
+        if known and known[0] == size and known[1] == mtime_ns:
+            files[rel] = [size, mtime_ns, known[2]]
+        else:
+            files[rel] = [size, mtime_ns, hash_file(os.path.join(source_dir, rel))]
+            hashed += 1
+
+    combined = hashlib.sha256()
+    for rel in sorted(files):
+        combined.update(f"{rel}\0{files[rel][2]}\n".encode("utf-8"))
+    if hashed:
+        logging.info(Fore.BLUE + f"Hashed {hashed} changed files in {source_dir}.")
+    return combined.hexdigest(), files
+
+
+class ManifestStore:
+    """Local JSON record of mod fingerprints and the archives built from them."""
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            try:
+                with open(path, "r") as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.error(
+                    Fore.RED + f"Error reading {path}: {e}. Starting a new manifest."
+                )
+
+    def get(self, key):
+        with self._lock:
+            return dict(self._entries.get(key, {}))
+
+    def update(self, key, **fields):
+        with self._lock:
+            self._entries.setdefault(key, {}).update(fields)
+
+    def save(self):
+        """Writes the manifest atomically."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def fingerprint_mod(key, source_dir, store, include=None):
+    """Fingerprints a mod, reusing and updating the file hashes kept in the store."""
+    fingerprint, files = fingerprint_tree(
+        source_dir, store.get(key).get("files"), include
+    )
+    store.update(key, fingerprint=fingerprint, files=files)
+    return fingerprint
+
+
+def plan_mod(
+    key,
+    source_dir,
+    archive_path,
+    store,
+    inventory,
+    blob_name,
+    fingerprint=None,
+    include=None,
+):
+    """Decides what a mod needs without compressing anything.
+
+    Returns (action, fingerprint) where action is "skip" (bucket is current),
+    "adopt" (legacy object without a fingerprint, just tag it), "upload" (the
+    staged archive is current, upload it again) or "zip". The fingerprint is
+    computed (and recorded in the store) unless it is passed in; include
+    selects the files it covers as in scan_tree.
+    """
+    entry = store.get(key)
+    if fingerprint is None:
+        fingerprint = fingerprint_mod(key, source_dir, store, include)
+
+    remote = inventory.get(blob_name)
+    if remote is not None:
+        remote_fingerprint = remote.metadata.get(FINGERPRINT_METADATA_KEY)
+        if remote_fingerprint == fingerprint:
+            return "skip", fingerprint
+        if remote_fingerprint is None and entry.get("fingerprint") in (
+            None,
+            fingerprint,
+        ):
+            # Uploaded before fingerprints existed and unchanged since we last
+            # saw it; tag the existing object instead of uploading it again
+            return "adopt", fingerprint
+
+    if (
+        entry.get("archive_fingerprint") == fingerprint
+        and archive_path
+        and os.path.exists(archive_path)
+    ):
+        return "upload", fingerprint
+    return "zip", fingerprint
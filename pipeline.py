@@ -0,0 +1,187 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent import futures as cf
+
+from colorama import Fore
+
+import tracing
+
+# A single mod to be archived and published as the destination object;
+# archive is set when a current staged zip already exists and only the upload
+# is needed; zip_options are extra (keyword, value) pairs passed to zip_fn
+PipelineJob = namedtuple(
+    "PipelineJob",
+    [
+        "kind",
+        "name",
+        "source_dir",
+        "output_base",
+        "destination",
+        "fingerprint",
+        "archive",
+        "zip_options",
+    ],
+    defaults=(None, None, None),
+)
+
+# Outcome of one job: status is "uploaded", "zip_failed" or "upload_failed"
+ItemResult = namedtuple("ItemResult", ["kind", "name", "status", "archive", "error"])
+
+DEFAULT_ZIP_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+def _timed_call(fn, *args, **kwargs):
+    """Runs fn in a worker process and returns (result, start, end) for tracing."""
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return result, start, time.time()
+
+
+def get_worker_counts():
+    """Reads the pipeline worker counts from the environment."""
+    zip_workers = int(os.getenv("ZIP_WORKERS") or DEFAULT_ZIP_WORKERS)
+    upload_workers = int(os.getenv("UPLOAD_WORKERS") or DEFAULT_UPLOAD_WORKERS)
+    queue_size = int(os.getenv("UPLOAD_QUEUE_SIZE") or DEFAULT_QUEUE_SIZE)
+    return max(1, zip_workers), max(1, upload_workers), max(1, queue_size)
+
+
+def run_pipeline(
+    jobs,
+    zip_fn,
+    upload_fn,
+    zip_workers=DEFAULT_ZIP_WORKERS,
+    upload_workers=DEFAULT_UPLOAD_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE,
+):
+    """Zips jobs in a process pool while a thread pool uploads finished archives.
+
+    zip_fn(source_dir, output_base, **zip_options) runs in a worker process and
+    must return the archive path (or None on failure); upload_fn(job, archive)
+    runs in an upload thread and must return True on success. Finished archives
+    wait in a bounded queue, so compression stalls rather than filling the disk
+    when the uplink is the bottleneck. Returns one ItemResult per job.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+
+    results = []
+    results_lock = threading.Lock()
+    upload_queue = queue.Queue(maxsize=queue_size)
+
+    def add_result(result):
+        with results_lock:
+            results.append(result)
+
+    def uploader():
+        while True:
+            item = upload_queue.get()
+            if item is _DONE:
+                return
+            job, archive = item
+            try:
+                if upload_fn(job, archive):
+                    add_result(ItemResult(job.kind, job.name, "uploaded", archive, None))
+                else:
+                    add_result(
+                        ItemResult(job.kind, job.name, "upload_failed", archive, None)
+                    )
+            except Exception as e:
+                logging.error(Fore.RED + f"Error uploading {job.name}: {e}")
+                add_result(ItemResult(job.kind, job.name, "upload_failed", archive, e))
+
+    threads = [
+        threading.Thread(target=uploader, name=f"upload-{i}", daemon=True)
+        for i in range(upload_workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        with cf.ProcessPoolExecutor(max_workers=zip_workers) as pool:
+            futures = {
+                pool.submit(
+                    _timed_call,
+                    zip_fn,
+                    job.source_dir,
+                    job.output_base,
+                    **dict(job.zip_options or ()),
+                ): job
+                for job in jobs
+                if not job.archive
+            }
+            # Archives that are already current go straight to the uploaders
+            for job in jobs:
+                if job.archive:
+                    upload_queue.put((job, job.archive))
+            for future in cf.as_completed(futures):
+                job = futures[future]
+                try:
+                    archive, start, end = future.result()
+                except Exception as e:
+                    logging.error(Fore.RED + f"Error zipping {job.name}: {e}")
+                    add_result(ItemResult(job.kind, job.name, "zip_failed", None, e))
+                    continue
+                # The zip ran in another process; record its span here
+                tracing.record(
+                    "zip_directory",
+                    start,
+                    end,
+                    bytes=os.path.getsize(archive) if archive else 0,
+                    mod=f"{job.kind}/{job.name}",
+                )
+                if not archive:
+                    add_result(ItemResult(job.kind, job.name, "zip_failed", None, None))
+                    continue
+                # Blocks while the upload queue is full
+                upload_queue.put((job, archive))
+    finally:
+        for _ in threads:
+            upload_queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    return results
+
+
+def run_streaming(jobs, stream_fn, workers=DEFAULT_UPLOAD_WORKERS):
+    """Runs stream_fn(job) for each job in a thread pool.
+
+    Used when archives are written straight into their uploads, so there is no
+    separate compression stage to overlap with. zlib releases the GIL while
+    compressing, so the threads still use several cores.
+    """
+    results = []
+    with cf.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(stream_fn, job): job for job in jobs}
+        for future in cf.as_completed(futures):
+            job = futures[future]
+            try:
+                ok = future.result()
+                error = None
+            except Exception as e:
+                logging.error(Fore.RED + f"Error streaming {job.name}: {e}")
+                ok, error = False, e
+            status = "uploaded" if ok else "upload_failed"
+            results.append(ItemResult(job.kind, job.name, status, None, error))
+    return results
+
+
+def log_results(results):
+    """Logs a per-item summary of a pipeline run."""
+    for result in sorted(results, key=lambda r: (r.kind, r.name)):
+        if result.status == "uploaded":
+            logging.info(Fore.GREEN + f"{result.kind} {result.name}: uploaded")
+        else:
+            detail = f" ({result.error})" if result.error else ""
+            logging.error(
+                Fore.RED + f"{result.kind} {result.name}: {result.status}{detail}"
+            )
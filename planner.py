@@ -0,0 +1,166 @@
+import glob
+import json
+import os
+from collections import namedtuple
+from zipfile import BadZipFile, ZipFile
+
+from archive import FAST, MAX, STORE, choose_method
+from chunk_store import INLINE_FILE_SIZE, data_blob_name
+from tracing import DEFAULT_TRACE_DIR
+
+# Compressed size / raw size assumed for each method until staged archives
+# show what this content actually achieves
+DEFAULT_RATIOS = {STORE: 1.0, FAST: 0.8, MAX: 0.3}
+
+# Header bytes of every zip entry besides its name (which appears twice):
+# the local file header and the central directory record
+ENTRY_OVERHEAD = 30 + 46
+END_RECORD_SIZE = 22
+
+# Number of recent run traces used to measure throughput
+HISTORY_RUNS = 10
+
+# What a deploy would do for one mod: action is as for manifest.plan_mod;
+# upload_bytes is the (estimated) number of bytes sent to the bucket
+ModPlan = namedtuple("ModPlan", ["kind", "name", "action", "raw_bytes", "upload_bytes"])
+
+
+def read_zip_sizes(path):
+    """Returns {arcname: (file_size, compress_size)} from a zip's central directory.
+
+    Empty if the archive is missing or unreadable. Only the directory is read.
+    """
+    try:
+        with ZipFile(path) as zip_ref:
+            return {
+                info.filename: (info.file_size, info.compress_size)
+                for info in zip_ref.infolist()
+                if not info.is_dir()
+            }
+    except (OSError, BadZipFile):
+        return {}
+
+
+def learn_ratios(archives, policy=None):
+    """Returns DEFAULT_RATIOS updated with the ratio each method reached in archives.
+
+    archives is an iterable of read_zip_sizes() results.
+    """
+    totals = {}
+    for sizes in archives:
+        for arcname, (file_size, compress_size) in sizes.items():
+            method = choose_method(arcname, policy)
+            raw, packed = totals.get(method, (0, 0))
+            totals[method] = (raw + file_size, packed + compress_size)
+    ratios = dict(DEFAULT_RATIOS)
+    for method, (raw, packed) in totals.items():
+        if raw:
+            ratios[method] = packed / raw
+    return ratios
+
+
+def estimate_entry(arcname, size, previous=None, ratios=None, policy=None):
+    """Returns the estimated compressed size of one file's zip entry data.
+
+    Stored files are exact. Files found in previous (the mod's last archive)
+    reuse their compressed size, or their own ratio if the size changed;
+    the rest use ratios.
+    """
+    method = choose_method(arcname, policy)
+    if method == STORE:
+        return size
+    known = (previous or {}).get(arcname)
+    if known and known[0] == size:
+        return known[1]
+    if known and known[0]:
+        return round(size * known[1] / known[0])
+    return round(size * (ratios or DEFAULT_RATIOS)[method])
+
+
+def _header_bytes(arcnames):
+    return sum(ENTRY_OVERHEAD + 2 * len(name.encode("utf-8")) for name in arcnames)
+
+
+def estimate_zip_size(files, previous=None, ratios=None, policy=None):
+    """Estimates the size of the zip build_zip makes of files ({arcname: size})."""
+    directories = set()
+    for arcname in files:
+        parent = arcname.rpartition("/")[0]
+        while parent and parent not in directories:
+            directories.add(parent)
+            parent = parent.rpartition("/")[0]
+    total = END_RECORD_SIZE + _header_bytes(name + "/" for name in directories)
+    total += _header_bytes(files)
+    for arcname, size in files.items():
+        total += estimate_entry(arcname, size, previous, ratios, policy)
+    return total
+
+
+def estimate_chunk_store_upload(
+    files, inventory, previous=None, ratios=None, policy=None
+):
+    """Estimates the bytes chunk_store.publish_mod would upload for a mod.
+
+    files maps each relative path to [size, mtime_ns, sha256], as recorded by
+    fingerprint_tree. Large files cost their data object unless the bucket
+    already has it; small files and headers travel in segments, counted in
+    full. That is an upper bound: segments are cut per directory, so an
+    unchanged directory reuses its stored segment.
+    """
+    total = END_RECORD_SIZE
+    for arcname, (size, _, sha256) in files.items():
+        total += ENTRY_OVERHEAD + 2 * len(arcname.encode("utf-8"))
+        method = choose_method(arcname, policy)
+        if size < INLINE_FILE_SIZE or not inventory.exists(
+            data_blob_name(sha256, method)
+        ):
+            total += estimate_entry(arcname, size, previous, ratios, policy)
+    return total
+
+
+def load_throughput(trace_dir=DEFAULT_TRACE_DIR, runs=HISTORY_RUNS):
+    """Returns {span name: bytes per second} measured over the most recent run traces.
+
+    In each run, a span name's rate is its bytes over the wall time from its
+    first start to its last end, so concurrent uploads are not double counted.
+    """
+    paths = sorted(glob.glob(os.path.join(trace_dir, "*.json")), key=os.path.getmtime)
+    totals = {}
+    for path in paths[-runs:]:
+        try:
+            with open(path, "r") as f:
+                root = json.load(f)
+        except (OSError, ValueError):
+            continue
+        windows = {}
+        stack = [root]
+        while stack:
+            span = stack.pop()
+            stack.extend(span.get("children", []))
+            if not span.get("bytes"):
+                continue
+            start = span["start"]
+            end = start + span["seconds"]
+            window = windows.setdefault(span["name"], [start, end, 0])
+            window[0] = min(window[0], start)
+            window[1] = max(window[1], end)
+            window[2] += span["bytes"]
+        for name, (start, end, size) in windows.items():
+            seconds, total = totals.get(name, (0.0, 0))
+            totals[name] = (seconds + end - start, total + size)
+    return {
+        name: total / seconds for name, (seconds, total) in totals.items() if seconds > 0
+    }
+
+
+def estimate_seconds(size, rate, limit=0):
+    """Returns the seconds needed to move size bytes, or None if no rate is known.
+
+    limit (bytes per second, 0 for none) caps the measured rate.
+    """
+    if not size:
+        return 0.0
+    if rate and limit:
+        rate = min(rate, limit)
+    rate = rate or limit
+    return size / rate if rate else None
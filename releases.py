@@ -0,0 +1,93 @@
+import time
+
+# Release ids sort chronologically; pre-existing folders become the oldest release
+LEGACY_RELEASE_ID = "00000000T000000-legacy"
+
+
+def new_release_id():
+    """Returns a sortable id for a new release (UTC timestamp with milliseconds)."""
+    now = time.time()
+    millis = int(now * 1000) % 1000
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"{millis:03d}"
+
+
+def _folder_list(folders):
+    return " ".join(folders)
+
+
+def prepare_release_command(root, release_id, staging_dir, folders, owner="ac"):
+    """Moves freshly uploaded folders into releases/<id> and sets ownership.
+
+    Runs while the old release is still serving, so the chown does not add
+    to downtime.
+    """
+    release = f"{root}/releases/{release_id}"
+    return (
+        f"sudo mkdir -p '{release}' && "
+        f"for f in {_folder_list(folders)}; do "
+        f"if [ -e '{staging_dir}'/$f ]; then sudo mv '{staging_dir}'/$f '{release}'/; fi; "
+        f"done && sudo chown -R {owner}:{owner} '{release}'"
+    )
+
+
+def clone_release_command(root, release_id, folders):
+    """Hard-links the live folders into releases/<id> as the base for a delta.
+
+    Only directory entries are created, so this is fast even for large
+    content trees; tar replaces changed files instead of writing through the
+    shared links.
+    """
+    release = f"{root}/releases/{release_id}"
+    return (
+        f"sudo mkdir -p '{release}' && "
+        f"for f in {_folder_list(folders)}; do "
+        f"if [ -e '{root}'/$f ]; then sudo cp -al \"$(readlink -f '{root}'/$f)\" "
+        f"'{release}'/$f; fi; done"
+    )
+
+
+def remove_release_command(root, release_id):
+    """Deletes releases/<id>, e.g. one whose preparation failed part way."""
+    return f"sudo rm -rf '{root}/releases/{release_id}'"
+
+
+def activate_release_command(root, release_id, folders):
+    """Points root/current at releases/<id> with one atomic rename.
+
+    On first use, real folders in root are moved (not copied) into a legacy
+    release and replaced by symlinks through root/current, so the server's
+    working directory keeps the same paths. Fails without changing anything
+    if the release directory does not exist.
+    """
+    legacy = f"{root}/releases/{LEGACY_RELEASE_ID}"
+    return (
+        f"cd '{root}' && [ -d 'releases/{release_id}' ] && "
+        f"for f in {_folder_list(folders)}; do "
+        f"if [ -e $f ] && [ ! -L $f ]; then "
+        f"sudo mkdir -p '{legacy}' && sudo mv $f '{legacy}'/$f; fi; "
+        f"[ -L $f ] || sudo ln -sfn current/$f $f; done && "
+        f"sudo ln -sfn 'releases/{release_id}' current.new && "
+        f"sudo mv -T current.new current"
+    )
+
+
+def rollback_release_command(root):
+    """Points root/current at the release before the active one."""
+    return (
+        f"cd '{root}/releases' && "
+        f'cur=$(basename "$(readlink -f \'{root}/current\')") && '
+        f'prev=$(ls -1 | sort | grep -B1 -x "$cur" | head -n 1) && '
+        f'[ -n "$prev" ] && [ "$prev" != "$cur" ] && '
+        f'cd \'{root}\' && sudo ln -sfn "releases/$prev" current.new && '
+        f'sudo mv -T current.new current && echo "$prev"'
+    )
+
+
+def prune_releases_command(root, keep):
+    """Deletes all but the newest keep releases, never the active one."""
+    return (
+        f"cd '{root}/releases' && "
+        f'cur=$(basename "$(readlink -f \'{root}/current\')") && '
+        f"ls -1 | sort -r | tail -n +{keep + 1} | grep -vx \"$cur\" "
+        f"| xargs -r sudo rm -rf --"
+    )
@@ -0,0 +1,211 @@
+import logging
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from colorama import Fore
+
+# Outcome of one command run over a RemoteSession (stderr is merged into output)
+RemoteResult = namedtuple("RemoteResult", ["returncode", "output"])
+
+# Seconds an idle multiplexed SSH master stays up after the last client exits
+CONTROL_PERSIST_SECONDS = 120
+
+# Seconds a remote command may run before the session is treated as hung
+DEFAULT_COMMAND_TIMEOUT = 15 * 60
+
+# Bytes of the session's stderr (ssh/gcloud errors) quoted when it fails
+STDERR_TAIL_BYTES = 4096
+
+
+def control_ssh_flags():
+    """Returns OpenSSH options that share one connection between ssh/scp calls.
+
+    Windows builds of OpenSSH and PuTTY do not support connection sharing, so
+    no options are returned there and each transfer opens its own connection.
+    """
+    if os.name == "nt":
+        return []
+    control_path = os.path.join(tempfile.gettempdir(), "ac-deploy-%C")
+    return [
+        "-o",
+        "ControlMaster=auto",
+        "-o",
+        f"ControlPath={control_path}",
+        "-o",
+        f"ControlPersist={CONTROL_PERSIST_SECONDS}",
+    ]
+
+
+def gcloud_ssh_command(gcloud_path, vm_instance_name, vm_zone, remote_command):
+    """Builds a gcloud compute ssh command line that reuses the shared connection."""
+    command = [gcloud_path, "compute", "ssh", vm_instance_name, "--zone", vm_zone]
+    command += [f"--ssh-flag={flag}" for flag in control_ssh_flags()]
+    return command + ["--command", remote_command]
+
+
+def gcloud_scp_command(
+    gcloud_path, local_path, destination, vm_zone, limit_kbps=None
+):
+    """Builds a recursive gcloud compute scp command line that reuses the shared connection.
+
+    limit_kbps caps the transfer in Kbit/s (OpenSSH scp only; PuTTY's pscp
+    has no bandwidth option, so it is ignored on Windows).
+    """
+    command = [gcloud_path, "compute", "scp", "--recurse"]
+    flags = control_ssh_flags()
+    if limit_kbps and os.name != "nt":
+        flags += ["-l", str(max(1, int(limit_kbps)))]
+    command += [f"--scp-flag={flag}" for flag in flags]
+    return command + [local_path, destination, "--zone", vm_zone]
+
+
+def join_commands(commands):
+    """Chains commands so they run in one round trip and stop at the first failure."""
+    return " && ".join(f"{{ {command}; }}" for command in commands)
+
+
+class RemoteSession:
+    """A single long-lived remote shell that runs commands one after another.
+
+    shell_command is the argv of a process that reads shell commands on stdin,
+    e.g. ``gcloud compute ssh VM --command 'bash -s'`` in production or
+    ``["bash", "-s"]`` locally. Every command is wrapped so its exit status is
+    reported after an end marker; the connection handshake is paid once per
+    session instead of once per command. A command that has not finished
+    after timeout seconds kills the session; the session's own stderr (ssh
+    and gcloud errors) is quoted in the error raised when it fails.
+    """
+
+    def __init__(self, shell_command, timeout=DEFAULT_COMMAND_TIMEOUT):
+        self.shell_command = list(shell_command)
+        self.timeout = timeout
+        self._proc = None
+        self._lines = None
+        self._stderr = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        if self._proc is None or self._proc.poll() is not None:
+            self._discard()
+            logging.info(Fore.BLUE + "Opening remote session...")
+            # A file rather than a pipe, so a chatty stderr can never block ssh
+            self._stderr = tempfile.TemporaryFile()
+            self._proc = subprocess.Popen(
+                self.shell_command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr,
+                bufsize=0,
+            )
+            # Lines are read on a thread so run() can wait with a deadline
+            self._lines = queue.Queue()
+            threading.Thread(
+                target=_read_lines,
+                args=(self._proc.stdout, self._lines),
+                daemon=True,
+            ).start()
+        return self
+
+    def _stderr_tail(self):
+        try:
+            self._stderr.seek(0, os.SEEK_END)
+            self._stderr.seek(max(0, self._stderr.tell() - STDERR_TAIL_BYTES))
+            return self._stderr.read().decode("utf-8", errors="replace").strip()
+        except (AttributeError, OSError, ValueError):
+            return ""
+
+    def _discard(self):
+        """Kills the session process (if any) and returns the tail of its stderr."""
+        if self._proc is not None:
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+        stderr = self._stderr_tail()
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+        return stderr
+
+    def _fail(self, error_type, message):
+        stderr = self._discard()
+        if stderr:
+            message += f" Session stderr:\n{stderr}"
+        return error_type(message)
+
+    def run(self, command, timeout=None):
+        """Runs command remotely and returns a RemoteResult.
+
+        Raises TimeoutError if it does not finish within timeout seconds
+        (default: the session's) and ConnectionError if the session dies.
+        """
+        timeout = timeout or self.timeout
+        marker = f"__AC_DONE_{uuid.uuid4().hex}"
+        # A subshell keeps the command from reading the session's stdin
+        script = (
+            f"( {command}\n) 2>&1 < /dev/null; "
+            f"printf '\\n%s %d\\n' '{marker}' $?\n"
+        )
+        with self._lock:
+            self.open()
+            try:
+                self._proc.stdin.write(script.encode("utf-8"))
+                self._proc.stdin.flush()
+            except OSError as e:
+                raise self._fail(ConnectionError, f"Remote session failed: {e}.")
+            deadline = time.monotonic() + timeout
+            lines = []
+            while True:
+                try:
+                    line = self._lines.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    raise self._fail(
+                        TimeoutError,
+                        f"Remote command did not finish within {timeout:.0f}s.",
+                    )
+                if not line:
+                    raise self._fail(
+                        ConnectionError, "Remote session closed unexpectedly."
+                    )
+                text = line.decode("utf-8", errors="replace")
+                if text.startswith(marker):
+                    returncode = int(text.split()[1])
+                    break
+                lines.append(text)
+        output = "".join(lines)
+        # Drop the newline printed ahead of the marker
+        if output.endswith("\n"):
+            output = output[:-1]
+        return RemoteResult(returncode, output)
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._proc.stdin.write(b"exit\n")
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=10)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+            self._discard()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _read_lines(stdout, lines):
+    """Moves a session's stdout lines into a queue; an empty line marks the end."""
+    for line in iter(stdout.readline, b""):
+        lines.put(line)
+    lines.put(b"")
@@ -0,0 +1,150 @@
+import os
+import shutil
+import threading
+import zlib
+from collections import namedtuple
+from concurrent import futures as cf
+from zipfile import ZipFile
+
+# A file that is part of a deploy, wherever it lives (pack entry or local file).
+# crc32 may be None when it is not known without reading the file.
+DeployFile = namedtuple("DeployFile", ["relpath", "size", "crc32", "open"])
+
+# Entries at least this large are extracted on worker threads
+LARGE_ENTRY_SIZE = 8 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def stream_crc32(fileobj):
+    """Returns the CRC-32 of everything left in a binary file object."""
+    crc = 0
+    for chunk in iter(lambda: fileobj.read(COPY_CHUNK_SIZE), b""):
+        crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def local_deploy_files(root, folders):
+    """Returns DeployFiles for the files under root/<folder> for each folder."""
+    files = []
+    for folder in folders:
+        folder_path = os.path.join(root, folder)
+        for dirpath, _, names in os.walk(folder_path):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                relpath = os.path.relpath(path, root).replace("\\", "/")
+                files.append(
+                    DeployFile(
+                        relpath,
+                        os.path.getsize(path),
+                        None,
+                        lambda path=path: open(path, "rb"),
+                    )
+                )
+    return sorted(files)
+
+
+class ServerPack:
+    """A server-pack zip read through a single scan of its central directory.
+
+    The entry list is classified once: the cars and tracks it references and
+    the files under each deploy folder. Entries can then be extracted
+    selectively or read directly by later stages. Each thread gets its own
+    ZipFile handle so entries can be decompressed in parallel.
+    """
+
+    def __init__(self, zip_file_path):
+        self.path = zip_file_path
+        self._local = threading.local()
+        self._handles = []
+        self._handles_lock = threading.Lock()
+        self.cars = set()
+        self.tracks = set()
+        self.folders = {}
+        with ZipFile(zip_file_path, "r") as zip_ref:
+            self.infos = zip_ref.infolist()
+        for info in self.infos:
+            parts = info.filename.split("/")
+            if len(parts) > 3 and parts[0] == "content" and parts[2]:
+                if parts[1] == "cars":
+                    self.cars.add(parts[2])
+                elif parts[1] == "tracks":
+                    self.tracks.add(parts[2])
+            if not info.is_dir():
+                self.folders.setdefault(parts[0], []).append(info)
+
+    def _zip(self):
+        zip_ref = getattr(self._local, "zip_ref", None)
+        if zip_ref is None:
+            zip_ref = self._local.zip_ref = ZipFile(self.path, "r")
+            with self._handles_lock:
+                self._handles.append(zip_ref)
+        return zip_ref
+
+    def entries(self, folders):
+        """Returns the file entries under the given top-level folders."""
+        return [info for folder in folders for info in self.folders.get(folder, [])]
+
+    def open(self, info):
+        """Opens an entry for reading on the calling thread's handle."""
+        return self._zip().open(info)
+
+    def read_text(self, name):
+        """Returns the text of the file entry called name, or None if the pack lacks it."""
+        for info in self.folders.get(name.split("/", 1)[0], []):
+            if info.filename == name:
+                with self.open(info) as f:
+                    return f.read().decode("utf-8-sig", errors="replace")
+        return None
+
+    def deploy_files(self, folders, overlay_dir=None, overlay_folders=()):
+        """Returns DeployFiles for folders, reading straight from the zip.
+
+        Folders listed in overlay_folders are taken from overlay_dir instead
+        (used for cfg, which is edited locally before the deploy).
+        """
+        files = []
+        for folder in folders:
+            if folder in overlay_folders:
+                files += local_deploy_files(overlay_dir, [folder])
+                continue
+            for info in self.folders.get(folder, []):
+                files.append(
+                    DeployFile(
+                        info.filename,
+                        info.file_size,
+                        info.CRC,
+                        lambda info=info: self.open(info),
+                    )
+                )
+        return sorted(files)
+
+    def _extract_one(self, info, destination):
+        # Never write outside destination (absolute names, "..", drive letters)
+        root = os.path.realpath(destination)
+        target = os.path.realpath(os.path.join(root, *info.filename.split("/")))
+        if os.path.commonpath([root, target]) != root or target == root:
+            raise ValueError(f"Unsafe entry name in server pack: {info.filename}")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with self.open(info) as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+    def extract(self, destination, folders, workers=4):
+        """Extracts only the entries under folders; large entries use a thread pool."""
+        entries = self.entries(folders)
+        large = [info for info in entries if info.file_size >= LARGE_ENTRY_SIZE]
+        with cf.ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            pending = [pool.submit(self._extract_one, info, destination) for info in large]
+            for info in entries:
+                if info.file_size < LARGE_ENTRY_SIZE:
+                    self._extract_one(info, destination)
+            for future in pending:
+                future.result()
+        return len(entries)
+
+    def close(self):
+        """Closes the zip handles opened by every thread."""
+        with self._handles_lock:
+            for zip_ref in self._handles:
+                zip_ref.close()
+            self._handles = []
+        self._local = threading.local()
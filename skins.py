@@ -0,0 +1,77 @@
+import hashlib
+import re
+
+# Server config listing the car slots, each with a MODEL and a SKIN
+ENTRY_LIST_PATH = "cfg/entry_list.ini"
+
+# Hex digits of the skin-set hash used in pruned archive names
+SKIN_SET_HASH_LENGTH = 12
+
+_SECTION = re.compile(r"^\s*\[([^\]]+)\]")
+_KEY_VALUE = re.compile(r"^\s*([A-Za-z_]+)\s*=\s*(.*?)\s*$")
+
+
+def parse_entry_list(text):
+    """Returns {car model: frozenset of skin names} from an entry_list.ini.
+
+    Skin names are lowercased, since Assetto Corsa matches them without
+    regard to case. A model with any slot that has no SKIN (the server then
+    picks one) maps to None, meaning every skin must be kept.
+    """
+    slots = []
+    current = None
+    for line in text.splitlines():
+        line = line.split(";", 1)[0]
+        section = _SECTION.match(line)
+        if section:
+            current = None
+            if section.group(1).strip().upper().startswith("CAR_"):
+                current = {}
+                slots.append(current)
+            continue
+        key_value = _KEY_VALUE.match(line)
+        if current is not None and key_value:
+            current[key_value.group(1).upper()] = key_value.group(2)
+
+    skins = {}
+    for slot in slots:
+        model = slot.get("MODEL")
+        if not model:
+            continue
+        skin = slot.get("SKIN", "").strip().lower()
+        if not skin or skins.get(model, ()) is None:
+            skins[model] = None
+        else:
+            skins[model] = skins.get(model, frozenset()) | {skin}
+    return skins
+
+
+def skin_set_hash(skins):
+    """Returns a short, order-independent hash of a set of skin names."""
+    joined = "\n".join(sorted(skins))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:SKIN_SET_HASH_LENGTH]
+
+
+def variant_name(name, skins):
+    """Returns the archive base name of a car pruned to skins (name itself if None)."""
+    if skins is None:
+        return name
+    return f"{name}.skins-{skin_set_hash(skins)}"
+
+
+def skin_filter(skins):
+    """Returns include(relpath) keeping shared car files and only the given skins.
+
+    relpath is relative to the car folder with "/" separators. Returns None
+    (include everything) when skins is None.
+    """
+    if skins is None:
+        return None
+
+    def include(relpath):
+        parts = relpath.split("/")
+        if len(parts) > 1 and parts[0].lower() == "skins":
+            return parts[1].lower() in skins
+        return True
+
+    return include
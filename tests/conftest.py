@@ -0,0 +1,30 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def bash_env(tmp_path):
+    """Environment for running remote commands locally: sudo just runs its arguments."""
+    if not shutil.which("bash"):
+        pytest.skip("bash is not available")
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    sudo = bin_dir / "sudo"
+    sudo.write_text('#!/bin/sh\nexec "$@"\n')
+    sudo.chmod(0o755)
+    return dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+@pytest.fixture
+def run_bash(bash_env):
+    """Runs a shell command with bash -c under bash_env."""
+    return lambda command: subprocess.run(
+        ["bash", "-c", command], env=bash_env, capture_output=True
+    )
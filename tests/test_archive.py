@@ -0,0 +1,78 @@
+import io
+import os
+import random
+import zlib
+from zipfile import ZipFile
+
+from archive import (
+    INLINE_COMPRESS_SIZE,
+    crc32_combine,
+    write_directory_zip,
+    write_directory_zip_parallel,
+)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def test_crc32_combine_matches_crc32_of_the_concatenation():
+    rng = random.Random(0)
+    for _ in range(50):
+        data = rng.randbytes(rng.randrange(0, 5000))
+        split = rng.randrange(0, len(data) + 1)
+        a, b = data[:split], data[split:]
+        combined = crc32_combine(zlib.crc32(a), zlib.crc32(b), len(b))
+        assert combined == zlib.crc32(data)
+
+
+def test_crc32_combine_with_empty_second_part():
+    crc = zlib.crc32(b"assetto corsa")
+    assert crc32_combine(crc, zlib.crc32(b""), 0) == crc
+
+
+def make_tree(root):
+    rng = random.Random(1)
+    files = {
+        # Deflated in several chunks; even.dds is exactly five chunks long
+        "data/track.kn5": rng.randbytes(INLINE_COMPRESS_SIZE) + b"\0" * 300_000,
+        "data/even.dds": b"abc" * 87_382 + b"x" * (CHUNK_SIZE - 2),
+        "data/surfaces.ini": b"[SURFACE_0]\nKEY=ROAD\n" * 40_000,
+        "data/empty.dds": b"",
+        "skins/00/preview.jpg": rng.randbytes(INLINE_COMPRESS_SIZE + 10),
+        "ui/ui_track.json": b'{"name": "x"}',
+    }
+    for arcname, data in files.items():
+        path = os.path.join(root, *arcname.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    os.makedirs(os.path.join(root, "extension"))
+    return files
+
+
+def test_parallel_zip_is_valid_and_matches_the_sources(tmp_path):
+    files = make_tree(str(tmp_path))
+    out = io.BytesIO()
+    write_directory_zip_parallel(out, str(tmp_path), workers=2, chunk_size=CHUNK_SIZE)
+
+    with ZipFile(out) as zip_ref:
+        assert zip_ref.testzip() is None
+        assert "extension/" in zip_ref.namelist()
+        for arcname, data in files.items():
+            assert zip_ref.read(arcname) == data
+        track = zip_ref.getinfo("data/track.kn5")
+        assert track.compress_size < track.file_size
+        assert zip_ref.getinfo("skins/00/preview.jpg").compress_type == 0
+
+
+def test_parallel_zip_has_the_same_entries_as_the_serial_one(tmp_path):
+    make_tree(str(tmp_path))
+    serial, parallel = io.BytesIO(), io.BytesIO()
+    write_directory_zip(serial, str(tmp_path))
+    write_directory_zip_parallel(
+        parallel, str(tmp_path), workers=2, chunk_size=CHUNK_SIZE
+    )
+
+    with ZipFile(serial) as a, ZipFile(parallel) as b:
+        assert [
+            (i.filename, i.CRC, i.file_size, i.compress_type) for i in a.infolist()
+        ] == [(i.filename, i.CRC, i.file_size, i.compress_type) for i in b.infolist()]
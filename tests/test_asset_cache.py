@@ -0,0 +1,82 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from asset_cache import fetch_cached
+
+
+class AssetServer(HTTPServer):
+    """Serves one asset; honours If-None-Match and records request headers."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), AssetHandler)
+        self.body = b"[TRACK]\nNAME=one\n"
+        self.etag = '"v1"'
+        self.last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+        self.requests = []
+
+
+class AssetHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        if server.etag and self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if server.etag:
+            self.send_header("ETag", server.etag)
+        if server.last_modified:
+            self.send_header("Last-Modified", server.last_modified)
+        self.send_header("Content-Length", str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = AssetServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_then_revalidate_then_changed_content(server, tmp_path):
+    url = f"http://127.0.0.1:{server.server_port}/data_track_params.ini"
+    target = tmp_path / "cfg" / "data_track_params.ini"
+    cache_dir = str(tmp_path / "cache")
+
+    def fetch(ttl=0):
+        return fetch_cached(url, str(target), ttl=ttl, cache_dir=cache_dir)
+
+    assert fetch() == "downloaded"
+    assert target.read_bytes() == b"[TRACK]\nNAME=one\n"
+    assert fetch(ttl=3600) == "fresh"
+    assert len(server.requests) == 1
+
+    assert fetch() == "revalidated"
+    assert server.requests[-1]["If-None-Match"] == '"v1"'
+    assert server.requests[-1]["If-Modified-Since"] == server.last_modified
+
+    server.body, server.etag = b"[TRACK]\nNAME=two\n", '"v2"'
+    assert fetch() == "downloaded"
+    assert target.read_bytes() == b"[TRACK]\nNAME=two\n"
+
+
+def test_no_validator_is_invented_when_the_server_sends_none(server, tmp_path):
+    server.etag = server.last_modified = None
+    url = f"http://127.0.0.1:{server.server_port}/asset.ini"
+    target = tmp_path / "asset.ini"
+    cache_dir = str(tmp_path / "cache")
+
+    assert fetch_cached(url, str(target), ttl=0, cache_dir=cache_dir) == "downloaded"
+    assert fetch_cached(url, str(target), ttl=0, cache_dir=cache_dir) == "downloaded"
+    assert "If-Modified-Since" not in server.requests[-1]
+    assert "If-None-Match" not in server.requests[-1]
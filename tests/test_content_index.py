@@ -0,0 +1,28 @@
+from content_index import is_official
+
+
+def make_car(content_dir, name, ui_text=None):
+    folder = content_dir / "cars" / name
+    (folder / "ui").mkdir(parents=True)
+    if ui_text is not None:
+        (folder / "ui" / "ui_car.json").write_text(ui_text)
+
+
+def test_ks_car_by_kunos_is_official(tmp_path):
+    make_car(tmp_path, "ks_new_dlc_car", '{"name": "x", "author": "Kunos Simulazioni",}')
+    assert is_official(str(tmp_path), "cars", "ks_new_dlc_car")
+
+
+def test_ks_car_by_another_author_is_a_mod(tmp_path):
+    make_car(tmp_path, "ks_lookalike", '{"author": "Some Modder"}')
+    assert not is_official(str(tmp_path), "cars", "ks_lookalike")
+
+
+def test_ks_car_without_a_ui_file_is_a_mod(tmp_path):
+    make_car(tmp_path, "ks_no_ui")
+    assert not is_official(str(tmp_path), "cars", "ks_no_ui")
+
+
+def test_ks_car_without_an_author_field_is_a_mod(tmp_path):
+    make_car(tmp_path, "ks_no_author", '{"name": "x"}')
+    assert not is_official(str(tmp_path), "cars", "ks_no_author")
@@ -0,0 +1,51 @@
+from delta_sync import DELETE_LIST_NAME, apply_delta_command, write_delta_archive
+from server_pack import local_deploy_files
+
+FOLDERS = ["cfg", "content", "system"]
+
+
+def make_root(tmp_path):
+    root = tmp_path / "root"
+    (root / "cfg").mkdir(parents=True)
+    (root / "cfg" / "server_cfg.ini").write_text("old")
+    (root / "cfg" / "stale.ini").write_text("stale")
+    return root
+
+
+def test_apply_delta_extracts_deletes_and_skips_missing_folders(tmp_path, run_bash):
+    root = make_root(tmp_path)
+    source = tmp_path / "source"
+    (source / "cfg").mkdir(parents=True)
+    (source / "cfg" / "server_cfg.ini").write_text("new")
+    files = {f.relpath: f for f in local_deploy_files(str(source), ["cfg"])}
+    archive = tmp_path / "delta.tar.gz"
+    write_delta_archive(files, ["cfg/server_cfg.ini"], ["cfg/stale.ini"], str(archive))
+
+    result = run_bash(apply_delta_command(str(archive), str(root), FOLDERS))
+
+    assert result.returncode == 0, result.stderr
+    assert (root / "cfg" / "server_cfg.ini").read_text() == "new"
+    assert not (root / "cfg" / "stale.ini").exists()
+    assert not (root / DELETE_LIST_NAME).exists()
+    assert not archive.exists()
+
+
+def test_apply_delta_fails_when_the_archive_is_missing(tmp_path, run_bash):
+    root = make_root(tmp_path)
+    archive = tmp_path / "missing.tar.gz"
+
+    result = run_bash(apply_delta_command(str(archive), str(root), FOLDERS))
+
+    assert result.returncode != 0
+    assert (root / "cfg" / "stale.ini").exists()
+
+
+def test_apply_delta_fails_and_cleans_up_on_a_corrupt_archive(tmp_path, run_bash):
+    root = make_root(tmp_path)
+    archive = tmp_path / "delta.tar.gz"
+    archive.write_bytes(b"\x1f\x8b\x08\x00 not really gzip")
+
+    result = run_bash(apply_delta_command(str(archive), str(root), FOLDERS))
+
+    assert result.returncode != 0
+    assert not archive.exists()
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from benchmarks.fake_gcs import FakeStorageClient
+from gcs import COMPOSITE_PARTS_PREFIX, upload_file_composite
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+class Interrupted(Exception):
+    pass
+
+
+def recording_throttle(sent, fail_offset=None):
+    """Returns a throttle that records each part's offset and can fail one of them."""
+
+    def throttle(fileobj):
+        offset = fileobj.tell()
+        if offset == fail_offset:
+            raise Interrupted(offset)
+        sent.append(offset)
+        return fileobj
+
+    return throttle
+
+
+def test_interrupted_composite_upload_resumes_with_the_missing_parts(tmp_path):
+    source = tmp_path / "track.zip"
+    data = os.urandom(4 * PART_SIZE)
+    source.write_bytes(data)
+    client = FakeStorageClient(str(tmp_path / "gcs"))
+    checkpoint_dir = str(tmp_path / "checkpoints")
+
+    def upload(throttle):
+        return upload_file_composite(
+            str(source),
+            "bucket",
+            "tracks/track.zip",
+            part_count=4,
+            checkpoint_dir=checkpoint_dir,
+            throttle=throttle,
+            client=client,
+        )
+
+    first = []
+    with pytest.raises(Interrupted):
+        upload(recording_throttle(first, fail_offset=2 * PART_SIZE))
+    assert sorted(first) == [0, PART_SIZE, 3 * PART_SIZE]
+    assert os.listdir(checkpoint_dir)
+
+    second = []
+    blob = upload(recording_throttle(second))
+
+    assert second == [2 * PART_SIZE]
+    assert blob.open("rb").read() == data
+    assert not list(client.list_blobs("bucket", prefix=COMPOSITE_PARTS_PREFIX))
+    assert not os.listdir(checkpoint_dir)
@@ -0,0 +1,35 @@
+from main import append_ini_sections
+
+CUSTOM_SECTIONS = """
+    [CA-9 Saratoga]
+    NAME=CA-9 Saratoga
+    TIMEZONE=America/Los_Angeles
+
+    [OTHER TRACK]
+    NAME=Other
+    """
+
+
+def test_append_ini_sections_is_idempotent(tmp_path):
+    ini = tmp_path / "data_track_params.ini"
+    ini.write_text("[ks_nordschleife]\nNAME=Nordschleife")
+
+    append_ini_sections(str(ini), CUSTOM_SECTIONS)
+    once = ini.read_text()
+    append_ini_sections(str(ini), CUSTOM_SECTIONS)
+
+    assert ini.read_text() == once
+    assert once.startswith("[ks_nordschleife]\nNAME=Nordschleife\n")
+    assert once.count("[CA-9 Saratoga]") == 1
+    assert once.count("[OTHER TRACK]") == 1
+
+
+def test_append_ini_sections_adds_only_missing_sections(tmp_path):
+    ini = tmp_path / "data_track_params.ini"
+    ini.write_text("[ca-9 saratoga]\nNAME=Already here\n")
+
+    append_ini_sections(str(ini), CUSTOM_SECTIONS)
+
+    text = ini.read_text()
+    assert text.count("NAME=CA-9 Saratoga") == 0
+    assert text.count("[OTHER TRACK]") == 1
@@ -0,0 +1,40 @@
+from delta_sync import apply_delta_command
+from releases import (
+    activate_release_command,
+    clone_release_command,
+    remove_release_command,
+)
+from remote import join_commands
+
+FOLDERS = ["cfg", "content", "system"]
+
+
+def test_failed_delta_release_is_reported_and_can_be_removed(tmp_path, run_bash):
+    root = tmp_path / "ac"
+    (root / "cfg").mkdir(parents=True)
+    (root / "cfg" / "server_cfg.ini").write_text("live")
+    command = join_commands(
+        [
+            clone_release_command(str(root), "r1", FOLDERS),
+            apply_delta_command(
+                str(tmp_path / "missing.tar.gz"), f"{root}/releases/r1", FOLDERS
+            ),
+        ]
+    )
+
+    assert run_bash(command).returncode != 0
+    assert (root / "releases" / "r1").is_dir()
+
+    assert run_bash(remove_release_command(str(root), "r1")).returncode == 0
+    assert not (root / "releases" / "r1").exists()
+
+
+def test_activate_refuses_a_missing_release(tmp_path, run_bash):
+    root = tmp_path / "ac"
+    (root / "cfg").mkdir(parents=True)
+
+    result = run_bash(activate_release_command(str(root), "r1", FOLDERS))
+
+    assert result.returncode != 0
+    assert not (root / "current").exists()
+    assert (root / "cfg").is_dir() and not (root / "cfg").is_symlink()
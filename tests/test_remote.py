@@ -0,0 +1,39 @@
+import shutil
+
+import pytest
+
+from remote import RemoteSession
+
+pytestmark = pytest.mark.skipif(not shutil.which("bash"), reason="bash is not available")
+
+
+@pytest.fixture
+def session():
+    with RemoteSession(["bash", "-s"], timeout=10) as session:
+        yield session
+
+
+def test_exit_status_and_output_are_reported(session):
+    result = session.run("echo one; echo two >&2; exit 3")
+    assert result.returncode == 3
+    assert result.output == "one\ntwo\n"
+    assert session.run("true").returncode == 0
+
+
+def test_output_that_looks_like_a_marker_is_kept(session):
+    result = session.run("echo __AC_DONE_0123456789abcdef 0; printf 'no newline'")
+    assert result.returncode == 0
+    assert result.output == "__AC_DONE_0123456789abcdef 0\nno newline"
+
+
+def test_hung_command_times_out_and_the_session_reopens(session):
+    with pytest.raises(TimeoutError):
+        session.run("sleep 30", timeout=0.5)
+    assert session.run("echo back").output == "back\n"
+
+
+def test_session_stderr_is_quoted_when_it_dies():
+    shell = ["bash", "-c", "echo 'ssh: connect to host refused' >&2; exit 255"]
+    with RemoteSession(shell, timeout=10) as session:
+        with pytest.raises(ConnectionError, match="connect to host refused"):
+            session.run("true")
@@ -0,0 +1,82 @@
+from transfer import (
+    UPLOAD_CHUNK_ALIGNMENT,
+    TokenBucket,
+    TransferScheduler,
+    largest_first,
+)
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the bucket sleeps or the test advances it."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_bucket(rate, burst=None):
+    clock = FakeClock()
+    return TokenBucket(rate, burst, clock=clock, sleep=clock.sleep), clock
+
+
+def test_burst_is_free_then_bytes_are_paid_at_the_rate():
+    bucket, clock = make_bucket(100, burst=100)
+    assert bucket.acquire(100) == 0
+    assert bucket.acquire(400) == 4.0
+    assert clock.now == 4.0
+
+
+def test_idle_time_refills_only_up_to_the_burst():
+    bucket, clock = make_bucket(100, burst=100)
+    bucket.acquire(100)
+    clock.now += 60
+    assert bucket.acquire(100) == 0
+    assert bucket.acquire(50) == 0.5
+
+
+def test_reserved_share_slows_the_bucket_until_released():
+    bucket, clock = make_bucket(100, burst=100)
+    bucket.acquire(100)
+    with bucket.reserve(0.5) as reserved:
+        assert reserved == 50
+        assert bucket.acquire(100) == 2.0
+    assert bucket.acquire(100) == 1.0
+    assert clock.now == 3.0
+
+
+def test_reserve_on_an_unlimited_bucket_yields_no_limit():
+    bucket, _ = make_bucket(0)
+    with bucket.reserve(0.5) as reserved:
+        assert reserved == 0
+        assert bucket.acquire(10**9) == 0
+
+
+def test_zero_rate_is_unlimited():
+    bucket, clock = make_bucket(0)
+    assert bucket.acquire(10**9) == 0
+    assert clock.now == 0
+
+
+def test_rate_function_is_read_on_every_acquire():
+    rates = [100]
+    bucket, _ = make_bucket(lambda: rates[0], burst=100)
+    bucket.acquire(100)
+    rates[0] = 50
+    assert bucket.acquire(100) == 2.0
+
+
+def test_largest_first_orders_by_size_descending():
+    sizes = {"ui": 1, "track": 900, "car_a": 40, "car_b": 300}
+    assert largest_first(sizes, sizes.get) == ["track", "car_b", "car_a", "ui"]
+
+
+def test_chunk_size_is_about_a_second_at_the_limit():
+    assert TransferScheduler().chunk_size() is None
+    limited = TransferScheduler(TokenBucket(10 * 1024 * 1024 + 1000))
+    assert limited.chunk_size() == 10 * 1024 * 1024
+    assert TransferScheduler(TokenBucket(1000)).chunk_size() == UPLOAD_CHUNK_ALIGNMENT
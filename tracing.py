@@ -0,0 +1,294 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from colorama import Fore
+
+# Run traces (one JSON file per run) are kept next to the other local state
+DEFAULT_TRACE_DIR = os.path.join("uploads", "traces")
+
+# Prefix of every metric in the Prometheus textfile
+METRIC_PREFIX = "ac_deploy"
+
+
+class Span:
+    """One timed stage, with byte/file counters and nested child spans."""
+
+    def __init__(self, name, start=None, **attrs):
+        self.name = name
+        self.start = time.time() if start is None else start
+        self.end = None
+        self.bytes = 0
+        self.files = 0
+        self.error = None
+        self.attrs = attrs
+        self.children = []
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    def add(self, bytes=0, files=0, **attrs):
+        """Adds to the span's counters and sets extra attributes."""
+        with self._lock:
+            self.bytes += bytes
+            self.files += files
+            self.attrs.update(attrs)
+
+    def _adopt(self, child):
+        with self._lock:
+            self.children.append(child)
+
+    def to_dict(self):
+        duration = self.duration
+        return {
+            "name": self.name,
+            "start": self.start,
+            "seconds": round(duration, 6),
+            "bytes": self.bytes,
+            "files": self.files,
+            "bytes_per_second": round(self.bytes / duration) if duration > 0 else 0,
+            "error": self.error,
+            "attrs": self.attrs,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class _NullSpan:
+    """Returned by current_span() outside a run so callers never need to check."""
+
+    def add(self, bytes=0, files=0, **attrs):
+        pass
+
+
+class Tracer:
+    """Collects nested spans for one run.
+
+    Each thread nests spans on its own stack. Spans opened on a thread with
+    no open span (pipeline upload threads, for example) attach to the
+    innermost open span of the thread that started the run.
+    """
+
+    def __init__(self):
+        self.root = None
+        self._local = threading.local()
+        self._run_stack = None
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _parent(self):
+        stack = self._stack()
+        if stack:
+            return stack[-1]
+        if self._run_stack:
+            return self._run_stack[-1]
+        return None
+
+    def start_run(self, name, **attrs):
+        self.root = Span(name, **attrs)
+        self._local = threading.local()
+        self._run_stack = self._stack()
+        self._run_stack.append(self.root)
+        return self.root
+
+    def finish_run(self):
+        root, self.root = self.root, None
+        if root is not None:
+            root.end = time.time()
+        self._run_stack = None
+        self._local = threading.local()
+        return root
+
+    @contextmanager
+    def span(self, name, **attrs):
+        parent = self._parent()
+        if parent is None:
+            # Not inside a run: nothing to record
+            yield _NullSpan()
+            return
+        span = Span(name, **attrs)
+        parent._adopt(span)
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.end = time.time()
+            stack.pop()
+
+    def record(self, name, start, end, bytes=0, files=0, **attrs):
+        """Adds a finished span measured elsewhere (e.g. in a worker process)."""
+        parent = self._parent()
+        if parent is None:
+            return
+        span = Span(name, start=start, **attrs)
+        span.end = end
+        span.add(bytes=bytes, files=files)
+        parent._adopt(span)
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else _NullSpan()
+
+
+_tracer = Tracer()
+
+
+def span(name, **attrs):
+    """Context manager timing a stage as a child of the current span."""
+    return _tracer.span(name, **attrs)
+
+
+def traced(name):
+    """Decorator that runs the function inside a span called name."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_span():
+    """Returns the innermost open span on this thread (a no-op outside a run)."""
+    return _tracer.current()
+
+
+def record(name, start, end, bytes=0, files=0, **attrs):
+    _tracer.record(name, start, end, bytes=bytes, files=files, **attrs)
+
+
+def start_run(name, **attrs):
+    """Starts collecting spans for a run; returns the root span."""
+    return _tracer.start_run(name, **attrs)
+
+
+def stage_totals(root):
+    """Aggregates every span below root by name: calls, seconds, bytes, files, errors."""
+    totals = {}
+    for item in root.walk():
+        if item is root:
+            continue
+        entry = totals.setdefault(
+            item.name, {"calls": 0, "seconds": 0.0, "bytes": 0, "files": 0, "errors": 0}
+        )
+        entry["calls"] += 1
+        entry["seconds"] += item.duration
+        entry["bytes"] += item.bytes
+        entry["files"] += item.files
+        entry["errors"] += 1 if item.error else 0
+    return totals
+
+
+def write_trace(root, trace_dir=DEFAULT_TRACE_DIR):
+    """Writes the run's span tree as JSON and returns the file path."""
+    os.makedirs(trace_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(root.start))
+    path = os.path.join(trace_dir, f"{root.name}-{stamp}.json")
+    with open(path, "w") as f:
+        json.dump(root.to_dict(), f, indent=2)
+    return path
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus(root, path):
+    """Writes per-stage totals of the run as a Prometheus textfile (atomically).
+
+    Suitable for node_exporter's textfile collector.
+    """
+    totals = stage_totals(root)
+    run = _label(root.name)
+    metrics = [
+        ("stage_seconds", "Wall time spent in each stage during the last run.", "seconds"),
+        ("stage_bytes", "Bytes processed by each stage during the last run.", "bytes"),
+        ("stage_files", "Files processed by each stage during the last run.", "files"),
+        ("stage_calls", "Times each stage ran during the last run.", "calls"),
+        ("stage_errors", "Stage calls that raised during the last run.", "errors"),
+    ]
+    lines = []
+    for metric, help_text, key in metrics:
+        lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} gauge")
+        for stage in sorted(totals):
+            lines.append(
+                f'{METRIC_PREFIX}_{metric}{{run="{run}",stage="{_label(stage)}"}} '
+                f"{totals[stage][key]}"
+            )
+    lines.append(f"# HELP {METRIC_PREFIX}_run_seconds Wall time of the last run.")
+    lines.append(f"# TYPE {METRIC_PREFIX}_run_seconds gauge")
+    lines.append(f'{METRIC_PREFIX}_run_seconds{{run="{run}"}} {root.duration:.6f}')
+    lines.append(
+        f"# HELP {METRIC_PREFIX}_run_timestamp_seconds Unix time the last run finished."
+    )
+    lines.append(f"# TYPE {METRIC_PREFIX}_run_timestamp_seconds gauge")
+    lines.append(f'{METRIC_PREFIX}_run_timestamp_seconds{{run="{run}"}} {root.end:.0f}')
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def log_summary(root):
+    """Logs a table of per-stage time, share of the run, bytes and throughput."""
+    totals = stage_totals(root)
+    run_seconds = root.duration or 1e-9
+    logging.info(
+        Fore.BLUE
+        + f"{'stage':<32}{'calls':>6}{'seconds':>10}{'%':>6}{'MB':>10}{'files':>8}{'MB/s':>9}"
+    )
+    for stage, entry in sorted(totals.items(), key=lambda item: -item[1]["seconds"]):
+        mb = entry["bytes"] / 1024 / 1024
+        rate = mb / entry["seconds"] if entry["seconds"] > 0 and mb else 0
+        color = Fore.RED if entry["errors"] else Fore.BLUE
+        logging.info(
+            color
+            + f"{stage:<32}{entry['calls']:>6}{entry['seconds']:>10.2f}"
+            f"{100 * entry['seconds'] / run_seconds:>6.0f}{mb:>10.1f}"
+            f"{entry['files']:>8}{rate:>9.1f}"
+        )
+    logging.info(Fore.BLUE + f"{'total':<32}{'':>6}{root.duration:>10.2f}")
+
+
+def finish_run(trace_dir=DEFAULT_TRACE_DIR, prometheus_path=None):
+    """Ends the run, writes the trace (and textfile) and logs the summary."""
+    root = _tracer.finish_run()
+    if root is None:
+        return None
+    try:
+        path = write_trace(root, trace_dir)
+        logging.info(Fore.BLUE + f"Wrote run trace to {path}.")
+        if prometheus_path:
+            write_prometheus(root, prometheus_path)
+            logging.info(Fore.BLUE + f"Wrote metrics to {prometheus_path}.")
+    except OSError as e:
+        logging.error(Fore.RED + f"Error writing the run trace: {e}")
+    log_summary(root)
+    return root
@@ -0,0 +1,297 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from colorama import Fore
+
+# Seconds between progress log lines
+DEFAULT_PROGRESS_INTERVAL = 5
+
+# Share of the remaining rate set aside for a tool that limits itself (scp)
+EXTERNAL_RATE_SHARE = 0.5
+
+# Resumable upload chunks must be a multiple of this many bytes
+UPLOAD_CHUNK_ALIGNMENT = 256 * 1024
+
+
+def parse_rate_windows(spec):
+    """Parses "HH:MM-HH:MM=MB/s,..." into [(start minute, end minute, bytes/s)].
+
+    A window may wrap past midnight (e.g. 22:00-06:00); a rate of 0 means
+    unlimited.
+    """
+    windows = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        span, _, rate = item.partition("=")
+        start, _, end = span.partition("-")
+        minutes = []
+        for clock_time in (start, end):
+            hours, _, mins = clock_time.strip().partition(":")
+            minutes.append(int(hours) * 60 + int(mins or 0))
+        windows.append((minutes[0], minutes[1], float(rate) * 1024 * 1024))
+    return windows
+
+
+def rate_for(windows, default_rate, when=None):
+    """Returns the rate of the first window containing when (a struct_time)."""
+    when = when or time.localtime()
+    minute = when.tm_hour * 60 + when.tm_min
+    for start, end, rate in windows:
+        if start <= end:
+            inside = start <= minute < end
+        else:
+            inside = minute >= start or minute < end
+        if inside:
+            return rate
+    return default_rate
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the average rate of bytes sent.
+
+    rate is in bytes per second, or a function returning it so time windows
+    can change it; a falsy rate means unlimited. Callers reserve their bytes
+    and sleep off any deficit, so large reads are allowed but paid for. Part
+    of the rate can be set aside for transfers the bucket does not see.
+    clock and sleep can be replaced with a fake clock in tests.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._last = None
+        self._unreserved = 1.0
+
+    def rate(self):
+        """Returns the full limit in bytes per second, reservations included."""
+        return self._rate() if callable(self._rate) else self._rate
+
+    def _refill(self):
+        """Adds the tokens earned since the last call; returns the refill rate."""
+        rate = self.rate()
+        if not rate:
+            self._tokens = None
+            return 0
+        rate *= self._unreserved
+        burst = self._burst or rate
+        now = self._clock()
+        if self._tokens is None:
+            self._tokens = burst
+        else:
+            self._tokens = min(burst, self._tokens + (now - self._last) * rate)
+        self._last = now
+        return rate
+
+    def _take(self, amount):
+        """Removes amount tokens and returns how long the caller must wait."""
+        with self._lock:
+            rate = self._refill()
+            if not rate:
+                return 0.0
+            self._tokens -= amount
+            return -self._tokens / rate if self._tokens < 0 else 0.0
+
+    def acquire(self, amount):
+        """Blocks until amount bytes may be sent; returns the seconds waited."""
+        wait = self._take(amount)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    @contextmanager
+    def reserve(self, share):
+        """Sets share of the remaining rate aside while the block runs.
+
+        Yields the reserved rate in bytes per second (0 when unlimited); the
+        bucket refills at what is left until the block exits.
+        """
+        with self._lock:
+            self._refill()
+            reserved = (self.rate() or 0) * self._unreserved * share
+            self._unreserved *= 1 - share
+        try:
+            yield reserved
+        finally:
+            with self._lock:
+                self._refill()
+                self._unreserved /= 1 - share
+
+
+class Progress:
+    """Logs bytes done, throughput and ETA for a set of transfers."""
+
+    def __init__(
+        self, label, total, clock=time.monotonic, interval=DEFAULT_PROGRESS_INTERVAL
+    ):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self._clock = clock
+        self._interval = interval
+        self._start = clock()
+        self._logged = self._start
+        self._lock = threading.Lock()
+
+    def status(self):
+        """Returns (bytes done, bytes per second, seconds remaining or None)."""
+        elapsed = self._clock() - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0
+        remaining = max(self.total - self.done, 0)
+        return self.done, rate, remaining / rate if rate else None
+
+    def _log(self):
+        done, rate, eta = self.status()
+        percent = 100 * done / self.total if self.total else 100
+        eta_text = f"{eta:.0f}s" if eta is not None else "unknown"
+        logging.info(
+            Fore.BLUE
+            + f"{self.label}: {done / 1024 / 1024:.1f}/{self.total / 1024 / 1024:.1f} MB "
+            f"({percent:.0f}%), {rate / 1024 / 1024:.1f} MB/s, ETA {eta_text}"
+        )
+
+    def advance(self, amount):
+        with self._lock:
+            self.done += amount
+            now = self._clock()
+            if now - self._logged < self._interval:
+                return
+            self._logged = now
+            self._log()
+
+    def finish(self):
+        with self._lock:
+            self._log()
+
+
+class _ThrottledFile:
+    """Wraps a file object so reads or writes draw from the scheduler's bucket."""
+
+    def __init__(self, fileobj, scheduler, progress):
+        self._fileobj = fileobj
+        self._scheduler = scheduler
+        self._progress = progress
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self._scheduler.consume(len(data), self._progress)
+        return data
+
+    def write(self, data):
+        self._scheduler.consume(len(data), self._progress)
+        return self._fileobj.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
+
+
+class TransferScheduler:
+    """Shared rate limit, per-destination concurrency caps and progress for uploads.
+
+    caps maps a destination (e.g. "gcs" or "vm") to the number of transfers
+    allowed to run to it at once; destinations without a cap are unlimited.
+    """
+
+    def __init__(
+        self,
+        limiter=None,
+        caps=None,
+        clock=time.monotonic,
+        progress_interval=DEFAULT_PROGRESS_INTERVAL,
+    ):
+        self.limiter = limiter
+        self._slots = {
+            destination: threading.BoundedSemaphore(cap)
+            for destination, cap in (caps or {}).items()
+            if cap > 0
+        }
+        self._clock = clock
+        self._progress_interval = progress_interval
+
+    def rate(self):
+        """Returns the current limit in bytes per second (0 when unlimited)."""
+        return (self.limiter.rate() if self.limiter else 0) or 0
+
+    def chunk_size(self):
+        """Returns an upload chunk size of about a second at the limit, or None if unlimited.
+
+        The storage client sends each chunk at full speed once it has read
+        it, so chunks must be small for the limit to smooth the traffic
+        rather than space out bursts.
+        """
+        rate = self.rate()
+        if not rate:
+            return None
+        return max(1, int(rate) // UPLOAD_CHUNK_ALIGNMENT) * UPLOAD_CHUNK_ALIGNMENT
+
+    def consume(self, amount, progress=None):
+        """Waits for amount bytes of budget and counts them towards progress."""
+        if self.limiter:
+            self.limiter.acquire(amount)
+        if progress:
+            progress.advance(amount)
+
+    @contextmanager
+    def external(self, share=EXTERNAL_RATE_SHARE):
+        """Reserves share of the rate for a tool that enforces a limit itself.
+
+        Yields the tool's limit in bytes per second (0 when unlimited);
+        throttled transfers share the rest until the block exits, so the
+        total stays within the limit while both run.
+        """
+        if not self.limiter:
+            yield 0
+            return
+        with self.limiter.reserve(share) as rate:
+            yield rate
+
+    def throttle(self, fileobj, progress=None):
+        """Returns fileobj wrapped so its reads and writes are rate limited."""
+        return _ThrottledFile(fileobj, self, progress)
+
+    @contextmanager
+    def slot(self, destination):
+        """Holds one of the destination's concurrent transfer slots."""
+        semaphore = self._slots.get(destination)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+    @contextmanager
+    def progress(self, label, total):
+        """Yields a Progress for the transfers made inside the block."""
+        progress = Progress(label, total, self._clock, self._progress_interval)
+        yield progress
+        if total:
+            progress.finish()
+
+
+def largest_first(items, size):
+    """Orders items by size(item), largest first (LPT), to shorten the makespan."""
+    return sorted(items, key=size, reverse=True)
+
+
+_scheduler = TransferScheduler()
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide transfer scheduler (unlimited until configured)."""
+    with _scheduler_lock:
+        return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Replaces the process-wide transfer scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
@@ -0,0 +1,91 @@
+import os
+import time
+
+from manifest import scan_tree
+
+
+def mod_signature(path):
+    """Summarizes a mod folder as (file count, total size, newest mtime_ns).
+
+    Any file added, removed, resized or rewritten changes the signature.
+    Returns None if the folder disappeared while it was being scanned.
+    """
+    try:
+        entries = scan_tree(path)
+    except OSError:
+        return None
+    sizes = [size for size, _ in entries.values()]
+    mtimes = [mtime_ns for _, mtime_ns in entries.values()]
+    return (len(entries), sum(sizes), max(mtimes, default=0))
+
+
+def snapshot_mods(content_dir, exclude=None):
+    """Returns {(kind, name): signature} for every car and track folder.
+
+    exclude maps a kind to names to leave out (e.g. official content).
+    """
+    exclude = exclude or {}
+    snapshot = {}
+    for kind in ("cars", "tracks"):
+        kind_dir = os.path.join(content_dir, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        skip = exclude.get(kind, ())
+        with os.scandir(kind_dir) as it:
+            for entry in it:
+                if entry.is_dir() and entry.name not in skip:
+                    signature = mod_signature(entry.path)
+                    if signature is not None:
+                        snapshot[(kind, entry.name)] = signature
+    return snapshot
+
+
+def snapshot_zips(drop_dir):
+    """Returns {("pack", path): (size, mtime_ns)} for server-pack zips in drop_dir."""
+    snapshot = {}
+    if not os.path.isdir(drop_dir):
+        return snapshot
+    with os.scandir(drop_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(".zip"):
+                stat = entry.stat()
+                snapshot[("pack", entry.path)] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class ChangeDebouncer:
+    """Holds back changed items until they stop changing.
+
+    A burst of events (a mod being copied file by file, a zip still being
+    downloaded) keeps resetting the item's timer; it becomes ready once its
+    signature has been stable for quiet_seconds.
+    """
+
+    def __init__(self, quiet_seconds, clock=time.monotonic):
+        self.quiet_seconds = quiet_seconds
+        self.clock = clock
+        self._pending = {}
+
+    def observe(self, key, signature):
+        """Records the current signature of a changed item."""
+        current = self._pending.get(key)
+        if current is None or current[0] != signature:
+            self._pending[key] = (signature, self.clock())
+
+    def discard(self, key):
+        self._pending.pop(key, None)
+
+    def pending(self):
+        return set(self._pending)
+
+    def ready(self):
+        """Removes and returns {key: signature} for items that have settled."""
+        now = self.clock()
+        settled = {
+            key: signature
+            for key, (signature, since) in self._pending.items()
+            if now - since >= self.quiet_seconds
+        }
+        for key in settled:
+            del self._pending[key]
+        return settled